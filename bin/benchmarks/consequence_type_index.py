@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compare the load time and the memory used by the snp2gene mapping when loaded in a dict of lists of
+ConsequenceType objects, as done previously, and in a ConsequenceTypeIndex.
+"""
+
+import argparse
+import time
+import tracemalloc
+from collections import defaultdict
+
+from eva_cttv_pipeline.evidence_string_generation import consequence_type as CT
+from eva_cttv_pipeline.evidence_string_generation import utilities
+
+
+def process_gene(consequence_type_dict, variant_id, ensembl_gene_id, so_term):
+    """
+    Add a consequence type to a dict of lists of ConsequenceType objects, the structure in which
+    the snp2gene mapping was loaded before ConsequenceTypeIndex
+    """
+    consequence_type_dict[variant_id].append(CT.ConsequenceType(ensembl_gene_id,
+                                                                CT.SoTerm(so_term)))
+
+
+def load_dict_of_lists(snp_2_gene_file):
+    consequence_type_dict = defaultdict(list)
+    with utilities.open_file(snp_2_gene_file, "rt") as f:
+        for line in f:
+            line_list = line.rstrip().split("\t")
+            if len(line_list) < 6:
+                continue
+            process_gene(consequence_type_dict, line_list[0], line_list[2], line_list[4])
+    return consequence_type_dict
+
+
+def load_index(snp_2_gene_file):
+    return CT.process_consequence_type_file_tsv(snp_2_gene_file)[0]
+
+
+def measure(load_function, snp_2_gene_file):
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    consequence_type_dict = load_function(snp_2_gene_file)
+    elapsed = time.perf_counter() - start_time
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return consequence_type_dict, elapsed, memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-g', '--snp-2-gene-file', required=True, help='Variant to gene mappings')
+    args = parser.parse_args()
+
+    results = {}
+    for name, load_function in (('dict of lists', load_dict_of_lists), ('index', load_index)):
+        consequence_type_dict, elapsed, memory = measure(load_function, args.snp_2_gene_file)
+        results[name] = consequence_type_dict
+        print('{}: {} variants loaded in {:.2f} s (traced time), {:.1f} MB'.format(
+            name, len(consequence_type_dict), elapsed, memory / 1024 ** 2))
+
+    dict_of_lists, index = results['dict of lists'], results['index']
+    if set(dict_of_lists) != set(index) or \
+            any(dict_of_lists[variant_id] != index[variant_id] for variant_id in dict_of_lists):
+        raise Exception('The index does not hold the same consequence types')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Compare the time taken to copy the evidence string templates with copy.deepcopy and with the
+precompiled templates used by the constructors of the evidence string classes, and the time taken
+to construct the evidence strings for a ClinVar JSON file.
+"""
+
+import argparse
+import copy
+import itertools
+import timeit
+
+from eva_cttv_pipeline.evidence_string_generation import cellbase_records
+from eva_cttv_pipeline.evidence_string_generation import clinvar
+from eva_cttv_pipeline.evidence_string_generation import clinvar_to_evidence_strings as CTES
+from eva_cttv_pipeline.evidence_string_generation import evidence_strings
+
+EVIDENCE_STRING_CLASSES = {'germline': evidence_strings.CTTVGeneticsEvidenceString,
+                           'somatic': evidence_strings.CTTVSomaticEvidenceString}
+
+
+def collect_constructor_args(json_file, mappings, report):
+    """Return the arguments the pipeline would pass to the evidence string classes"""
+    allowed_clinical_significance = CTES.get_default_allowed_clinical_significance()
+    constructor_args = []
+    for cellbase_record in cellbase_records.CellbaseRecords(json_file=json_file):
+        clinvar_record = clinvar.ClinvarRecord(cellbase_record['clinvarSet'])
+        for clinvar_record_measure in clinvar_record.measures:
+            traits = CTES.create_traits(clinvar_record.traits, mappings.trait_2_efo, report)
+            for consequence_type, trait, allele_origin in itertools.product(
+                    CTES.get_consequence_types(clinvar_record_measure,
+                                               mappings.consequence_type_dict),
+                    traits,
+                    CTES.convert_allele_origins(clinvar_record.allele_origins)):
+                if CTES.skip_record(clinvar_record, clinvar_record_measure, consequence_type,
+                                    allele_origin, allowed_clinical_significance, report):
+                    continue
+                constructor_args.append((EVIDENCE_STRING_CLASSES[allele_origin],
+                                         (clinvar_record, clinvar_record_measure, report, trait,
+                                          consequence_type)))
+    return constructor_args
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-j', '--json-file', required=True, help='ClinVar JSON file from CellBase')
+    parser.add_argument('-e', '--efo-mapping-file', required=True, help='Trait to EFO mappings')
+    parser.add_argument('-g', '--snp-2-gene-file', required=True, help='Variant to gene mappings')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of timed repetitions')
+    args = parser.parse_args()
+
+    mappings = CTES.get_mappings(args.efo_mapping_file, args.snp_2_gene_file)
+    constructor_args = collect_constructor_args(args.json_file, mappings, CTES.Report())
+    print('{} evidence strings per repetition'.format(len(constructor_args)))
+
+    timings = {
+        'template deepcopy': lambda: [copy.deepcopy(cls.base_json) for cls, _ in constructor_args],
+        'compiled template': lambda: [cls.new_base_json() for cls, _ in constructor_args],
+        'constructor': lambda: [cls(*a) for cls, a in constructor_args],
+    }
+    for name, function in timings.items():
+        best = min(timeit.repeat(function, number=1, repeat=args.repeat))
+        print('{}: {:.3f} s ({:.1f} us per evidence string)'.format(
+            name, best, best * 1e6 / max(len(constructor_args), 1)))
+
+
+if __name__ == '__main__':
+    main()
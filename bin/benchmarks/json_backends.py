@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Compare the installed JSON backends when decoding the records of a ClinVar JSON file from CellBase
+and encoding them back, and check whether each backend produces the same output as the standard
+library.
+"""
+
+import argparse
+import itertools
+import json
+import timeit
+
+from eva_cttv_pipeline import json_backend
+from eva_cttv_pipeline.evidence_string_generation import utilities
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-j', '--json-file', required=True,
+                        help='ClinVar JSON file from CellBase, one record per line')
+    parser.add_argument('-n', '--max-records', type=int, default=None,
+                        help='Only use the first N records of the file')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='Number of timed repetitions')
+    args = parser.parse_args()
+
+    with utilities.open_file(args.json_file, 'rt') as f:
+        lines = [line.rstrip() for line in itertools.islice(f, args.max_records)]
+    reference_records = [json.loads(line) for line in lines]
+    reference_output = [json.dumps(record) for record in reference_records]
+    print('{} records, {:.1f} MB'.format(len(lines), sum(map(len, lines)) / 1e6))
+
+    for name, (loads, dumps) in sorted(json_backend.BACKENDS.items()):
+        records = [loads(line) for line in lines]
+        same_records = records == reference_records and \
+            [json.dumps(record) for record in records] == reference_output
+        same_output = [dumps(record) for record in records] == reference_output
+        decode = min(timeit.repeat(lambda: [loads(line) for line in lines],
+                                   number=1, repeat=args.repeat))
+        encode = min(timeit.repeat(lambda: [dumps(record) for record in records],
+                                   number=1, repeat=args.repeat))
+        print('{}: decode {:.3f} s (same records: {}), encode {:.3f} s (same output: {})'.format(
+            name, decode, same_records, encode, same_output))
+
+
+if __name__ == '__main__':
+    main()
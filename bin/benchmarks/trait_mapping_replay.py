@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Measure the throughput of the trait mapping pipeline against a local server replaying recorded
+Zooma, OLS and OxO responses (see bin/trait_mapping.py --record-fixtures), with each of the given
+numbers of workers, and check that the outputs are the same for all of them.
+"""
+
+import argparse
+import filecmp
+import os
+import tempfile
+import time
+
+import eva_cttv_pipeline.trait_mapping.main as trait_mapping
+from eva_cttv_pipeline.trait_mapping import http_client, metrics, ols, oxo, replay, zooma
+from eva_cttv_pipeline.trait_mapping.trait_names_parsing import count_trait_names
+
+FILTERS = {'ontologies': 'efo,ordo,hp,mondo',
+           'required': 'cttv,eva-clinvar,clinvar-xrefs,gwas',
+           'preferred': 'eva-clinvar,cttv,gwas,clinvar-xrefs'}
+OXO_TARGET_LIST = ['Orphanet', 'efo', 'hp', 'mondo']
+OXO_DISTANCE = 3
+
+
+def clear_caches():
+    ols.query_ontology_label_from_ols.cache_clear()
+    ols.query_efo_term_status.cache_clear()
+    oxo.uri_to_oxo_format.cache_clear()
+    zooma.zooma_query_helper.cache_clear()
+    metrics.reset()
+
+
+def run(input_filepath, n_traits, output_dir, server, workers, oxo_batch_size):
+    clear_caches()
+    http_client.configure(pool_size=max(workers, http_client.DEFAULT_POOL_SIZE), rate=0,
+                          max_concurrency=workers)
+    mappings_filepath = os.path.join(output_dir, 'mappings_{}.tsv'.format(workers))
+    curation_filepath = os.path.join(output_dir, 'curation_{}.tsv'.format(workers))
+    n_requests = server.n_requests
+    start_time = time.perf_counter()
+    trait_mapping.main(input_filepath=input_filepath, output_mappings_filepath=mappings_filepath,
+                       output_curation_filepath=curation_filepath, filters=FILTERS,
+                       zooma_host=server.url, oxo_target_list=OXO_TARGET_LIST,
+                       oxo_distance=OXO_DISTANCE, unattended=True, workers=workers,
+                       oxo_batch_size=oxo_batch_size)
+    elapsed = time.perf_counter() - start_time
+    print('{} workers: {:.2f} s, {:.1f} traits/s, {} requests, {:.1f} requests/s'.format(
+        workers, elapsed, n_traits / elapsed, server.n_requests - n_requests,
+        (server.n_requests - n_requests) / elapsed))
+    return mappings_filepath, curation_filepath
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-i', '--input', required=True, help='ClinVar JSON file')
+    parser.add_argument('-f', '--fixtures', required=True, help='File of recorded responses')
+    parser.add_argument('-w', '--workers', default='1,4,16',
+                        help='Comma separated numbers of workers to run with')
+    parser.add_argument('--oxo-batch-size', type=int, default=oxo.OXO_BATCH_SIZE)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--latency-jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = replay.ReplayServer(replay.FixtureStore.load(args.fixtures), latency=args.latency,
+                                 latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                                 seed=args.seed)
+    ols.OLS_EFO_SERVER = server.url + replay.OLS_PATH
+    oxo.OXO_SERVER = server.url + replay.OXO_PATH
+    n_traits = len(count_trait_names(args.input))
+    with server, tempfile.TemporaryDirectory() as output_dir:
+        outputs = [run(args.input, n_traits, output_dir, server, int(workers), args.oxo_batch_size)
+                   for workers in args.workers.split(',')]
+        print('{} injected errors, {} requests not recorded'.format(server.n_errors,
+                                                                    server.n_missing))
+        # Injected errors which persist after all the retries can change the outputs
+        for output_filepaths in outputs[1:]:
+            for expected_filepath, output_filepath in zip(outputs[0], output_filepaths):
+                if not filecmp.cmp(expected_filepath, output_filepath, shallow=False):
+                    raise Exception('{} differs from {}'.format(output_filepath, expected_filepath))
+
+
+if __name__ == '__main__':
+    main()
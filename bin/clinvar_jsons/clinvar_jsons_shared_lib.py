@@ -1,7 +1,8 @@
-import gzip
-import json
 from collections import namedtuple
 
+from eva_cttv_pipeline import clinvar_json_index
+from eva_cttv_pipeline import json_backend
+
 
 class Trait:
     def __init__(self, name):
@@ -21,11 +22,16 @@ class Trait:
 TraitXref = namedtuple("TraitXref", ["db", "id_", "status"])
 
 
-def clinvar_jsons(filepath):
-    with gzip.open(filepath, "rt") as f:
-        for line in f:
-            line = line.rstrip()
-            yield json.loads(line)
+def clinvar_jsons(filepath, start=0, stop=None):
+    """
+    Yields the ClinVar records, from a file with one json per line, numbered from start to stop
+    (excluded, or until the end of the file if None). If the file has an index written by
+    clinvar_json_index, reading starts directly at the first record.
+    """
+    index = clinvar_json_index.RecordIndex.for_file(filepath) if start > 0 else None
+    for line in clinvar_json_index.iter_lines(filepath, start, stop, index):
+        line = line.rstrip()
+        yield json_backend.loads(line)
 
 
 def get_trait_set(clinvar_json):
@@ -1,8 +1,8 @@
 import argparse
-import json
 import gzip
 import sys
 
+from eva_cttv_pipeline import json_backend
 from clinvar_jsons_shared_lib import clinvar_jsons, get_traits_from_json, has_allowed_clinical_significance
 
 
@@ -12,7 +12,7 @@ def main():
     with gzip.open(parser.outfile_path, "wt") as outfile:
         for clinvar_json in clinvar_jsons(parser.infile_path):
             if has_allowed_clinical_significance(clinvar_json):
-                outfile.write(json.dumps(clinvar_json) + "\n")
+                outfile.write(json_backend.dumps(clinvar_json) + "\n")
 
 
 class ArgParser:
@@ -0,0 +1,50 @@
+import argparse
+import sys
+
+from eva_cttv_pipeline import clinvar_json_index
+
+
+def main():
+    parser = ArgParser(sys.argv)
+
+    if parser.accession is not None:
+        index = clinvar_json_index.RecordIndex.for_file(parser.infile_path)
+        line = clinvar_json_index.find_line(parser.infile_path, parser.accession, index)
+        if line is None:
+            print("{} not found in {}".format(parser.accession, parser.infile_path),
+                  file=sys.stderr)
+            sys.exit(1)
+        print(line)
+    else:
+        clinvar_json_index.write_block_gzip(parser.infile_path, parser.outfile_path,
+                                            parser.records_per_block)
+
+
+class ArgParser:
+    def __init__(self, argv):
+        description = """
+        Script for rewriting a file with a list of CellBase ClinVar JSONs as a block gzip file with
+        an index (written next to it with the .idx suffix), so that its records can be read from
+        any position or fetched by RCV accession. The output is still a gzipped file with one
+        ClinVar JSON per line, and can be used as the input of any pipeline script. With -a, print
+        the JSON of a single record instead, using the index of the file if it has one.
+        """
+        parser = argparse.ArgumentParser(description=description)
+
+        parser.add_argument("-i", dest="infile_path", required=True, help="a path to a file containing one CellBase ClinVar JSON per line")
+        parser.add_argument("-o", dest="outfile_path", help="a path to the block gzip file to write")
+        parser.add_argument("-n", dest="records_per_block", type=int, default=clinvar_json_index.DEFAULT_RECORDS_PER_BLOCK, help="number of records in each gzip block")
+        parser.add_argument("-a", dest="accession", help="RCV accession of a record to print instead of writing an indexed file")
+
+        args = parser.parse_args(args=argv[1:])
+        if args.accession is None and args.outfile_path is None:
+            parser.error("either -o or -a is required")
+
+        self.infile_path = args.infile_path
+        self.outfile_path = args.outfile_path
+        self.records_per_block = args.records_per_block
+        self.accession = args.accession
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ from time import gmtime, strftime
 import progressbar
 import requests
 
+from eva_cttv_pipeline.trait_mapping import http_client
 from clinvar_jsons_shared_lib import clinvar_jsons, get_traits_from_json, has_allowed_clinical_significance
 
 
@@ -146,9 +147,9 @@ def request_retry_helper(function, retry_count, url):
 @lru_cache(maxsize=16384)
 def zooma_query_helper(url):
     try:
-        json_response = requests.get(url).json()
+        json_response = http_client.get(url, service='zooma').json()
         return json_response
-    except json.decoder.JSONDecodeError as e:
+    except (json.decoder.JSONDecodeError, requests.RequestException) as e:
         return None
 
 
@@ -7,10 +7,14 @@ from eva_cttv_pipeline.evidence_string_generation import utilities, clinvar_to_e
 def main():
     parser = utilities.ArgParser(sys.argv)
     utilities.check_dir_exists_create(parser.out)
+    validation_policy = clinvar_to_evidence_strings.ValidationPolicy(
+        parser.validation, parser.validation_sample_rate, parser.validation_first_n)
     clinvar_to_evidence_strings.launch_pipeline(
         parser.out, allowed_clinical_significance=parser.clinical_significance,
         efo_mapping_file=parser.efo_mapping_file, snp_2_gene_file=parser.snp_2_gene_file,
-        json_file=parser.json_file, ot_schema=parser.ot_schema)
+        json_file=parser.json_file, ot_schema=parser.ot_schema, streaming=parser.streaming,
+        workers=parser.workers, validation_policy=validation_policy, cache_dir=parser.cache_dir,
+        prefilter=parser.prefilter)
 
 
 if __name__ == '__main__':
@@ -1,15 +1,58 @@
 import argparse
+import os
 import sys
 
 import eva_cttv_pipeline.trait_mapping.main as main
+from eva_cttv_pipeline.trait_mapping import efo_index, fuzzy_matcher, http_client, local_mappings, \
+    ols, oxo, rate_limiter, replay, response_cache
 
 
 def launch():
     parser = ArgParser(sys.argv)
 
-    main.main(parser.input_filepath, parser.output_mappings_filepath,
-              parser.output_curation_filepath, parser.filters, parser.zooma_host,
-              parser.oxo_target_list, parser.oxo_distance, parser.unattended)
+    http_client.configure(timeout=parser.http_timeout, retries=parser.http_retries,
+                          pool_size=max(parser.workers, http_client.DEFAULT_POOL_SIZE),
+                          rate=parser.rate_limit, max_concurrency=parser.max_concurrency,
+                          backoff_base=parser.backoff_base, backoff_max=parser.backoff_max)
+    if parser.cache_file is not None:
+        response_cache.configure(parser.cache_file, parser.cache_ttl_days, parser.cache_max_entries)
+    if parser.efo_index is not None:
+        efo_index.configure(parser.efo_index)
+    if parser.local_mappings_filepaths:
+        local_mappings.configure(parser.local_mappings_filepaths)
+    ols.OLS_EFO_SERVER = parser.ols_server
+    oxo.OXO_SERVER = parser.oxo_server
+    recorder = None
+    if parser.fixtures_filepath is not None:
+        fixture_store = replay.FixtureStore()
+        if os.path.exists(parser.fixtures_filepath):
+            fixture_store = replay.FixtureStore.load(parser.fixtures_filepath)
+        recorder = replay.Recorder(fixture_store, {'': parser.zooma_host,
+                                                   replay.OLS_PATH: parser.ols_server,
+                                                   replay.OXO_PATH: parser.oxo_server})
+        recorder.start()
+    try:
+        if parser.prefetch_efo:
+            efo_index.set_index(ols.fetch_efo_index(workers=parser.workers))
+        # After the EFO index is set up, since the matcher looks up which terms are in EFO in it
+        if parser.fuzzy_match_ontologies:
+            fuzzy_matcher.configure(parser.fuzzy_match_ontologies)
+        main.main(input_filepath=parser.input_filepath,
+                  output_mappings_filepath=parser.output_mappings_filepath,
+                  output_curation_filepath=parser.output_curation_filepath,
+                  filters=parser.filters, zooma_host=parser.zooma_host,
+                  oxo_target_list=parser.oxo_target_list, oxo_distance=parser.oxo_distance,
+                  unattended=parser.unattended, workers=parser.workers,
+                  oxo_batch_size=parser.oxo_batch_size, resume=parser.resume,
+                  journal_filepath=parser.journal_filepath,
+                  previous_mappings_filepaths=parser.previous_mappings_filepaths,
+                  parse_workers=parser.parse_workers, metrics_filepath=parser.metrics_filepath,
+                  progress_interval=parser.progress_interval)
+    finally:
+        response_cache.close()
+        if recorder is not None:
+            recorder.stop()
+            recorder.store.write(parser.fixtures_filepath)
 
 
 class ArgParser:
@@ -35,14 +78,111 @@ class ArgParser:
                             help="preference for data sources, with preferred data source first.")
         parser.add_argument("-z", dest="zooma_host", default="https://www.ebi.ac.uk",
                             help="the host to use for querying zooma")
+        parser.add_argument("--ols-server", dest="ols_server", default=ols.OLS_EFO_SERVER,
+                            help="base URL of the OLS instance to query")
+        parser.add_argument("--oxo-server", dest="oxo_server", default=oxo.OXO_SERVER,
+                            help="base URL of the OxO instance to query")
         parser.add_argument("-t", dest="oxo_target_list", default="Orphanet,efo,hp,mondo",
                             help="target ontologies to use with OxO")
         parser.add_argument("-d", dest="oxo_distance", default=3,
                             help="distance to use to query OxO.")
+        parser.add_argument("--oxo-batch-size", dest="oxo_batch_size", type=int,
+                            default=main.OXO_BATCH_SIZE,
+                            help="number of IDs, from several traits, to query OxO with in a single "
+                                 "request. 0 to query OxO separately for each trait.")
         parser.add_argument('-u', dest="unattended", action='store_true',
                             help="unattended launch, hide ETA estimates")
+        parser.add_argument("--progress-interval", dest="progress_interval", type=float,
+                            default=None,
+                            help="in unattended mode, log the number of traits processed and the "
+                                 "requests made to Zooma, OLS and OxO every given number of seconds.")
+        parser.add_argument("--metrics-file", dest="metrics_filepath", default=None,
+                            help="file to which to write the JSON summary of the requests made to "
+                                 "Zooma, OLS and OxO, also logged at the end of the run, with their "
+                                 "latencies, retries, failures and cache hits.")
+        parser.add_argument("--resume", dest="resume", action="store_true",
+                            help="resume an interrupted run, skipping the traits recorded in its "
+                                 "journal. The output files are written again with these traits "
+                                 "first.")
+        parser.add_argument("--journal", dest="journal_filepath", default=None,
+                            help="path to the journal of the processed traits. By default the path "
+                                 "of the mappings output file with the .journal suffix.")
+        parser.add_argument("--previous-mappings", dest="previous_mappings_filepaths",
+                            action="append", default=None,
+                            help="mappings file of a previous release, such as its automated or its "
+                                 "curated mappings. Traits with previous mappings which are all still "
+                                 "current EFO terms keep them instead of being processed again. Can "
+                                 "be given several times, the mappings of later files taking "
+                                 "precedence, so give the automated mappings before the curated ones.")
+        parser.add_argument("--local-mappings", dest="local_mappings_filepaths", action="append",
+                            default=None,
+                            help="curated mappings file, in the format of the mappings given to "
+                                 "the evidence string generation, in which to look up each trait "
+                                 "before querying Zooma, ignoring case and punctuation. Can be given "
+                                 "several times.")
+        parser.add_argument("--fuzzy-match-ontology", dest="fuzzy_match_ontologies",
+                            action="append", default=None,
+                            help="ontology file (.owl or .obo, e.g. efo.owl, hp.obo, mondo.obo) whose "
+                                 "term labels and synonyms are compared with the names of the traits "
+                                 "without any Zooma results, to suggest terms in the curation file. "
+                                 "Can be given several times. Give --efo-index or --prefetch-efo as "
+                                 "well to tell which terms are in EFO.")
+        parser.add_argument("-w", "--workers", dest="workers", type=int, default=1,
+                            help="number of traits to process concurrently. The output is in the "
+                                 "same order as with a single worker.")
+        parser.add_argument("--parse-workers", dest="parse_workers", type=int, default=1,
+                            help="number of processes decoding the ClinVar records to count their "
+                                 "trait names.")
+        parser.add_argument("--http-timeout", dest="http_timeout", type=float,
+                            default=http_client.DEFAULT_TIMEOUT[1],
+                            help="seconds to wait for a response from Zooma, OLS or OxO.")
+        parser.add_argument("--http-retries", dest="http_retries", type=int,
+                            default=http_client.DEFAULT_RETRIES,
+                            help="number of times to retry a failed request to Zooma, OLS or OxO.")
+        parser.add_argument("--rate-limit", dest="rate_limit", type=float,
+                            default=rate_limiter.DEFAULT_RATE,
+                            help="maximum average number of requests per second to each of Zooma, "
+                                 "OLS and OxO. 0 for no limit.")
+        parser.add_argument("--max-concurrency", dest="max_concurrency", type=int, default=None,
+                            help="maximum number of concurrent requests to each of Zooma, OLS and "
+                                 "OxO, halved whenever the service is overloaded. By default the "
+                                 "number of workers.")
+        parser.add_argument("--backoff-base", dest="backoff_base", type=float,
+                            default=rate_limiter.DEFAULT_BACKOFF_BASE,
+                            help="maximum delay in seconds before the first retry of a failed "
+                                 "request, doubled at each retry.")
+        parser.add_argument("--backoff-max", dest="backoff_max", type=float,
+                            default=rate_limiter.DEFAULT_BACKOFF_MAX,
+                            help="maximum delay in seconds before retrying a failed request.")
+        parser.add_argument("--cache-file", dest="cache_file", default=None,
+                            help="path to an SQLite database caching the responses from Zooma, OLS "
+                                 "and OxO between runs. Created if it does not exist.")
+        parser.add_argument("--cache-ttl-days", dest="cache_ttl_days", type=float,
+                            default=response_cache.DEFAULT_TTL_DAYS,
+                            help="number of days after which cached responses expire.")
+        parser.add_argument("--cache-max-entries", dest="cache_max_entries", type=int,
+                            default=response_cache.DEFAULT_MAX_ENTRIES,
+                            help="maximum number of responses kept in the cache.")
+        parser.add_argument("--record-fixtures", dest="fixtures_filepath", default=None,
+                            help="file in which to record the responses from Zooma, OLS and OxO, "
+                                 "for replaying them with bin/trait_mapping/replay_server.py. "
+                                 "Responses already in the file are kept. Cannot be used with "
+                                 "--cache-file, since the responses from the cache are not "
+                                 "recorded.")
+        parser.add_argument("--efo-index", dest="efo_index", default=None,
+                            help="EFO release file (.owl or .obo), or index written by "
+                                 "bin/trait_mapping/build_efo_index.py, used instead of querying "
+                                 "OLS for EFO terms.")
+        parser.add_argument("--prefetch-efo", dest="prefetch_efo", action="store_true",
+                            help="fetch the labels and obsolete status of all the EFO terms from "
+                                 "the --ols-server before processing the traits, and use them "
+                                 "instead of querying OLS for each EFO term.")
 
         args = parser.parse_args(args=argv[1:])
+        if args.prefetch_efo and args.efo_index is not None:
+            parser.error("--prefetch-efo and --efo-index cannot be used together")
+        if args.fixtures_filepath is not None and args.cache_file is not None:
+            parser.error("--record-fixtures and --cache-file cannot be used together")
 
         self.input_filepath = args.input_filepath
         self.output_mappings_filepath = args.output_mappings_filepath
@@ -53,9 +193,33 @@ class ArgParser:
                         "preferred": args.preferred}
 
         self.zooma_host = args.zooma_host
+        self.ols_server = args.ols_server
+        self.oxo_server = args.oxo_server
         self.oxo_target_list = [target.strip() for target in args.oxo_target_list.split(",")]
         self.oxo_distance = args.oxo_distance
+        self.oxo_batch_size = args.oxo_batch_size
         self.unattended = args.unattended
+        self.progress_interval = args.progress_interval
+        self.metrics_filepath = args.metrics_filepath
+        self.resume = args.resume
+        self.journal_filepath = args.journal_filepath
+        self.previous_mappings_filepaths = args.previous_mappings_filepaths
+        self.local_mappings_filepaths = args.local_mappings_filepaths
+        self.fuzzy_match_ontologies = args.fuzzy_match_ontologies
+        self.workers = args.workers
+        self.parse_workers = args.parse_workers
+        self.http_timeout = (http_client.DEFAULT_TIMEOUT[0], args.http_timeout)
+        self.http_retries = args.http_retries
+        self.rate_limit = args.rate_limit
+        self.max_concurrency = args.max_concurrency or self.workers
+        self.backoff_base = args.backoff_base
+        self.backoff_max = args.backoff_max
+        self.cache_file = args.cache_file
+        self.cache_ttl_days = args.cache_ttl_days
+        self.cache_max_entries = args.cache_max_entries
+        self.efo_index = args.efo_index
+        self.prefetch_efo = args.prefetch_efo
+        self.fixtures_filepath = args.fixtures_filepath
 
 
 if __name__ == '__main__':
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from eva_cttv_pipeline.trait_mapping import efo_index, ols
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Build the index of EFO terms used by the trait mapping pipeline with --efo-index')
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument(
+        '-i', '--input',
+        help='EFO release file, in OWL or OBO format (efo.owl, efo.obo, optionally gzipped)')
+    source_group.add_argument(
+        '--from-ols', action='store_true',
+        help='Fetch the EFO terms from the listing of the terms of EFO in OLS instead')
+    parser.add_argument(
+        '--ols-server', default=ols.OLS_EFO_SERVER, help='Base URL of the OLS instance to query')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=4, help='Number of pages of terms to fetch concurrently')
+    parser.add_argument(
+        '-o', '--output', required=True,
+        help='Output TSV file with the URI, label and obsolete status of each term')
+    args = parser.parse_args()
+    if args.from_ols:
+        ols.OLS_EFO_SERVER = args.ols_server
+        index = ols.fetch_efo_index(workers=args.workers)
+    else:
+        index = efo_index.load(args.input)
+    index.write_tsv(args.output)
@@ -2,7 +2,8 @@
 
 import argparse
 import re
-import requests
+
+from eva_cttv_pipeline.trait_mapping import http_client
 
 # Name of ontology in OLS url, e. g. https://www.ebi.ac.uk/ols/ontologies/ordo/terms?iri=...
 ontology_to_ols = {
@@ -29,13 +30,14 @@ webulous_joiner = ' || '
 
 
 def get_parent_terms(url):
-    return [term['label'] for term in requests.get(url).json()['_embedded']['terms']]
+    terms = http_client.get(url, service='ols').json()['_embedded']['terms']
+    return [term['label'] for term in terms]
 
 
 def get_ols_details(ontology, term):
     """Queries OLS and returns the details necessary for the EFO import table construction."""
     url = ols_url_template.format(ontology=ontology, term=term)
-    data = requests.get(url).json()['_embedded']['terms'][0]
+    data = http_client.get(url, service='ols').json()['_embedded']['terms'][0]
     label = data['label']
     parents = get_parent_terms(data['_links']['parents']['href'])
 
@@ -2,23 +2,21 @@
 
 import argparse
 
-from eva_cttv_pipeline.trait_mapping.ols import (
-    get_ontology_label_from_ols, is_current_and_in_efo, is_in_efo,
-)
+from eva_cttv_pipeline.trait_mapping import efo_index, response_cache
+from eva_cttv_pipeline.trait_mapping.ols import get_term_info
 
 
 def find_previous_mapping(trait_name, previous_mappings):
     if trait_name not in previous_mappings:
         return ''
     uri = previous_mappings[trait_name]
-    label = get_ontology_label_from_ols(uri)
-    uri_is_current_and_in_efo = is_current_and_in_efo(uri)
-    uri_in_efo = is_in_efo(uri)
-    if uri_in_efo:
-        trait_status = 'EFO_CURRENT' if uri_is_current_and_in_efo else 'EFO_OBSOLETE'
+    term_info = get_term_info(uri)
+    if term_info.in_efo:
+        trait_status = 'EFO_CURRENT' if term_info.is_current_and_in_efo else 'EFO_OBSOLETE'
     else:
         trait_status = 'NOT_CONTAINED'
-    trait_string = '|'.join([uri, label, 'NOT_SPECIFIED', 'previously-used', trait_status])
+    trait_string = '|'.join([uri, term_info.label, 'NOT_SPECIFIED', 'previously-used',
+                             trait_status])
     return trait_string
 
 
@@ -40,7 +38,24 @@ if __name__ == '__main__':
     parser.add_argument(
         '-o', '--output',
         help='Output TSV to be loaded in Google Sheets for manual curation')
+    parser.add_argument(
+        '--cache-file',
+        help='SQLite database caching the responses from OLS, shared with the trait mapping pipeline')
+    parser.add_argument(
+        '--cache-ttl-days', type=float, default=response_cache.DEFAULT_TTL_DAYS,
+        help='Number of days after which cached responses expire')
+    parser.add_argument(
+        '--cache-max-entries', type=int, default=response_cache.DEFAULT_MAX_ENTRIES,
+        help='Maximum number of responses kept in the cache')
+    parser.add_argument(
+        '--efo-index',
+        help='EFO release file (.owl or .obo), or index written by build_efo_index.py, used instead '
+             'of querying OLS for EFO terms')
     args = parser.parse_args()
+    if args.cache_file:
+        response_cache.configure(args.cache_file, args.cache_ttl_days, args.cache_max_entries)
+    if args.efo_index:
+        efo_index.configure(args.efo_index)
     outfile = open(args.output, 'w')
 
     # Load all previous mappings
@@ -62,3 +77,4 @@ if __name__ == '__main__':
         outfile.write(out_line)
 
     outfile.close()
+    response_cache.close()
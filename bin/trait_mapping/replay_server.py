@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from eva_cttv_pipeline.trait_mapping import replay
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Serve the Zooma, OLS and OxO responses recorded by bin/trait_mapping.py with '
+                    '--record-fixtures. Run the trait mapping pipeline against it with '
+                    '-z URL --ols-server URL/ols --oxo-server URL/spot/oxo')
+    parser.add_argument('-f', '--fixtures', required=True, help='File of recorded responses')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Minimum number of seconds before each response')
+    parser.add_argument('--latency-jitter', type=float, default=0.0,
+                        help='Maximum number of seconds added at random to the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Proportion of the requests answered with an error status')
+    parser.add_argument('--error-status', type=int, default=replay.ERROR_STATUS,
+                        help='Status of the error responses')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Seed of the random latencies and errors')
+    args = parser.parse_args()
+
+    server = replay.ReplayServer(replay.FixtureStore.load(args.fixtures), args.host, args.port,
+                                 args.latency, args.latency_jitter, args.error_rate,
+                                 args.error_status, args.seed)
+    print('Serving at {}'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.http_server.server_close()
@@ -3,6 +3,8 @@ import json
 import requests
 import sys
 
+from eva_cttv_pipeline.trait_mapping import http_client, response_cache
+
 
 class Trait:
 
@@ -31,6 +33,8 @@ class OntologyMapping:
 
 def main():
     parser = ArgParser(sys.argv)
+    if parser.cache_file is not None:
+        response_cache.configure(parser.cache_file, parser.cache_ttl_days, parser.cache_max_entries)
 
     # Read trait names from input file
     traits = read_traits(parser.input_filepath)
@@ -46,6 +50,7 @@ def main():
             else:
                 output_file.write("\tZOOMA_MAPPING_FAILED")
             output_file.write("\n")
+    response_cache.close()
 
 
 def read_traits(filepath):
@@ -70,17 +75,19 @@ def request_retry_helper(function, retry_count, url):
     return None
 
 
+@response_cache.cached('zooma')
 def zooma_query_helper(url):
     try:
-        json_response_1 = requests.get(url).json()
+        json_response_1 = http_client.get(url, service='zooma').json()
         return json_response_1
-    except json.decoder.JSONDecodeError as e:
+    except (json.decoder.JSONDecodeError, requests.RequestException) as e:
         return None
 
 
+@response_cache.cached('ols_label')
 def ols_query_helper(url):
     try:
-        json_response = requests.get(url).json()
+        json_response = http_client.get(url, service='ols').json()
         for term in json_response["_embedded"]["terms"]:
             if term["is_defining_ontology"]:
                 return term["label"]
@@ -166,6 +173,9 @@ class ArgParser:
         parser.add_argument("-r", dest="required", default="cttv,eva-clinvar,gwas", help="data sources to use in query.")
         parser.add_argument("-p", dest="preferred", default="eva-clinvar,cttv,gwas", help="preference for data sources, with preferred data source first.")
         parser.add_argument("-z", dest="zooma_host", default="http://snarf.ebi.ac.uk:8580", help="the host to use for querying zooma")  # alternate to default is https://www.ebi.ac.uk
+        parser.add_argument("--cache-file", dest="cache_file", default=None, help="path to an SQLite database caching the responses from Zooma and OLS between runs, shared with bin/trait_mapping.py")
+        parser.add_argument("--cache-ttl-days", dest="cache_ttl_days", type=float, default=response_cache.DEFAULT_TTL_DAYS, help="number of days after which cached responses expire")
+        parser.add_argument("--cache-max-entries", dest="cache_max_entries", type=int, default=response_cache.DEFAULT_MAX_ENTRIES, help="maximum number of responses kept in the cache")
 
         args = parser.parse_args(args=argv[1:])
 
@@ -176,6 +186,10 @@ class ArgParser:
 
         self.zooma_host = args.zooma_host
 
+        self.cache_file = args.cache_file
+        self.cache_ttl_days = args.cache_ttl_days
+        self.cache_max_entries = args.cache_max_entries
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,184 @@
+"""
+Random access to gzipped files of CellBase ClinVar JSONs, one record per line.
+
+A plain gzip file can only be read sequentially from the start. write_block_gzip() rewrites such a
+file as a series of independent gzip members of a fixed number of records each (which is still a
+valid gzip file, readable by all the existing tools), along with an index holding, for every
+record, its RCV accession, the byte offset of its gzip member and its line number in that member.
+With the index, iter_lines() can start reading at any record and find_line() can fetch a record by
+accession without decompressing the file from the start. Both also work without an index, by
+reading the file sequentially.
+
+The index ends with a line holding the size of the block gzip file and its last 8 bytes, the CRC32
+and size of the last gzip member, so that an index which does not match its file is not used,
+whatever the modification times of the files after they are copied.
+"""
+
+import contextlib
+import gzip
+import itertools
+import logging
+import os
+from array import array
+
+from eva_cttv_pipeline import json_backend
+
+logger = logging.getLogger(__package__)
+
+INDEX_SUFFIX = '.idx'
+# First field of the last line of the index, which describes the indexed file
+FILE_LINE_PREFIX = '#file'
+GZIP_TRAILER_SIZE = 8
+DEFAULT_RECORDS_PER_BLOCK = 1000
+
+
+def get_index_path(json_file):
+    return json_file + INDEX_SUFFIX
+
+
+def get_accession(clinvar_json):
+    # Originally "clinvarSet" was the top level of the CellBase JSON, but this level was removed
+    # and referenceClinVarAssertion is now the top level
+    if 'clinvarSet' in clinvar_json:
+        clinvar_json = clinvar_json['clinvarSet']
+    return clinvar_json['referenceClinVarAssertion']['clinVarAccession']['acc']
+
+
+def write_block_gzip(input_path, output_path, records_per_block=DEFAULT_RECORDS_PER_BLOCK):
+    """
+    Rewrite a file of ClinVar JSONs, gzipped or not, as a block gzip file with an index at
+    get_index_path(output_path). Returns the number of records written.
+    """
+    n_records = 0
+    member = b''
+    with _open(input_path) as input_file, open(output_path, 'wb') as output_file, \
+            open(get_index_path(output_path), 'wt') as index_file:
+        while True:
+            block = [line.rstrip('\n') for line in itertools.islice(input_file, records_per_block)]
+            if not block:
+                break
+            member_offset = output_file.tell()
+            member = gzip.compress(''.join(line + '\n' for line in block).encode())
+            output_file.write(member)
+            for line_in_member, line in enumerate(block):
+                accession = get_accession(json_backend.loads(line))
+                index_file.write('{}\t{}\t{}\n'.format(accession, member_offset, line_in_member))
+            n_records += len(block)
+        index_file.write('{}\t{}\t{}\n'.format(FILE_LINE_PREFIX, output_file.tell(),
+                                               member[-GZIP_TRAILER_SIZE:].hex()))
+    logger.info('{} records written to {} in blocks of {}'.format(
+        n_records, output_path, records_per_block))
+    return n_records
+
+
+class RecordIndex:
+
+    """Index of a block gzip file, as written by write_block_gzip"""
+
+    def __init__(self, index_path):
+        self.accessions = []
+        self.member_offsets = array('q')
+        self.lines_in_member = array('i')
+        # Size and last bytes of the indexed file, None for indexes written without them
+        self.file_size = None
+        self.gzip_trailer = None
+        with open(index_path, 'rt') as index_file:
+            for line in index_file:
+                accession, member_offset, line_in_member = line.rstrip('\n').split('\t')
+                if accession == FILE_LINE_PREFIX:
+                    self.file_size = int(member_offset)
+                    self.gzip_trailer = bytes.fromhex(line_in_member)
+                    continue
+                self.accessions.append(accession)
+                self.member_offsets.append(int(member_offset))
+                self.lines_in_member.append(int(line_in_member))
+        self._record_numbers = None
+
+    @classmethod
+    def for_file(cls, json_file):
+        """
+        Return the index of json_file, or None if it has no index or the index does not match the
+        size and the last bytes of the file
+        """
+        index_path = get_index_path(json_file)
+        if not os.path.exists(index_path):
+            return None
+        index = cls(index_path)
+        if index.file_size is None:
+            logger.warning('Ignoring index {} without the size of {}, write it again'.format(
+                index_path, json_file))
+            return None
+        if not index.matches(json_file):
+            logger.warning('Ignoring index {} which does not match {}'.format(index_path,
+                                                                             json_file))
+            return None
+        return index
+
+    def matches(self, json_file):
+        """Check that json_file has the size and the gzip trailer recorded in the index"""
+        if os.path.getsize(json_file) != self.file_size:
+            return False
+        with open(json_file, 'rb') as f:
+            f.seek(self.file_size - len(self.gzip_trailer))
+            return f.read() == self.gzip_trailer
+
+    def __len__(self):
+        return len(self.accessions)
+
+    def record_number(self, accession):
+        """Return the number of the record with the given accession, or None"""
+        if self._record_numbers is None:
+            self._record_numbers = {acc: n for n, acc in enumerate(self.accessions)}
+        return self._record_numbers.get(accession)
+
+
+def is_gzipped(json_file):
+    with open(json_file, 'rb') as f:
+        return f.read(2) == b'\x1f\x8b'
+
+
+@contextlib.contextmanager
+def _open(json_file, offset=0):
+    """Open a file in text mode, starting at the gzip member at offset if the file is gzipped"""
+    if not is_gzipped(json_file):
+        with open(json_file, 'rt') as f:
+            yield f
+        return
+    with open(json_file, 'rb') as raw_file:
+        raw_file.seek(offset)
+        with gzip.open(raw_file, 'rt') as f:
+            yield f
+
+
+def iter_lines(json_file, start=0, stop=None, index=None):
+    """
+    Yield the raw lines of the records numbered from start (included) to stop (excluded, or until
+    the end of the file if None), without their line break. If the index of a gzipped file is
+    given, reading starts at the gzip member holding the first record, instead of the start of the
+    file.
+    """
+    if stop is not None and stop <= start:
+        return
+    offset, skip = 0, start
+    if index is not None and start > 0 and is_gzipped(json_file):
+        if start >= len(index):
+            return
+        offset, skip = index.member_offsets[start], index.lines_in_member[start]
+    with _open(json_file, offset) as f:
+        lines = itertools.islice(f, skip, None if stop is None else skip + stop - start)
+        for line in lines:
+            yield line.rstrip('\n')
+
+
+def find_line(json_file, accession, index=None):
+    """Return the raw line of the record with the given RCV accession, or None"""
+    if index is not None:
+        record_number = index.record_number(accession)
+        if record_number is None:
+            return None
+        return next(iter_lines(json_file, record_number, record_number + 1, index), None)
+    quoted_accession = '"{}"'.format(accession)
+    for line in iter_lines(json_file):
+        if quoted_accession in line and get_accession(json_backend.loads(line)) == accession:
+            return line
+    return None
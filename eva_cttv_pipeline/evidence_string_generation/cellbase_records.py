@@ -1,22 +1,190 @@
 import json
+import re
 
-from eva_cttv_pipeline.evidence_string_generation import utilities
+from eva_cttv_pipeline import clinvar_json_index
+from eva_cttv_pipeline import json_backend
+from eva_cttv_pipeline.evidence_string_generation import clinvar
+from eva_cttv_pipeline.evidence_string_generation import trait
 
 
 class CellbaseRecords:
 
     """Assists in the requesting and iteration of clinvar cellbase records."""
 
-    def __init__(self, json_file):
+    def __init__(self, json_file, prefilter=None, start=0, stop=None):
         """
 
         :param json_file: Path to a file containing a list of json strings of the Clinvar records
         from Cellbase, one per line. This can be used to potentially save time since requests to
         Cellbase are subsequently not needed.
+        :param prefilter: Optional function called with each raw line, before it is decoded. Lines
+        for which it returns False are skipped and counted in n_prefiltered.
+        :param start: Number of the first record to iterate, starting from 0.
+        :param stop: Number of the record after the last one to iterate, or None to iterate until
+        the end of the file. If the file has an index written by clinvar_json_index, reading
+        starts directly at the first record.
         """
         self.json_file = json_file
+        self.prefilter = prefilter
+        self.start = start
+        self.stop = stop
+        self.n_prefiltered = 0
+        self._index = None
+
+    @property
+    def index(self):
+        """Index of the file from clinvar_json_index, or None if the file has no valid index"""
+        if self._index is None:
+            self._index = clinvar_json_index.RecordIndex.for_file(self.json_file) or False
+        return self._index or None
+
+    def lines(self, start=None, stop=None):
+        """
+        Yields the raw json strings of the records from start to stop (by default, those given to
+        the constructor) which pass the prefilter.
+        """
+        start = self.start if start is None else start
+        stop = self.stop if stop is None else stop
+        index = self.index if start > 0 else None
+        for line in clinvar_json_index.iter_lines(self.json_file, start, stop, index):
+            line = line.rstrip()
+            if self.prefilter is not None and not self.prefilter(line):
+                self.n_prefiltered += 1
+                continue
+            yield line
 
     def __iter__(self):
-        with utilities.open_file(self.json_file, "rt") as f:
-            for line in f:
-                yield json.loads(line.rstrip())
+        for line in self.lines():
+            yield json_backend.loads(line)
+
+    def iter_shards(self, shard_size):
+        """
+        Yields lists of up to shard_size json strings of consecutive records, without decoding
+        them, so that they can be decoded and processed in another process.
+        """
+        shard = []
+        for line in self.lines():
+            shard.append(line)
+            if len(shard) == shard_size:
+                yield shard
+                shard = []
+        if shard:
+            yield shard
+
+    def iter_shard_ranges(self, shard_size):
+        """
+        Yields (start, stop) ranges of up to shard_size consecutive records, which can be read
+        independently with lines(start, stop). Requires the file to have an index.
+        """
+        stop = len(self.index) if self.stop is None else min(self.stop, len(self.index))
+        for shard_start in range(self.start, stop, shard_size):
+            yield shard_start, min(shard_start + shard_size, stop)
+
+    def get_record(self, accession):
+        """Return the record with the given RCV accession, or None if it is not in the file"""
+        line = clinvar_json_index.find_line(self.json_file, accession, self.index)
+        return json_backend.loads(line) if line is not None else None
+
+
+class ClinicalSignificancePrefilter:
+
+    """
+    Prefilter for CellbaseRecords which drops the records whose clinical significance is not allowed
+    without decoding them. It finds the description of every clinicalSignificance object in the raw
+    line (from the reference assertion and from the submitted assertions), and only drops the line
+    when all of them could be read and none of them is allowed. Lines which can't be checked this
+    way are kept, so no record which would generate evidence strings is ever dropped.
+
+    Records skipped because of their clinical significance still add to the counters and outputs of
+    the Report, through their nsvs, their multiple allele origins and their unmapped traits. So that
+    the Report is the same with and without the prefilter, a line is also kept if it may have any
+    of those: if it contains an nsv or esv identifier, if it has more than one allele origin, or if
+    one of the traits of the reference assertion has no mapping. The traits are found by decoding
+    only the traitSet of the reference assertion.
+    """
+
+    clinical_significance_regex = re.compile(r'"clinicalSignificance"\s*:')
+    # The description is either a string or a list of strings, and must be found before any nested
+    # object or list of the clinicalSignificance object
+    description_regex = re.compile(
+        r'"clinicalSignificance"\s*:\s*\{[^{}\[\]]*?"description"\s*:\s*'
+        r'("(?:[^"\\]|\\.)*"|\[\s*"(?:[^"\\]|\\.)*"(?:\s*,\s*"(?:[^"\\]|\\.)*")*\s*\])')
+    # Any string starting like a dbVar nsv or esv identifier
+    nsv_regex = re.compile(r'"[ne]sv', re.IGNORECASE)
+    origin_key_regex = re.compile(r'"origin"\s*:')
+    origin_regex = re.compile(r'"origin"\s*:\s*("(?:[^"\\]|\\.)*")')
+    reference_assertion_regex = re.compile(r'"referenceClinVarAssertion"\s*:')
+    clinvar_assertion_regex = re.compile(r'"clinVarAssertion"\s*:')
+    trait_set_regex = re.compile(r'"traitSet"\s*:\s*')
+
+    def __init__(self, allowed_clinical_significance, trait_2_efo):
+        """
+        :param allowed_clinical_significance: Clinical significances in lower case, as used by
+        clinvar_to_evidence_strings.skip_record.
+        :param trait_2_efo: Mappings of the trait names, as used by
+        clinvar_to_evidence_strings.create_traits.
+        """
+        self.allowed_clinical_significance = set(allowed_clinical_significance)
+        self.trait_2_efo = trait_2_efo
+        self.decoder = json.JSONDecoder()
+
+    def __call__(self, line):
+        return (self.has_allowed_clinical_significance(line) or self.has_nsv(line) or
+                self.has_multiple_allele_origins(line) or self.has_unmapped_traits(line))
+
+    def has_allowed_clinical_significance(self, line):
+        descriptions = self.description_regex.findall(line)
+        if len(descriptions) != len(self.clinical_significance_regex.findall(line)):
+            return True
+        for description in descriptions:
+            values = json_backend.loads(description)
+            if isinstance(values, str):
+                values = [values]
+            if any(value.lower() in self.allowed_clinical_significance for value in values):
+                return True
+        return False
+
+    def has_nsv(self, line):
+        return self.nsv_regex.search(line) is not None
+
+    def has_multiple_allele_origins(self, line):
+        origins = self.origin_regex.findall(line)
+        if len(origins) != len(self.origin_key_regex.findall(line)):
+            return True
+        return len({json_backend.loads(origin).lower() for origin in origins}) > 1
+
+    def has_unmapped_traits(self, line):
+        trait_set = self.get_reference_trait_set(line)
+        if not isinstance(trait_set, dict) or not isinstance(trait_set.get('trait'), list):
+            return True
+        try:
+            for clinvar_trait in trait_set['trait']:
+                name_list = clinvar.get_trait_names(clinvar_trait)
+                if not trait.map_efo(self.trait_2_efo, name_list)[1]:
+                    return True
+        except (KeyError, TypeError, AttributeError):
+            return True
+        return False
+
+    def get_reference_trait_set(self, line):
+        """
+        Decode only the traitSet of the reference assertion, or return None if it can't be told
+        apart from the traitSets of the submitted assertions.
+        """
+        reference_matches = list(self.reference_assertion_regex.finditer(line))
+        clinvar_assertion_matches = list(self.clinvar_assertion_regex.finditer(line))
+        if len(reference_matches) != 1 or len(clinvar_assertion_matches) != 1:
+            return None
+        # The reference assertion ends where the submitted assertions start, if they come after it
+        reference_start = reference_matches[0].end()
+        reference_stop = clinvar_assertion_matches[0].start()
+        if reference_stop < reference_start:
+            reference_stop = len(line)
+        trait_set_matches = list(self.trait_set_regex.finditer(line, reference_start,
+                                                               reference_stop))
+        if len(trait_set_matches) != 1:
+            return None
+        try:
+            return self.decoder.raw_decode(line, trait_set_matches[0].end())[0]
+        except ValueError:
+            return None
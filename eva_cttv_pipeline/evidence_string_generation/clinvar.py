@@ -5,7 +5,9 @@ from collections import UserDict
 class ClinvarRecord(UserDict):
     """
     Class of which instances hold data on individual clinvar records. Subclass of UserDict rather
-    than dict in order to use attributes
+    than dict in order to use attributes.
+    The fields are parsed from the record once and then memoized, since they are accessed many
+    times while generating the evidence strings. The record data must not be modified afterwards.
     """
 
     score_map = {
@@ -18,6 +20,17 @@ class ClinvarRecord(UserDict):
 
     def __init__(self, cellbase_dict):
         UserDict.__init__(self, cellbase_dict)
+        # Fields parsed from the record the first time they are accessed, see the properties
+        self._date = None
+        self._accession = None
+        self._clinical_significance = None
+        self._traits = None
+        self._trait_pubmed_refs = None
+        self._trait_refs_list = None
+        self._observed_pubmed_refs = None
+        self._observed_refs_list = None
+        self._allele_origins = None
+
         if "measureSet" in self.data['referenceClinVarAssertion']:
             measure_list = self.data['referenceClinVarAssertion']["measureSet"]["measure"]
         elif "measureSet" in self.data['referenceClinVarAssertion']["genotypeSet"]:
@@ -32,8 +45,10 @@ class ClinvarRecord(UserDict):
 
     @property
     def date(self):
-        return datetime.utcfromtimestamp(
-            self.data['referenceClinVarAssertion']['dateLastUpdated'] / 1000).isoformat()
+        if self._date is None:
+            self._date = datetime.utcfromtimestamp(
+                self.data['referenceClinVarAssertion']['dateLastUpdated'] / 1000).isoformat()
+        return self._date
 
     @property
     def score(self):
@@ -43,98 +58,126 @@ class ClinvarRecord(UserDict):
 
     @property
     def accession(self):
-        return self.data['referenceClinVarAssertion']['clinVarAccession']['acc']
+        if self._accession is None:
+            self._accession = self.data['referenceClinVarAssertion']['clinVarAccession']['acc']
+        return self._accession
 
-    @property
-    def traits(self):
+    def _parse_traits(self):
+        """Extract the trait names and the PubMed references of the traits in one pass"""
         trait_list = []
-        for trait in self.data['referenceClinVarAssertion']['traitSet']['trait']:
-            trait_list.append([])
-            for name in trait['name']:
-                # First trait name in the list will always be the "Preferred" one
-                if name['elementValue']['type'] == 'Preferred':
-                    trait_list[-1] = [name['elementValue']['value']] + trait_list[-1]
-                elif name['elementValue']['type'] in ["EFO URL", "EFO id", "EFO name"]:
-                    continue  # if the trait name not originally from clinvar
-                else:
-                    trait_list[-1].append(name['elementValue']['value'])
-
-        return trait_list
-
-    @property
-    def trait_pubmed_refs(self):
         pubmed_refs_list = []
         for trait in self.data['referenceClinVarAssertion']['traitSet']['trait']:
+            trait_list.append(get_trait_names(trait))
+
             pubmed_refs_list.append([])
             if 'citation' in trait:
-                for citation in trait['citation']:
-                    if ('id' in citation) and citation['id'] is not None:
-                        for citation_id in citation['id']:
-                            if citation_id['source'] == 'PubMed':
-                                pubmed_refs_list[-1].append(int(citation_id['value']))
+                pubmed_refs_list[-1].extend(get_pubmed_refs(trait['citation']))
+
+        self._traits = trait_list
+        self._trait_pubmed_refs = pubmed_refs_list
+
+    @property
+    def traits(self):
+        if self._traits is None:
+            self._parse_traits()
+        return self._traits
 
-        return pubmed_refs_list
+    @property
+    def trait_pubmed_refs(self):
+        if self._trait_pubmed_refs is None:
+            self._parse_traits()
+        return self._trait_pubmed_refs
 
     @property
     def observed_pubmed_refs(self):
-        pubmed_refs_list = []
-        if 'observedIn' in self.data['referenceClinVarAssertion']:
-            for observed_in in self.data['referenceClinVarAssertion']['observedIn']:
-                for observed_data in observed_in['observedData']:
-                    if 'citation' in observed_data:
-                        for citation in observed_data['citation']:
-                            if ('id' in citation) and citation['id'] is not None:
-                                for citation_id in citation['id']:
-                                    if citation_id['source'] == 'PubMed':
-                                        pubmed_refs_list.append(int(citation_id['value']))
-        return pubmed_refs_list
+        if self._observed_pubmed_refs is None:
+            pubmed_refs_list = []
+            if 'observedIn' in self.data['referenceClinVarAssertion']:
+                for observed_in in self.data['referenceClinVarAssertion']['observedIn']:
+                    for observed_data in observed_in['observedData']:
+                        if 'citation' in observed_data:
+                            pubmed_refs_list.extend(get_pubmed_refs(observed_data['citation']))
+            self._observed_pubmed_refs = pubmed_refs_list
+        return self._observed_pubmed_refs
 
     @property
     def trait_refs_list(self):
-        return [['http://europepmc.org/abstract/MED/' + str(ref) for ref in ref_list]
-                for ref_list in self.trait_pubmed_refs]
+        if self._trait_refs_list is None:
+            self._trait_refs_list = [get_europepmc_urls(ref_list)
+                                     for ref_list in self.trait_pubmed_refs]
+        return self._trait_refs_list
 
     @property
     def observed_refs_list(self):
-        return ['http://europepmc.org/abstract/MED/' + str(ref)
-                for ref in self.observed_pubmed_refs]
+        if self._observed_refs_list is None:
+            self._observed_refs_list = get_europepmc_urls(self.observed_pubmed_refs)
+        return self._observed_refs_list
 
     @property
     def clinical_significance(self):
-        return \
-            self.data['referenceClinVarAssertion']['clinicalSignificance']['description']
+        if self._clinical_significance is None:
+            self._clinical_significance = \
+                self.data['referenceClinVarAssertion']['clinicalSignificance']['description']
+        return self._clinical_significance
 
     @property
     def allele_origins(self):
-        allele_origins = set()
-        for clinvar_assertion_document in self.data['clinVarAssertion']:
-            for observed_in_document in clinvar_assertion_document['observedIn']:
-                allele_origins.add(observed_in_document['sample']['origin'].lower())
-
-        return list(allele_origins)
+        if self._allele_origins is None:
+            allele_origins = set()
+            for clinvar_assertion_document in self.data['clinVarAssertion']:
+                for observed_in_document in clinvar_assertion_document['observedIn']:
+                    allele_origins.add(observed_in_document['sample']['origin'].lower())
+            self._allele_origins = list(allele_origins)
+        return self._allele_origins
 
 
 class ClinvarRecordMeasure(UserDict):
+    """
+    Class of which instances hold data on the measures of a clinvar record. The xrefs, citations
+    and GRCh38 sequence location are parsed once on creation.
+    """
+
+    sequence_location_attributes = ('chr', 'start', 'stop', 'referenceAllele', 'alternateAllele')
 
     def __init__(self, clinvar_measure_dict, clinvar_record):
         UserDict.__init__(self, clinvar_measure_dict)
         self.clinvar_record = clinvar_record
+        self._parse_xrefs()
+        self._parse_sequence_location()
+        self._pubmed_refs = get_pubmed_refs(self.data['citation']) \
+            if 'citation' in self.data else []
+        self._refs_list = get_europepmc_urls(self._pubmed_refs)
+
+    def _parse_xrefs(self):
+        """Find the first dbSNP and the first dbVar nsv/esv identifiers among the xrefs"""
+        self._rs_id = None
+        self._nsv_id = None
+        for xref in self.data.get("xref", ()):
+            db = xref["db"].lower()
+            if db == "dbsnp" and self._rs_id is None:
+                self._rs_id = "rs{}".format(xref["id"])
+            elif db == "dbvar" and self._nsv_id is None \
+                    and xref["id"].lower()[:3] in ("nsv", "esv"):
+                self._nsv_id = xref["id"]
+
+    def _parse_sequence_location(self):
+        """
+        Each attribute is taken from the first GRCh38 sequence location which has it.
+        """
+        self._sequence_location = {}
+        for sequence_location in self.data.get("sequenceLocation", ()):
+            if sequence_location["assembly"].lower() == "grch38":
+                for attr in self.sequence_location_attributes:
+                    if attr not in self._sequence_location and attr in sequence_location:
+                        self._sequence_location[attr] = sequence_location[attr]
 
     @property
     def rs_id(self):
-        if "xref" in self.data:
-            for xref in self.data["xref"]:
-                if xref["db"].lower() == "dbsnp":
-                    return "rs{}".format(xref["id"])
-        return None
+        return self._rs_id
 
     @property
     def nsv_id(self):
-        if "xref" in self.data:
-            for xref in self.data["xref"]:
-                if xref["db"].lower() == "dbvar" and xref["id"].lower()[:3] in ("nsv", "esv"):
-                    return xref["id"]
-        return None
+        return self._nsv_id
 
     @property
     def hgvs(self):
@@ -151,45 +194,57 @@ class ClinvarRecordMeasure(UserDict):
 
     @property
     def pubmed_refs(self):
-        pubmed_refs_list = []
-        if 'citation' in self.data:
-            for citation in self.data['citation']:
-                if 'id' in citation and citation['id'] is not None:
-                    for citation_id in citation['id']:
-                        if citation_id['source'] == 'PubMed':
-                            pubmed_refs_list.append(int(citation_id['value']))
-        return pubmed_refs_list
+        return self._pubmed_refs
 
     @property
     def refs_list(self):
-        return ['http://europepmc.org/abstract/MED/' + str(ref)
-                for ref in self.pubmed_refs]
+        return self._refs_list
 
     @property
     def chr(self):
-        return self.sequence_location_helper("chr")
+        return self._sequence_location.get("chr")
 
     @property
     def start(self):
-        return self.sequence_location_helper("start")
+        return self._sequence_location.get("start")
 
     @property
     def stop(self):
-        return self.sequence_location_helper("stop")
+        return self._sequence_location.get("stop")
 
     @property
     def ref(self):
-        return self.sequence_location_helper("referenceAllele")
+        return self._sequence_location.get("referenceAllele")
 
     @property
     def alt(self):
-        return self.sequence_location_helper("alternateAllele")
+        return self._sequence_location.get("alternateAllele")
+
+
+def get_trait_names(trait):
+    """Return the names of a ClinVar trait, the "Preferred" one first"""
+    names = []
+    for name in trait['name']:
+        # First trait name in the list will always be the "Preferred" one
+        if name['elementValue']['type'] == 'Preferred':
+            names = [name['elementValue']['value']] + names
+        elif name['elementValue']['type'] in ["EFO URL", "EFO id", "EFO name"]:
+            continue  # if the trait name not originally from clinvar
+        else:
+            names.append(name['elementValue']['value'])
+    return names
+
+
+def get_pubmed_refs(citations):
+    """Return the PubMed identifiers of a list of ClinVar citations, as integers"""
+    pubmed_refs_list = []
+    for citation in citations:
+        if 'id' in citation and citation['id'] is not None:
+            for citation_id in citation['id']:
+                if citation_id['source'] == 'PubMed':
+                    pubmed_refs_list.append(int(citation_id['value']))
+    return pubmed_refs_list
 
-    def sequence_location_helper(self, attr):
-        if "sequenceLocation" in self.data:
-            for sequence_location in self.data["sequenceLocation"]:
-                if sequence_location["assembly"].lower() == "grch38":
-                    if attr in sequence_location:
-                        return sequence_location[attr]
-        return None
 
+def get_europepmc_urls(pubmed_refs):
+    return ['http://europepmc.org/abstract/MED/' + str(ref) for ref in pubmed_refs]
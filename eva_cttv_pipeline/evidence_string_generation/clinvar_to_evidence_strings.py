@@ -2,20 +2,25 @@ import logging
 import itertools
 import copy
 import json
+import multiprocessing
 import sys
 import os
-from collections import defaultdict
+import time
+import zlib
+from collections import defaultdict, deque
 from time import gmtime, strftime
 from types import SimpleNamespace
 
 import jsonschema
 
+from eva_cttv_pipeline import json_backend
 from eva_cttv_pipeline.evidence_string_generation import cellbase_records
 from eva_cttv_pipeline.evidence_string_generation import config
 from eva_cttv_pipeline.evidence_string_generation import evidence_strings
 from eva_cttv_pipeline.evidence_string_generation import clinvar
 from eva_cttv_pipeline.evidence_string_generation import utilities
 from eva_cttv_pipeline.evidence_string_generation import consequence_type as CT
+from eva_cttv_pipeline.evidence_string_generation import mapping_cache
 from eva_cttv_pipeline.evidence_string_generation import trait
 
 logger = logging.getLogger(__package__)
@@ -24,24 +29,30 @@ logger = logging.getLogger(__package__)
 class Report:
 
     """
-    Holds counters and other records of a pipeline run. Includes the list of evidence strings
-    generated in the running of the pipeline.
+    Holds counters and other records of a pipeline run. Unless an OutputWriter is provided, also
+    includes the list of evidence strings generated in the running of the pipeline. When an
+    OutputWriter is provided, evidence strings, Zooma records and nsv ids are written out as soon
+    as they are added, and only counters and sets of distinct values are kept in memory.
     Includes method to write to output files, and __str__ shows the summary of the report.
     One instance of this class is instantiated in the running of the pipeline.
     """
 
-    def __init__(self, trait_mappings=None):
+    def __init__(self, trait_mappings=None, output_writer=None, validation_policy=None):
         if trait_mappings is None:
             self.trait_mappings = {}
         else:
             self.trait_mappings = copy.deepcopy(trait_mappings)
 
+        self.output_writer = output_writer
+        self.validation_policy = validation_policy or ValidationPolicy()
+
         self.unrecognised_clin_sigs = set()
         self.ensembl_gene_id_uris = set()
         self.traits = set()
         self.n_unrecognised_allele_origin = defaultdict(int)
         self.nsv_list = []
         self.unmapped_traits = defaultdict(int)
+        self.used_trait_names = set()
         self.evidence_string_list = []
         self.evidence_list = []  # To store Helen Parkinson records of the form
         self.counters = self.__get_counters()
@@ -50,7 +61,9 @@ class Report:
 
         report_strings = [
             str(self.counters["record_counter"]) + ' ClinVar records in total',
-            str(len(self.evidence_string_list)) + ' evidence string jsons generated',
+            str(self.counters["n_prefiltered"]) +
+            ' ClinVar records skipped before decoding by the clinical significance prefilter',
+            str(self.counters["n_evidence_strings"]) + ' evidence string jsons generated',
             str(self.counters["n_processed_clinvar_records"]) +
             ' ClinVar records generated at least one evidence string',
             str(len(self.unrecognised_clin_sigs)) +
@@ -102,16 +115,35 @@ class Report:
             str(self.counters["n_nsv_skipped_clin_sig"]) +
             ' ClinVar nsvs were skipped because of a different clinical significance',
             str(self.counters["n_nsv_skipped_wrong_ref_alt"]) +
-            ' ClinVar nsvs were skipped because of same ref and alt'
+            ' ClinVar nsvs were skipped because of same ref and alt',
+            str(self.counters["n_validated_evidence_strings"]) +
+            ' evidence strings were validated against the OpenTargets schema (validation policy: ' +
+            str(self.validation_policy) + ') in {:.2f} seconds'.format(
+                self.counters["validation_seconds"]),
+            str(self.counters["n_evidence_strings"] -
+                self.counters["n_validated_evidence_strings"]) +
+            ' evidence strings were not validated because of the validation policy'
         ])
 
         return '\n'.join(report_strings)
 
     def add_evidence_string(self, ev_string, clinvar_record, trait, ensembl_gene_id,
-                            ot_schema_contents):
-        try:
-            ev_string.validate(ot_schema_contents)
+                            ot_schema_validator):
+        if self.validation_policy.should_validate(ev_string):
+            self.validate_evidence_string(ev_string, clinvar_record, trait, ensembl_gene_id,
+                                          ot_schema_validator)
+
+        self.counters["n_evidence_strings"] += 1
+        if self.output_writer is not None:
+            self.output_writer.write_evidence_string(ev_string)
+        else:
             self.evidence_string_list.append(ev_string)
+
+    def validate_evidence_string(self, ev_string, clinvar_record, trait, ensembl_gene_id,
+                                 ot_schema_validator):
+        start_time = time.perf_counter()
+        try:
+            ev_string.validate(ot_schema_validator)
         except jsonschema.exceptions.ValidationError as err:
             print('Error: evidence_string does not validate against schema.')
             # print('ClinVar accession: ' + record.clinvarRecord.accession)
@@ -124,9 +156,40 @@ class Report:
         except jsonschema.exceptions.SchemaError as err:
             print('Error: OpenTargets schema file is invalid')
             sys.exit(1)
+        self.counters["n_validated_evidence_strings"] += 1
+        self.counters["validation_seconds"] += time.perf_counter() - start_time
+
+    def add_evidence_record(self, evidence_record):
+        """Add a record of the form [accession, rs id, trait name, ontology id] for Zooma"""
+        if self.output_writer is not None:
+            self.output_writer.write_zooma_record(evidence_record)
+        else:
+            self.evidence_list.append(evidence_record)
+
+    def add_nsv(self, nsv):
+        if self.output_writer is not None:
+            self.output_writer.write_nsv(nsv)
+        else:
+            self.nsv_list.append(nsv)
 
     def write_output(self, dir_out):
-        write_string_list_to_file(self.nsv_list, dir_out + '/' + config.NSV_LIST_FILE)
+        """
+        Write all the output files. If evidence strings have been written as they were generated,
+        only complete the output files with the records that are known at the end of the run.
+        """
+        if self.output_writer is not None:
+            output_writer = self.output_writer
+        else:
+            output_writer = OutputWriter(dir_out)
+            for nsv in self.nsv_list:
+                output_writer.write_nsv(nsv)
+            for evidence_string in self.evidence_string_list:
+                output_writer.write_evidence_string(evidence_string)
+            for evidence_record in self.evidence_list:
+                output_writer.write_zooma_record(evidence_record)
+
+        output_writer.write_extra_traits(self.trait_mappings)
+        output_writer.close()
 
         # Contains traits without a mapping in Gary's xls
         with utilities.open_file(dir_out + '/' + config.UNMAPPED_TRAITS_FILE_NAME, 'wt') as fdw:
@@ -135,25 +198,131 @@ class Report:
                 fdw.write(str(trait_list) + '\t' +
                           str(self.unmapped_traits[trait_list]) + '\n')
 
-        with utilities.open_file(dir_out + '/' + config.EVIDENCE_STRINGS_FILE_NAME, 'wt') as fdw:
-            for evidence_string in self.evidence_string_list:
-                fdw.write(json.dumps(evidence_string) + '\n')
+    def remove_trait_mapping(self, trait_name):
+        self.used_trait_names.add(trait_name)
+        if trait_name in self.trait_mappings:
+            del self.trait_mappings[trait_name]
 
-        self.write_zooma_file(dir_out)
+    def merge(self, other):
+        """
+        Add the counters and records of another report, which has been generated by processing a
+        shard of the ClinVar records in a worker process and has its evidence strings serialised.
+        """
+        for counter_name, value in other.counters.items():
+            self.counters[counter_name] += value
+        self.unrecognised_clin_sigs.update(other.unrecognised_clin_sigs)
+        self.ensembl_gene_id_uris.update(other.ensembl_gene_id_uris)
+        self.traits.update(other.traits)
+        for allele_origin, count in other.n_unrecognised_allele_origin.items():
+            self.n_unrecognised_allele_origin[allele_origin] += count
+        for trait_name, count in other.unmapped_traits.items():
+            self.unmapped_traits[trait_name] += count
+        for trait_name in other.used_trait_names:
+            self.remove_trait_mapping(trait_name)
+
+        for nsv in other.nsv_list:
+            self.add_nsv(nsv)
+        for evidence_string_json in other.evidence_string_list:
+            self.output_writer.write_evidence_string_json(evidence_string_json)
+        for evidence_record in other.evidence_list:
+            self.add_evidence_record(evidence_record)
 
-    def write_zooma_file(self, dir_out):
-        """Write zooma records to zooma file"""
-        with utilities.open_file(os.path.join(dir_out, config.ZOOMA_FILE_NAME), "wt") as zooma_fh:
 
-            zooma_fh.write("STUDY\tBIOENTITY\tPROPERTY_TYPE\tPROPERTY_VALUE\tSEMANTIC_TAG\tANNOTATOR\tANNOTATION_DATE\n")
-            date = strftime("%d/%m/%y %H:%M", gmtime())
-            for evidence_record in self.evidence_list:
-                self.write_zooma_record_to_zooma_file(evidence_record, zooma_fh, date)
+    @staticmethod
+    def __get_counters():
+        return {"n_processed_clinvar_records": 0,
+                "n_pathogenic_no_rs": 0,
+                "n_multiple_evidence_strings": 0,
+                "n_multiple_allele_origin": 0,
+                "n_germline_somatic": 0,
+                "n_records_no_recognised_allele_origin": 0,
+                "no_variant_to_ensg_mapping": 0,
+                "n_more_than_one_efo_term": 0,
+                "n_same_ref_alt": 0,
+                "n_missed_strings_unmapped_traits": 0,
+                "n_nsvs": 0,
+                "n_valid_rs_and_nsv": 0,
+                "n_nsv_skipped_clin_sig": 0,
+                "n_nsv_skipped_wrong_ref_alt": 0,
+                "record_counter": 0,
+                "n_prefiltered": 0,
+                "n_total_clinvar_records": 0,
+                "n_evidence_strings": 0,
+                "n_validated_evidence_strings": 0,
+                "validation_seconds": 0.0}
+
+
+class ValidationPolicy:
+
+    """
+    Decides which evidence strings are validated against the OpenTargets schema. The policy can be:
+    * 'all': validate every evidence string;
+    * 'sample': validate a deterministic sample of the evidence strings, of about sample_rate of
+      them, selected using a checksum of their unique association fields;
+    * 'first': validate only the first first_n evidence strings of each type (genetics and
+      somatic). When records are processed in parallel, this applies to each worker process.
+    """
+
+    POLICIES = ('all', 'sample', 'first')
+
+    def __init__(self, policy='all', sample_rate=0.01, first_n=1000):
+        if policy not in self.POLICIES:
+            raise ValueError('Unknown validation policy: {}'.format(policy))
+        self.policy = policy
+        self.sample_rate = sample_rate
+        self.first_n = first_n
+        self.n_seen_per_type = defaultdict(int)
+
+    def __str__(self):
+        if self.policy == 'sample':
+            return 'sample of {}'.format(self.sample_rate)
+        if self.policy == 'first':
+            return 'first {} of each type'.format(self.first_n)
+        return self.policy
+
+    def should_validate(self, evidence_string):
+        if self.policy == 'sample':
+            unique_fields = json.dumps(evidence_string['unique_association_fields'],
+                                       sort_keys=True)
+            return zlib.crc32(unique_fields.encode()) / 2**32 < self.sample_rate
+        if self.policy == 'first':
+            evidence_string_type = type(evidence_string).__name__
+            self.n_seen_per_type[evidence_string_type] += 1
+            return self.n_seen_per_type[evidence_string_type] <= self.first_n
+        return True
+
 
-            for trait_name, ontology_tuple_list in self.trait_mappings.items():
-                self.write_extra_trait_to_zooma_file(ontology_tuple_list, trait_name, date, zooma_fh)
+class OutputWriter:
 
-    def write_zooma_record_to_zooma_file(self, evidence_record, zooma_fh, date):
+    """
+    Writes evidence strings, Zooma records and nsv ids to the output files as soon as they are
+    generated, so that they do not need to be kept in memory until the end of the run.
+    """
+
+    def __init__(self, dir_out):
+        self.evidence_strings_file = utilities.open_file(
+            os.path.join(dir_out, config.EVIDENCE_STRINGS_FILE_NAME), 'wt')
+        self.nsv_file = utilities.open_file(os.path.join(dir_out, config.NSV_LIST_FILE), 'wt')
+        self.zooma_file = utilities.open_file(os.path.join(dir_out, config.ZOOMA_FILE_NAME), 'wt')
+        self.zooma_file.write("STUDY\tBIOENTITY\tPROPERTY_TYPE\tPROPERTY_VALUE\tSEMANTIC_TAG\t"
+                              "ANNOTATOR\tANNOTATION_DATE\n")
+        self.date = strftime("%d/%m/%y %H:%M", gmtime())
+        self.n_nsvs = 0
+
+    def write_evidence_string(self, evidence_string):
+        self.write_evidence_string_json(json_backend.dumps(evidence_string))
+
+    def write_evidence_string_json(self, evidence_string_json):
+        self.evidence_strings_file.write(evidence_string_json + '\n')
+
+    def write_nsv(self, nsv):
+        # nsv ids are separated by newlines, with no newline after the last one
+        if self.n_nsvs > 0:
+            self.nsv_file.write('\n')
+        self.nsv_file.write(nsv)
+        self.n_nsvs += 1
+
+    def write_zooma_record(self, evidence_record):
         """Write an zooma record to zooma file"""
         evidence_record_to_output = ['.' if ele is None else ele for ele in evidence_record]
 
@@ -168,58 +337,44 @@ class Report:
                              evidence_record_to_output[2],
                              evidence_record_to_output[3],
                              "eva",
-                             date]
+                             self.date]
 
-        zooma_fh.write('\t'.join(zooma_output_list) + '\n')
+        self.zooma_file.write('\t'.join(zooma_output_list) + '\n')
 
-    def write_extra_trait_to_zooma_file(self, ontology_tuple_list, trait_name, date, zooma_fh):
+    def write_extra_traits(self, trait_mappings):
         """Write the trait name to ontology mappings, which weren't used in any evidence string, to
         zooma file """
-        for ontology_tuple in ontology_tuple_list:
-            zooma_output_list = ["",
-                                 "",
-                                 "disease",
-                                 trait_name,
-                                 ontology_tuple[0],
-                                 "eva",
-                                 date]
+        for trait_name, ontology_tuple_list in trait_mappings.items():
+            for ontology_tuple in ontology_tuple_list:
+                zooma_output_list = ["",
+                                     "",
+                                     "disease",
+                                     trait_name,
+                                     ontology_tuple[0],
+                                     "eva",
+                                     self.date]
 
-            zooma_fh.write('\t'.join(zooma_output_list) + '\n')
+                self.zooma_file.write('\t'.join(zooma_output_list) + '\n')
 
-    def remove_trait_mapping(self, trait_name):
-        if trait_name in self.trait_mappings:
-            del self.trait_mappings[trait_name]
-
-
-    @staticmethod
-    def __get_counters():
-        return {"n_processed_clinvar_records": 0,
-                "n_pathogenic_no_rs": 0,
-                "n_multiple_evidence_strings": 0,
-                "n_multiple_allele_origin": 0,
-                "n_germline_somatic": 0,
-                "n_records_no_recognised_allele_origin": 0,
-                "no_variant_to_ensg_mapping": 0,
-                "n_more_than_one_efo_term": 0,
-                "n_same_ref_alt": 0,
-                "n_missed_strings_unmapped_traits": 0,
-                "n_nsvs": 0,
-                "n_valid_rs_and_nsv": 0,
-                "n_nsv_skipped_clin_sig": 0,
-                "n_nsv_skipped_wrong_ref_alt": 0,
-                "record_counter": 0,
-                "n_total_clinvar_records": 0}
+    def close(self):
+        self.evidence_strings_file.close()
+        self.nsv_file.close()
+        self.zooma_file.close()
 
 
 def launch_pipeline(dir_out, allowed_clinical_significance, efo_mapping_file,
-                    snp_2_gene_file, json_file, ot_schema):
+                    snp_2_gene_file, json_file, ot_schema, streaming=False, workers=1,
+                    validation_policy=None, cache_dir=None, prefilter=False):
 
     allowed_clinical_significance = (allowed_clinical_significance.split(',')
                                      if allowed_clinical_significance
                                      else get_default_allowed_clinical_significance())
-    mappings = get_mappings(efo_mapping_file, snp_2_gene_file)
+    mappings = get_mappings(efo_mapping_file, snp_2_gene_file, cache_dir)
+    # Evidence strings serialised by worker processes are always written out as they arrive
+    output_writer = OutputWriter(dir_out) if streaming or workers > 1 else None
     report = clinvar_to_evidence_strings(allowed_clinical_significance, mappings, json_file,
-                                         ot_schema)
+                                         ot_schema, output_writer, workers, validation_policy,
+                                         prefilter)
     output(report, dir_out)
 
 
@@ -228,66 +383,206 @@ def output(report, dir_out):
     print(report)
 
 
-def clinvar_to_evidence_strings(allowed_clinical_significance, mappings, json_file, ot_schema):
-    report = Report(trait_mappings=mappings.trait_2_efo)
-    cell_recs = cellbase_records.CellbaseRecords(json_file=json_file)
+def clinvar_to_evidence_strings(allowed_clinical_significance, mappings, json_file, ot_schema,
+                                output_writer=None, workers=1, validation_policy=None,
+                                prefilter=False):
+    """
+    Generate the evidence strings for all the records in json_file.
+
+    If prefilter is True, the records whose clinical significance is not allowed are dropped before
+    being decoded, unless they have nsvs, multiple allele origins or unmapped traits which are
+    recorded even for the skipped records. The outputs and the counters are the same as without the
+    prefilter, apart from n_prefiltered.
+    """
+    report = Report(trait_mappings=mappings.trait_2_efo, output_writer=output_writer,
+                    validation_policy=validation_policy)
+    cell_recs = cellbase_records.CellbaseRecords(
+        json_file=json_file,
+        prefilter=(cellbase_records.ClinicalSignificancePrefilter(allowed_clinical_significance,
+                                                                  mappings.trait_2_efo)
+                   if prefilter else None))
     ot_schema_contents = json.loads(open(ot_schema).read())
+    ot_schema_validator = get_ot_schema_validator(ot_schema_contents)
+
+    if workers > 1:
+        process_shards_in_parallel(cell_recs, report, allowed_clinical_significance, mappings,
+                                   ot_schema_contents, workers, report.validation_policy)
+        add_prefiltered_records(report, cell_recs)
+        return report
+
     for cellbase_record in cell_recs:
         report.counters["record_counter"] += 1
         if report.counters["record_counter"] % 1000 == 0:
             print("{} records processed".format(report.counters["record_counter"]))
+        process_cellbase_record(cellbase_record, report, allowed_clinical_significance, mappings,
+                                ot_schema_validator)
+    add_prefiltered_records(report, cell_recs)
+
+    return report
 
-        n_ev_strings_per_record = 0
-        clinvar_record = clinvar.ClinvarRecord(cellbase_record['clinvarSet'])
-
-        for clinvar_record_measure in clinvar_record.measures:
-            report.counters["n_nsvs"] += (clinvar_record_measure.nsv_id is not None)
-            append_nsv(report.nsv_list, clinvar_record_measure)
-            report.counters["n_multiple_allele_origin"] += (len(clinvar_record.allele_origins) > 1)
-            traits = create_traits(clinvar_record.traits, mappings.trait_2_efo, report)
-            converted_allele_origins = convert_allele_origins(clinvar_record.allele_origins)
-
-            for consequence_type, trait, allele_origin in itertools.product(
-                    get_consequence_types(clinvar_record_measure, mappings.consequence_type_dict),
-                    traits,
-                    converted_allele_origins):
-
-                if skip_record(clinvar_record, clinvar_record_measure, consequence_type, allele_origin,
-                               allowed_clinical_significance, report):
-                    continue
-
-                if allele_origin == 'germline':
-                    evidence_string = evidence_strings.CTTVGeneticsEvidenceString(
-                        clinvar_record, clinvar_record_measure, report, trait, consequence_type)
-                elif allele_origin == 'somatic':
-                    evidence_string = evidence_strings.CTTVSomaticEvidenceString(
-                        clinvar_record, clinvar_record_measure, report, trait, consequence_type)
-                report.add_evidence_string(evidence_string, clinvar_record, trait,
-                                           consequence_type.ensembl_gene_id, ot_schema_contents)
-                report.evidence_list.append([clinvar_record.accession,
-                                             clinvar_record_measure.rs_id,
-                                             trait.clinvar_name,
-                                             trait.ontology_id])
-                report.counters["n_valid_rs_and_nsv"] += (clinvar_record_measure.nsv_id is not None)
-                report.traits.add(trait.ontology_id)
-                report.remove_trait_mapping(trait.clinvar_name)
-                report.ensembl_gene_id_uris.add(
-                    evidence_strings.get_ensembl_gene_id_uri(consequence_type.ensembl_gene_id))
-
-                n_ev_strings_per_record += 1
-
-            if n_ev_strings_per_record > 0:
-                report.counters["n_processed_clinvar_records"] += 1
-                if n_ev_strings_per_record > 1:
-                    report.counters["n_multiple_evidence_strings"] += 1
 
+def add_prefiltered_records(report, cell_recs):
+    report.counters["n_prefiltered"] += cell_recs.n_prefiltered
+    report.counters["record_counter"] += cell_recs.n_prefiltered
+
+
+def get_ot_schema_validator(ot_schema_contents):
+    try:
+        return evidence_strings.get_ot_schema_validator(ot_schema_contents)
+    except jsonschema.exceptions.SchemaError as err:
+        print('Error: OpenTargets schema file is invalid')
+        print(err)
+        sys.exit(1)
+
+
+def process_cellbase_record(cellbase_record, report, allowed_clinical_significance, mappings,
+                            ot_schema_validator):
+    """Generate the evidence strings for one ClinVar record, adding them and the counters to report"""
+    n_ev_strings_per_record = 0
+    clinvar_record = clinvar.ClinvarRecord(cellbase_record['clinvarSet'])
+
+    for clinvar_record_measure in clinvar_record.measures:
+        report.counters["n_nsvs"] += (clinvar_record_measure.nsv_id is not None)
+        if clinvar_record_measure.nsv_id is not None:
+            report.add_nsv(clinvar_record_measure.nsv_id)
+        report.counters["n_multiple_allele_origin"] += (len(clinvar_record.allele_origins) > 1)
+        traits = create_traits(clinvar_record.traits, mappings.trait_2_efo, report)
+        converted_allele_origins = convert_allele_origins(clinvar_record.allele_origins)
+
+        for consequence_type, trait, allele_origin in itertools.product(
+                get_consequence_types(clinvar_record_measure, mappings.consequence_type_dict),
+                traits,
+                converted_allele_origins):
+
+            if skip_record(clinvar_record, clinvar_record_measure, consequence_type, allele_origin,
+                           allowed_clinical_significance, report):
+                continue
+
+            if allele_origin == 'germline':
+                evidence_string = evidence_strings.CTTVGeneticsEvidenceString(
+                    clinvar_record, clinvar_record_measure, report, trait, consequence_type)
+            elif allele_origin == 'somatic':
+                evidence_string = evidence_strings.CTTVSomaticEvidenceString(
+                    clinvar_record, clinvar_record_measure, report, trait, consequence_type)
+            report.add_evidence_string(evidence_string, clinvar_record, trait,
+                                       consequence_type.ensembl_gene_id, ot_schema_validator)
+            report.add_evidence_record([clinvar_record.accession,
+                                        clinvar_record_measure.rs_id,
+                                        trait.clinvar_name,
+                                        trait.ontology_id])
+            report.counters["n_valid_rs_and_nsv"] += (clinvar_record_measure.nsv_id is not None)
+            report.traits.add(trait.ontology_id)
+            report.remove_trait_mapping(trait.clinvar_name)
+            report.ensembl_gene_id_uris.add(
+                evidence_strings.get_ensembl_gene_id_uri(consequence_type.ensembl_gene_id))
+
+            n_ev_strings_per_record += 1
+
+        if n_ev_strings_per_record > 0:
+            report.counters["n_processed_clinvar_records"] += 1
+            if n_ev_strings_per_record > 1:
+                report.counters["n_multiple_evidence_strings"] += 1
+
+
+# Arguments shared by all the shards processed in a worker process. They are set once when the
+# worker starts (and inherited without copying on platforms which fork), instead of being sent
+# along with every shard.
+_worker_args = None
+_worker_validation_policy = None
+_worker_cell_recs = None
+
+
+def _init_worker(allowed_clinical_significance, mappings, ot_schema_contents, validation_policy,
+                 cell_recs):
+    global _worker_args, _worker_validation_policy, _worker_cell_recs
+    _worker_args = (allowed_clinical_significance, mappings,
+                    get_ot_schema_validator(ot_schema_contents))
+    _worker_validation_policy = validation_policy
+    _worker_cell_recs = cell_recs
+
+
+def _process_shard(json_lines):
+    """
+    Process a shard of ClinVar records in a worker process. Returns a Report holding the counters
+    for the shard, with its evidence strings already serialised to json.
+    """
+    report = Report(validation_policy=_worker_validation_policy)
+    try:
+        for json_line in json_lines:
+            report.counters["record_counter"] += 1
+            process_cellbase_record(json_backend.loads(json_line), report, *_worker_args)
+    except SystemExit as e:
+        # Worker processes can't stop the whole pipeline, so pass the failure to the main process
+        raise RuntimeError('Failed to process a shard of ClinVar records') from e
+    report.evidence_string_list = [json_backend.dumps(evidence_string)
+                                   for evidence_string in report.evidence_string_list]
     return report
 
 
-def get_mappings(efo_mapping_file, snp_2_gene_file):
+def _process_shard_range(start, stop):
+    """
+    Process the records from start to stop of the input file in a worker process, reading them
+    directly from the file using its index. Returns a Report like _process_shard.
+    """
+    n_prefiltered_before = _worker_cell_recs.n_prefiltered
+    report = _process_shard(_worker_cell_recs.lines(start, stop))
+    n_prefiltered = _worker_cell_recs.n_prefiltered - n_prefiltered_before
+    report.counters["n_prefiltered"] += n_prefiltered
+    report.counters["record_counter"] += n_prefiltered
+    return report
+
+
+def process_shards_in_parallel(cell_recs, report, allowed_clinical_significance, mappings,
+                               ot_schema_contents, workers, validation_policy):
+    """
+    Split the ClinVar records into shards and process them in a pool of worker processes. The
+    results of the shards are merged into report in the order of the shards in the input file, so
+    the output is the same as when processing the records one by one.
+    If the input file has an index, each worker reads its shards from the file itself; otherwise
+    the records are read by the main process and sent to the workers.
+    """
+    max_pending_shards = 2 * workers
+    if cell_recs.index is not None:
+        shard_tasks = ((_process_shard_range, shard_range)
+                       for shard_range in cell_recs.iter_shard_ranges(config.RECORDS_PER_SHARD))
+    else:
+        shard_tasks = ((_process_shard, (json_lines,))
+                       for json_lines in cell_recs.iter_shards(config.RECORDS_PER_SHARD))
+    with multiprocessing.Pool(workers, initializer=_init_worker,
+                              initargs=(allowed_clinical_significance, mappings,
+                                        ot_schema_contents, validation_policy,
+                                        cell_recs)) as pool:
+        pending_shards = deque()
+        for shard_function, shard_args in shard_tasks:
+            pending_shards.append(pool.apply_async(shard_function, shard_args))
+            # Don't read further ahead in the input file than the workers can keep up with
+            if len(pending_shards) >= max_pending_shards:
+                merge_shard_report(report, pending_shards.popleft().get())
+        while pending_shards:
+            merge_shard_report(report, pending_shards.popleft().get())
+
+
+def merge_shard_report(report, shard_report):
+    n_records_before = report.counters["record_counter"]
+    report.merge(shard_report)
+    if report.counters["record_counter"] // 1000 > n_records_before // 1000:
+        print("{} records processed".format(report.counters["record_counter"]))
+
+
+def get_mappings(efo_mapping_file, snp_2_gene_file, cache_dir=None):
+    """
+    Load the trait to EFO mappings and the consequence types. If cache_dir is given, the parsed
+    mappings are cached there and reloaded on later runs for as long as the files are unchanged.
+    """
     mappings = SimpleNamespace()
-    mappings.trait_2_efo = load_efo_mapping(efo_mapping_file)
-    mappings.consequence_type_dict = CT.process_consequence_type_file(snp_2_gene_file)
+    if cache_dir is None:
+        mappings.trait_2_efo = load_efo_mapping(efo_mapping_file)
+        mappings.consequence_type_dict = CT.process_consequence_type_file(snp_2_gene_file)
+    else:
+        mappings.trait_2_efo = mapping_cache.load(cache_dir, 'efo_mapping', efo_mapping_file,
+                                                  load_efo_mapping)
+        mappings.consequence_type_dict = mapping_cache.load(
+            cache_dir, 'consequence_types', snp_2_gene_file, CT.process_consequence_type_file)
     return mappings
 
 
@@ -358,18 +653,6 @@ def create_trait_list(name_list, trait_2_efo_dict, trait_counter):
     return new_trait_list
 
 
-def write_string_list_to_file(string_list, filename):
-    with utilities.open_file(filename, 'wt') as out_file:
-        out_file.write('\n'.join(string_list))
-
-
-def append_nsv(nsv_list, clinvar_record_measure):
-    nsv = clinvar_record_measure.nsv_id
-    if nsv is not None:
-        nsv_list.append(nsv)
-    return nsv_list
-
-
 def load_efo_mapping(efo_mapping_file):
     trait_2_efo = defaultdict(list)
     n_efo_mappings = 0
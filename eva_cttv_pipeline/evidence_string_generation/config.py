@@ -6,6 +6,9 @@ UNMAPPED_TRAITS_FILE_NAME = 'unmappedTraits.tsv'
 UNAVAILABLE_EFO_FILE_NAME = 'unavailableefo.tsv'
 NSV_LIST_FILE = 'nsvlist.txt'
 
+# parallel processing settings
+RECORDS_PER_SHARD = 1000
+
 # evidence_strings.py settings
 GEN_EV_STRING_JSON = "resources/CTTVGeneticsEvidenceString.json"
 SOM_EV_STRING_JSON = "resources/CTTVSomaticEvidenceString.json"
@@ -1,17 +1,15 @@
-from collections import defaultdict
+from array import array
 import logging
+import sys
+import time
 
 from eva_cttv_pipeline.evidence_string_generation import utilities
 
 logger = logging.getLogger(__package__)
 
 
-def process_gene(consequence_type_dict, variant_id, ensembl_gene_id, so_term):
-    consequence_type_dict[variant_id].append(ConsequenceType(ensembl_gene_id, SoTerm(so_term)))
-
-
 def process_consequence_type_file_tsv(snp_2_gene_filepath):
-    consequence_type_dict = defaultdict(list)
+    consequence_type_dict = ConsequenceTypeIndex()
     one_rs_multiple_genes = set()
 
     with utilities.open_file(snp_2_gene_filepath, "rt") as snp_2_gene_file:
@@ -26,20 +24,134 @@ def process_consequence_type_file_tsv(snp_2_gene_filepath):
             ensembl_gene_id = line_list[2]
             so_term = line_list[4]
 
-            process_gene(consequence_type_dict, variant_id, ensembl_gene_id, so_term)
+            consequence_type_dict.add(variant_id, ensembl_gene_id, so_term)
 
+    consequence_type_dict.finish_loading()
     return consequence_type_dict, one_rs_multiple_genes
 
 
 def process_consequence_type_file(snp_2_gene_file):
     logger.info('Loading mapping rs -> ENSG/SOterms')
+    start_time = time.perf_counter()
     consequence_type_dict, one_rs_multiple_genes = \
         process_consequence_type_file_tsv(snp_2_gene_file)
     logger.info('{} rs->ENSG/SOterms mappings loaded'.format(len(consequence_type_dict)))
     logger.info('{} rsIds with multiple gene associations'.format(len(one_rs_multiple_genes)))
+    logger.info('{} consequence types loaded in {:.1f} s, using approximately {:.1f} MB'.format(
+        consequence_type_dict.n_rows, time.perf_counter() - start_time,
+        consequence_type_dict.approximate_size() / 1024 ** 2))
     return consequence_type_dict
 
 
+class ConsequenceTypeIndex:
+
+    """
+    Compact mapping of variant identifiers to their list of ConsequenceType, used in place of a
+    dict of lists. Gene identifiers and SO terms are interned, and each consequence type is stored
+    as a row of three integer arrays: the gene index, the SO term index and the next row of the same
+    variant (-1 for the end of the chain). A single row is kept for each variant: while loading, its
+    last row, the rows of a variant being chained from the last one added, and after
+    finish_loading(), its first row, the chains having been reversed.
+
+    ConsequenceType objects are created on lookup and share the interned SoTerm objects, in the
+    order in which they were added.
+    """
+
+    def __init__(self):
+        self._variant_rows = {}
+        self._loading = True
+        self._gene_ids = []
+        self._gene_id_indexes = {}
+        self._so_terms = []
+        self._so_term_indexes = {}
+        self._row_gene = array('i')
+        self._row_so_term = array('i')
+        self._row_next = array('i')
+
+    def add(self, variant_id, ensembl_gene_id, so_name):
+        gene_index = self._gene_id_indexes.get(ensembl_gene_id)
+        if gene_index is None:
+            ensembl_gene_id = sys.intern(ensembl_gene_id)
+            gene_index = self._gene_id_indexes[ensembl_gene_id] = len(self._gene_ids)
+            self._gene_ids.append(ensembl_gene_id)
+        so_term_index = self._so_term_indexes.get(so_name)
+        if so_term_index is None:
+            so_term_index = self._so_term_indexes[so_name] = len(self._so_terms)
+            self._so_terms.append(SoTerm(so_name))
+
+        if not self._loading:
+            self._reverse_rows()
+            self._loading = True
+        row = len(self._row_next)
+        self._row_gene.append(gene_index)
+        self._row_so_term.append(so_term_index)
+        self._row_next.append(self._variant_rows.get(variant_id, -1))
+        self._variant_rows[variant_id] = row
+
+    def finish_loading(self):
+        """
+        Chain the rows of each variant from the first one, so that lookups don't have to reverse
+        them. add() can still be used, but reverses the chains of all the variants again.
+        """
+        if self._loading:
+            self._reverse_rows()
+            self._loading = False
+
+    @property
+    def n_rows(self):
+        return len(self._row_next)
+
+    def __getitem__(self, variant_id):
+        row = self._variant_rows[variant_id]
+        consequence_types = []
+        while row != -1:
+            consequence_types.append(ConsequenceType(self._gene_ids[self._row_gene[row]],
+                                                     self._so_terms[self._row_so_term[row]]))
+            row = self._row_next[row]
+        if self._loading:
+            consequence_types.reverse()
+        return consequence_types
+
+    def get(self, variant_id, default=None):
+        return self[variant_id] if variant_id in self._variant_rows else default
+
+    def __contains__(self, variant_id):
+        return variant_id in self._variant_rows
+
+    def __iter__(self):
+        return iter(self._variant_rows)
+
+    def __len__(self):
+        return len(self._variant_rows)
+
+    def _reverse_rows(self):
+        row_next = self._row_next
+        for variant_id, row in self._variant_rows.items():
+            previous_row = -1
+            while row != -1:
+                next_row = row_next[row]
+                row_next[row] = previous_row
+                previous_row = row
+                row = next_row
+            self._variant_rows[variant_id] = previous_row
+
+    def approximate_size(self):
+        """
+        Approximate memory used by the index in bytes, including the variant and gene identifiers,
+        the SO terms and the integers held in its dicts, each object being counted once
+        """
+        objects = [self._row_gene, self._row_so_term, self._row_next, self._variant_rows,
+                   self._gene_ids, self._gene_id_indexes, self._so_terms, self._so_term_indexes]
+        for mapping in (self._variant_rows, self._gene_id_indexes, self._so_term_indexes):
+            objects.extend(mapping.keys())
+            objects.extend(mapping.values())
+        for so_term in self._so_terms:
+            objects.extend((so_term, so_term.__dict__))
+            objects.extend(so_term.__dict__.values())
+        unique_objects = {id(obj): obj for obj in objects}
+        return sum(sys.getsizeof(obj) for obj in unique_objects.values())
+
+
 class SoTerm(object):
 
     """
@@ -135,28 +247,25 @@ class SoTerm(object):
                             'feature_truncation',
                             'intergenic_variant']
 
+    ranked_so_names_dict = {so_name: rank for rank, so_name in enumerate(ranked_so_names_list)}
+
     def __init__(self, so_name):
         self.so_name = so_name
         if so_name in SoTerm.so_accession_name_dict:
             self._so_accession = SoTerm.so_accession_name_dict[so_name]
+            self._accession = 'SO:' + str(self._so_accession).rjust(7, '0')
         else:
             self._so_accession = None
+            self._accession = None
 
     @property
     def accession(self):
-        if self._so_accession is not None:
-            accession_number_str = str(self._so_accession)
-            return 'SO:' + accession_number_str.rjust(7, '0')
-        else:
-            return None
+        return self._accession
 
     @property
     def rank(self):
         # If So name not in Ensembl's ranked list, return the least severe rank
-        if self.so_name not in SoTerm.ranked_so_names_list:
-            return len(SoTerm.ranked_so_names_list)
-        else:
-            return SoTerm.ranked_so_names_list.index(self.so_name)
+        return SoTerm.ranked_so_names_dict.get(self.so_name, len(SoTerm.ranked_so_names_list))
 
     def __eq__(self, other):
         return self.accession == other.accession
@@ -0,0 +1,87 @@
+"""
+On-disk cache of the structures parsed from the mapping files (trait to EFO mappings and the
+snp2gene consequence types), so that they are not parsed again when the files have not changed
+between runs.
+
+Each cache file holds a key made of the absolute path, size and modification time of the source
+file, followed by the pickled structure. The cache file is rebuilt whenever the key of the source
+file no longer matches.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+logger = logging.getLogger(__package__)
+
+# Increase when the format of the cached structures changes, to invalidate existing cache files
+CACHE_FORMAT_VERSION = 2
+
+
+def get_source_key(source_path):
+    source_path = os.path.abspath(source_path)
+    stat = os.stat(source_path)
+    return CACHE_FORMAT_VERSION, source_path, stat.st_size, stat.st_mtime_ns
+
+
+def get_cache_path(cache_dir, kind, source_path):
+    path_hash = hashlib.sha1(os.path.abspath(source_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, '{}-{}.pickle'.format(kind, path_hash))
+
+
+def load_cached(cache_path, source_key):
+    """Return the cached structure, or None if there is no valid cache file for source_key"""
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            if pickle.load(cache_file) != source_key:
+                return None
+            return pickle.load(cache_file)
+    except FileNotFoundError:
+        return None
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        logger.warning('Ignoring unreadable cache file {}: {}'.format(cache_path, e))
+        return None
+
+
+def save_cached(cache_path, source_key, structure):
+    # Write to a temporary file first so that concurrent runs never read a partial cache file
+    cache_dir = os.path.dirname(cache_path)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as cache_file:
+            pickle.dump(source_key, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(structure, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load(cache_dir, kind, source_path, parse_function):
+    """
+    Return the structure parsed from source_path by parse_function, loading it from the cache in
+    cache_dir when the source file is unchanged, and updating the cache otherwise.
+
+    :param cache_dir: Directory holding the cache files, created if needed.
+    :param kind: Short name of the type of mapping, used in the cache file name.
+    :param source_path: Path to the mapping file.
+    :param parse_function: Function taking source_path and returning the parsed structure.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    source_key = get_source_key(source_path)
+    cache_path = get_cache_path(cache_dir, kind, source_path)
+
+    start_time = time.perf_counter()
+    structure = load_cached(cache_path, source_key)
+    if structure is not None:
+        logger.info('Loaded {} from cache {} in {:.2f} s'.format(
+            kind, cache_path, time.perf_counter() - start_time))
+        return structure
+
+    structure = parse_function(source_path)
+    save_cached(cache_path, source_key, structure)
+    logger.info('Saved {} to cache {}'.format(kind, cache_path))
+    return structure
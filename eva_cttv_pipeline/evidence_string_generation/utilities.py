@@ -74,6 +74,37 @@ class ArgParser:
                                                          "strings in the format of documents in "
                                                          "Cellbase. One record per line.")
         parser.add_argument('--ot-schema', help='OpenTargets schema JSON', required=True)
+        parser.add_argument("--streaming", dest="streaming", action="store_true",
+                            help="""Optional. Write each evidence string and Zooma record to the
+                            output files as soon as it is generated instead of keeping all of them
+                            in memory until the end of the run.""")
+        parser.add_argument("--workers", dest="workers", type=int, default=1,
+                            help="""Optional. Number of worker processes used to generate evidence
+                            strings. With more than one worker, the records are split into shards
+                            which are processed in parallel, and the output is always streamed.""")
+        parser.add_argument("--validation", dest="validation", default="all",
+                            choices=["all", "sample", "first"],
+                            help="""Optional. Which evidence strings to validate against the
+                            OpenTargets schema: all of them (default), a deterministic sample of
+                            them, or only the first ones of each type.""")
+        parser.add_argument("--validation-sample-rate", dest="validation_sample_rate", type=float,
+                            default=0.01,
+                            help="Optional. Fraction of evidence strings validated with "
+                                 "'--validation sample'.")
+        parser.add_argument("--validation-first-n", dest="validation_first_n", type=int,
+                            default=1000,
+                            help="Optional. Number of evidence strings of each type validated "
+                                 "with '--validation first'.")
+        parser.add_argument("--cache-dir", dest="cache_dir", default=None,
+                            help="""Optional. Directory where the parsed EFO mapping and snp2gene
+                            files are cached, so that they are loaded much faster by later runs
+                            while the files are unchanged.""")
+
+        parser.add_argument("--prefilter", dest="prefilter", action="store_true",
+                            help="""Optional. Skip the records whose clinical significance is not
+                            allowed before decoding them, unless they have nsvs, multiple
+                            allele origins or unmapped traits. The outputs are the same as
+                            without it.""")
 
         args = parser.parse_args(args=argv[1:])
 
@@ -85,6 +116,13 @@ class ArgParser:
         self.snp_2_gene_file = args.snp_2_gene_file
         self.json_file = args.json_file
         self.ot_schema = args.ot_schema
+        self.streaming = args.streaming
+        self.workers = args.workers
+        self.validation = args.validation
+        self.validation_sample_rate = args.validation_sample_rate
+        self.validation_first_n = args.validation_first_n
+        self.cache_dir = args.cache_dir
+        self.prefilter = args.prefilter
 
 
 def check_dir_exists_create(directory):
@@ -0,0 +1,95 @@
+"""
+JSON decoding and encoding used when reading ClinVar records from CellBase and writing evidence
+strings. Decoding uses orjson if it is installed, and the standard library json module otherwise.
+ujson can be selected explicitly with set_backend(), but is never selected by default, since some
+of its versions round floats differently from json.
+
+orjson and ujson do not decode all numbers as json does: integers which do not fit in 64 bits are
+turned into floats or rejected, and floats out of the range of doubles are rejected. The inputs
+holding 19 or more consecutive digits, and the inputs which the library fails to decode, are
+therefore decoded with json instead. All the decoders then return the same dicts, with keys in the
+same order as in the input, and raise the same errors. ClinVar records normally have no such
+numbers, so orjson decodes nearly all of them.
+
+Encoding always uses the standard library json module by default: orjson and ujson use compact
+separators and do not escape non-ASCII characters in the same way, so their output is not
+byte-identical to json.dumps. They can still be selected explicitly with set_backend() when the
+exact format of the output does not matter.
+"""
+
+import json
+import logging
+import re
+
+logger = logging.getLogger(__package__)
+
+DEFAULT_ENCODER = 'json'
+# Decoders selected by default, in order of preference
+DECODER_PREFERENCE = ('orjson', 'json')
+# Integers which may not fit in 64 bits, which orjson and ujson do not decode as json does. Floats
+# out of the range of doubles are rejected by orjson and decoded with json as well.
+LONG_NUMBER_RE = re.compile(r'\d{19}')
+
+
+def with_json_fallback(fast_loads):
+    """Wrap the loads function of a library, to decode with json the inputs it may get wrong"""
+    def loads(s):
+        if isinstance(s, (bytes, bytearray)):
+            s = s.decode('utf-8')
+        if LONG_NUMBER_RE.search(s) is None:
+            try:
+                return fast_loads(s)
+            except ValueError:
+                pass
+        return json.loads(s)
+    return loads
+
+
+def _load_backends():
+    backends = {'json': (json.loads, json.dumps)}
+    try:
+        import orjson
+        backends['orjson'] = (with_json_fallback(orjson.loads),
+                              lambda obj: orjson.dumps(obj).decode('utf-8'))
+    except ImportError:
+        pass
+    try:
+        import ujson
+        backends['ujson'] = (with_json_fallback(ujson.loads), ujson.dumps)
+    except ImportError:
+        pass
+    return backends
+
+
+BACKENDS = _load_backends()
+
+loads = None
+dumps = None
+decoder_name = None
+encoder_name = None
+
+
+def set_backend(decoder=None, encoder=DEFAULT_ENCODER):
+    """
+    Select the libraries used by loads() and dumps().
+
+    :param decoder: Name of the library used to decode JSON. By default the first installed one of
+                    DECODER_PREFERENCE.
+    :param encoder: Name of the library used to encode JSON. By default the standard library, so
+                    that the output is identical to json.dumps.
+    """
+    global loads, dumps, decoder_name, encoder_name
+    if decoder is None:
+        decoder = next(name for name in DECODER_PREFERENCE if name in BACKENDS)
+    for name in (decoder, encoder):
+        if name not in BACKENDS:
+            raise ValueError('JSON backend {} is not available, installed backends: {}'.format(
+                name, ', '.join(sorted(BACKENDS))))
+    loads = BACKENDS[decoder][0]
+    dumps = BACKENDS[encoder][1]
+    decoder_name = decoder
+    encoder_name = encoder
+    logger.debug('JSON decoder: {}, encoder: {}'.format(decoder, encoder))
+
+
+set_backend()
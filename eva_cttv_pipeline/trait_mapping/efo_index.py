@@ -0,0 +1,236 @@
+"""
+Local index of the terms of a release of EFO, used by the ols module instead of querying OLS for
+whether a term is in EFO, whether it is obsolete and what its label is.
+
+The index can be built from the OWL or the OBO release file of EFO, both of which take a while to
+parse, fetched from the listing of the EFO terms in OLS with ols.fetch_efo_index(), or loaded from a
+TSV file written by EfoIndex.write_tsv(), with one line per term holding its URI, its label and 1 if
+it is obsolete, 0 otherwise. Files ending with .gz are decompressed.
+"""
+
+import csv
+import gzip
+import logging
+import re
+import xml.etree.ElementTree as ElementTree
+
+logger = logging.getLogger(__package__)
+
+RDF_NAMESPACE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+RDFS_NAMESPACE = 'http://www.w3.org/2000/01/rdf-schema#'
+OWL_NAMESPACE = 'http://www.w3.org/2002/07/owl#'
+OBO_IN_OWL_NAMESPACE = 'http://www.geneontology.org/formats/oboInOwl#'
+EFO_ALTERNATIVE_TERM_TAG = '{http://www.ebi.ac.uk/efo/}alternative_term'
+OBSOLETE_CLASS = 'http://www.geneontology.org/formats/oboInOwl#ObsoleteClass'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# URI prefixes of the OBO identifiers which do not follow the OBO Foundry convention
+OBO_ID_URI_PREFIXES = {
+    'EFO': 'http://www.ebi.ac.uk/efo/EFO_',
+    'Orphanet': 'http://www.orpha.net/ORDO/Orphanet_',
+}
+OBO_FOUNDRY_URI_PREFIX = 'http://purl.obolibrary.org/obo/{}_'
+
+# Synonyms used for fuzzy matching, leaving out the broad and narrow ones
+OWL_SYNONYM_PROPERTIES = ('hasExactSynonym', 'hasRelatedSynonym')
+OBO_SYNONYM_SCOPES = ('EXACT', 'RELATED')
+OBO_SYNONYM = re.compile(r'"((?:[^"\\]|\\.)*)"\s+(\w+)')
+
+_efo_index = None
+
+
+class EfoIndex:
+
+    """Label and obsolete status of each term in EFO, keyed by URI"""
+
+    def __init__(self, terms: dict = None):
+        """:param terms: dict of tuples of the label and the obsolete status, keyed by URI"""
+        self.terms = terms if terms is not None else {}
+
+    def add(self, uri: str, label: str, is_obsolete: bool):
+        self.terms[uri] = (label, is_obsolete)
+
+    def __contains__(self, uri):
+        return uri in self.terms
+
+    def __len__(self):
+        return len(self.terms)
+
+    def get_label(self, uri: str) -> str:
+        """Return the label of a term, or None if it is not in EFO"""
+        term = self.terms.get(uri)
+        return term[0] if term is not None else None
+
+    def get_status(self, uri: str) -> dict:
+        """Return whether a term is in EFO and whether it is obsolete, like ols.get_efo_term_status"""
+        term = self.terms.get(uri)
+        if term is None:
+            return {"in_efo": False, "is_obsolete": False}
+        return {"in_efo": True, "is_obsolete": term[1]}
+
+    def write_tsv(self, path: str):
+        with _open(path, 'wt') as tsv_file:
+            writer = csv.writer(tsv_file, delimiter='\t', lineterminator='\n')
+            for uri, (label, is_obsolete) in sorted(self.terms.items()):
+                writer.writerow([uri, label, int(is_obsolete)])
+
+
+def _open(path: str, mode: str):
+    encoding = None if 'b' in mode else 'utf-8'
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding=encoding)
+    return open(path, mode, encoding=encoding)
+
+
+def obo_id_to_uri(obo_id: str) -> str:
+    """Convert an OBO identifier such as EFO:0000400 or Orphanet:976 to the URI of the term"""
+    if '://' in obo_id:
+        return obo_id
+    prefix, local_id = obo_id.split(':', 1)
+    uri_prefix = OBO_ID_URI_PREFIXES.get(prefix, OBO_FOUNDRY_URI_PREFIX.format(prefix))
+    return uri_prefix + local_id
+
+
+def iter_owl_terms(path: str):
+    """
+    Yield the URI, the label, the list of synonyms and the obsolete status of each class of an OWL
+    file in RDF/XML format.
+    """
+    about_attribute = '{' + RDF_NAMESPACE + '}about'
+    resource_attribute = '{' + RDF_NAMESPACE + '}resource'
+    class_tag = '{' + OWL_NAMESPACE + '}Class'
+    label_tag = '{' + RDFS_NAMESPACE + '}label'
+    deprecated_tag = '{' + OWL_NAMESPACE + '}deprecated'
+    subclass_tag = '{' + RDFS_NAMESPACE + '}subClassOf'
+    synonym_tags = {'{' + OBO_IN_OWL_NAMESPACE + '}' + name for name in OWL_SYNONYM_PROPERTIES}
+    synonym_tags.add(EFO_ALTERNATIVE_TERM_TAG)
+
+    with _open(path, 'rb') as owl_file:
+        depth = 0
+        root = None
+        for event, element in ElementTree.iterparse(owl_file, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+            depth -= 1
+            # Only the classes directly under the root are terms, the nested ones are restrictions
+            if depth != 1:
+                continue
+            uri = element.get(about_attribute)
+            if element.tag == class_tag and uri is not None:
+                label = None
+                synonyms = []
+                is_obsolete = False
+                for child in element:
+                    if child.tag == label_tag and (label is None
+                                                   or child.get(XML_LANG, 'en') == 'en'):
+                        label = child.text
+                    elif child.tag in synonym_tags and child.text:
+                        synonyms.append(child.text)
+                    elif child.tag == deprecated_tag:
+                        is_obsolete = is_obsolete or (child.text or '').strip() == 'true'
+                    elif child.tag == subclass_tag:
+                        is_obsolete = is_obsolete or child.get(resource_attribute) == OBSOLETE_CLASS
+                yield uri, label or '', synonyms, is_obsolete
+            root.clear()
+
+
+def iter_obo_terms(path: str):
+    """
+    Yield the URI, the label, the list of synonyms and the obsolete status of each [Term] stanza of
+    an OBO file.
+    """
+    def get_term(stanza):
+        synonyms = [match.group(1).replace('\\"', '"')
+                    for match in map(OBO_SYNONYM.match, stanza.get('synonym', []))
+                    if match is not None and match.group(2) in OBO_SYNONYM_SCOPES]
+        return (obo_id_to_uri(stanza['id'][0]), stanza.get('name', [''])[0], synonyms,
+                stanza.get('is_obsolete', [''])[0] == 'true')
+
+    stanza = None
+    with _open(path, 'rt') as obo_file:
+        for line in obo_file:
+            line = line.strip()
+            if line.startswith('['):
+                if stanza is not None and 'id' in stanza:
+                    yield get_term(stanza)
+                stanza = {} if line == '[Term]' else None
+            elif stanza is not None and ': ' in line:
+                tag, value = line.split(': ', 1)
+                # Drop trailing comments, except from synonyms which are quoted
+                if tag != 'synonym':
+                    value = value.split(' ! ')[0].strip()
+                stanza.setdefault(tag, []).append(value)
+    if stanza is not None and 'id' in stanza:
+        yield get_term(stanza)
+
+
+def parse_owl(path: str) -> EfoIndex:
+    """Build the index from the classes of an OWL file in RDF/XML format"""
+    efo_index = EfoIndex()
+    for uri, label, _, is_obsolete in iter_owl_terms(path):
+        efo_index.add(uri, label, is_obsolete)
+    return efo_index
+
+
+def parse_obo(path: str) -> EfoIndex:
+    """Build the index from the [Term] stanzas of an OBO file"""
+    efo_index = EfoIndex()
+    for uri, label, _, is_obsolete in iter_obo_terms(path):
+        efo_index.add(uri, label, is_obsolete)
+    return efo_index
+
+
+def iter_terms(path: str):
+    """Yield the terms of an OWL or OBO file, depending on its extension, like iter_owl_terms"""
+    name = path[:-len('.gz')] if path.endswith('.gz') else path
+    if name.endswith('.owl'):
+        return iter_owl_terms(path)
+    if name.endswith('.obo'):
+        return iter_obo_terms(path)
+    raise ValueError('Unknown ontology file format: {}'.format(path))
+
+
+def parse_tsv(path: str) -> EfoIndex:
+    efo_index = EfoIndex()
+    with _open(path, 'rt') as tsv_file:
+        for uri, label, is_obsolete in csv.reader(tsv_file, delimiter='\t'):
+            efo_index.add(uri, label, is_obsolete == '1')
+    return efo_index
+
+
+def load(path: str) -> EfoIndex:
+    """Load the index from an OWL, OBO or TSV file, depending on its extension"""
+    name = path[:-len('.gz')] if path.endswith('.gz') else path
+    if name.endswith('.owl'):
+        efo_index = parse_owl(path)
+    elif name.endswith('.obo'):
+        efo_index = parse_obo(path)
+    else:
+        efo_index = parse_tsv(path)
+    logger.info('Loaded {} EFO terms from {}'.format(len(efo_index), path))
+    return efo_index
+
+
+def configure(path: str) -> EfoIndex:
+    """Make the ols module use the index loaded from path instead of querying OLS"""
+    return set_index(load(path))
+
+
+def set_index(index: EfoIndex) -> EfoIndex:
+    """Make the ols module use the given index, such as one from ols.fetch_efo_index()"""
+    global _efo_index
+    _efo_index = index
+    return _efo_index
+
+
+def get_index() -> EfoIndex:
+    """Return the index set up by configure(), or None if OLS is queried instead"""
+    return _efo_index
+
+
+def close():
+    global _efo_index
+    _efo_index = None
@@ -0,0 +1,289 @@
+"""
+Candidate ontology terms for traits which Zooma could not map, found locally by comparing the trait
+names with the labels and synonyms of the terms of ontology files such as efo.owl, hp.obo and
+mondo.obo, without querying any service.
+
+Names are compared as vectors of the TF-IDF weights of their character trigrams, after normalising
+them as local_mappings.normalise_trait_name does, so that the score of a term is the cosine
+similarity between the trait name and the closest of its label and synonyms. The names of the terms
+are held in a sparse matrix, stored as an inverted index with the names containing each trigram,
+and many trait names are scored at once, in chunks small enough for the scores of all the term names,
+and the postings of the trigrams of the trait names, to fit in memory.
+"""
+
+from collections import Counter
+import logging
+import math
+
+import numpy as np
+
+from eva_cttv_pipeline.trait_mapping import efo_index
+from eva_cttv_pipeline.trait_mapping.local_mappings import normalise_trait_name
+
+logger = logging.getLogger(__package__)
+
+NGRAM_SIZE = 3
+TOP_K = 5
+MIN_SCORE = 0.5
+# Number of traits looked up together by add_fuzzy_matches
+FUZZY_MATCH_BATCH_SIZE = 1000
+# Maximum number of scores, for all the term names and a chunk of trait names, computed at once
+MAX_CHUNK_SCORES = 2 ** 23
+# Maximum number of postings of the n-grams of a chunk of trait names expanded at once, each of them
+# taking several int64 and float64 values while scoring
+MAX_CHUNK_POSTINGS = 2 ** 21
+
+_fuzzy_matcher = None
+
+
+class FuzzyMatch:
+
+    """Candidate term for a trait name, with the similarity between the names from 0 to 1"""
+
+    def __init__(self, uri: str, label: str, score: float, in_efo: bool = None):
+        self.uri = uri
+        self.label = label
+        self.score = score
+        self.in_efo = in_efo
+
+    def __eq__(self, other):
+        return (self.uri, self.label, self.score, self.in_efo) == \
+            (other.uri, other.label, other.score, other.in_efo)
+
+    def __repr__(self):
+        return 'FuzzyMatch({!r}, {!r}, {:.3f}, {!r})'.format(self.uri, self.label, self.score,
+                                                             self.in_efo)
+
+
+def get_ngrams(name: str) -> Counter:
+    """Count the character n-grams of a normalised name, padded with a space on each side"""
+    padded_name = ' ' + name + ' '
+    return Counter(padded_name[i:i + NGRAM_SIZE]
+                   for i in range(max(len(padded_name) - NGRAM_SIZE + 1, 1)))
+
+
+class FuzzyMatcher:
+
+    """Index of the labels and synonyms of ontology terms, scoring how close trait names are"""
+
+    def __init__(self, terms):
+        """
+        :param terms: Iterable of tuples of the URI, the label, the list of synonyms and whether
+                      the term is in EFO (True or False, or None if unknown) of each term.
+        """
+        self.uris = []
+        self.labels = []
+        self.in_efo = []
+        # Index of the first name of each term, the names of a term being consecutive
+        term_starts = []
+        ngram_ids = {}
+        entry_names, entry_ngrams, entry_counts = [], [], []
+        n_names = 0
+        for uri, label, synonyms, in_efo in terms:
+            names = set(filter(None, (normalise_trait_name(name) for name in [label] + synonyms)))
+            if not names:
+                continue
+            self.uris.append(uri)
+            self.labels.append(label)
+            self.in_efo.append(in_efo)
+            term_starts.append(n_names)
+            for name in sorted(names):
+                for ngram, count in get_ngrams(name).items():
+                    entry_names.append(n_names)
+                    entry_ngrams.append(ngram_ids.setdefault(ngram, len(ngram_ids)))
+                    entry_counts.append(count)
+                n_names += 1
+
+        self.ngram_ids = ngram_ids
+        self.n_names = n_names
+        self.term_starts = np.array(term_starts, dtype=np.int64)
+        entry_names = np.array(entry_names, dtype=np.int64)
+        entry_ngrams = np.array(entry_ngrams, dtype=np.int64)
+
+        document_frequencies = np.bincount(entry_ngrams, minlength=len(ngram_ids))
+        self.idf = np.log((1 + n_names) / (1 + document_frequencies)) + 1
+        # Weight of the n-grams which are not in any term name
+        self.unknown_idf = math.log(1 + n_names) + 1
+        weights = np.array(entry_counts, dtype=np.float64) * self.idf[entry_ngrams]
+        norms = np.sqrt(np.bincount(entry_names, weights=weights ** 2, minlength=n_names))
+        weights /= norms[entry_names]
+
+        # Inverted index: the names containing n-gram i, and their weights, are at positions
+        # postings_start[i] to postings_start[i + 1] of postings_names and postings_weights
+        order = np.argsort(entry_ngrams, kind='stable')
+        self.postings_names = entry_names[order]
+        self.postings_weights = weights[order]
+        self.postings_start = np.zeros(len(ngram_ids) + 1, dtype=np.int64)
+        np.cumsum(document_frequencies, out=self.postings_start[1:])
+        logger.info('Indexed {} names of {} terms for fuzzy matching'.format(n_names,
+                                                                            len(self.uris)))
+
+    def __len__(self):
+        return len(self.uris)
+
+    def vectorise(self, trait_names: list) -> tuple:
+        """
+        Return the sparse vectors of the trait names, as arrays of the index of the trait name, the
+        n-gram and its weight for each n-gram of each name which is in the index.
+        """
+        query_ids, ngrams, weights = [], [], []
+        for query_id, trait_name in enumerate(trait_names):
+            ngram_counts = get_ngrams(normalise_trait_name(trait_name))
+            query_weights = {}
+            norm = 0.0
+            for ngram, count in ngram_counts.items():
+                ngram_id = self.ngram_ids.get(ngram)
+                weight = count * (self.idf[ngram_id] if ngram_id is not None
+                                  else self.unknown_idf)
+                norm += weight ** 2
+                if ngram_id is not None:
+                    query_weights[ngram_id] = weight
+            norm = math.sqrt(norm)
+            for ngram_id, weight in query_weights.items():
+                query_ids.append(query_id)
+                ngrams.append(ngram_id)
+                weights.append(weight / norm)
+        return (np.array(query_ids, dtype=np.int64), np.array(ngrams, dtype=np.int64),
+                np.array(weights, dtype=np.float64))
+
+    def score_terms(self, query_ids, ngrams, weights, n_queries: int) -> np.ndarray:
+        """
+        Return the matrix of the scores of every term for each of n_queries trait names, given by
+        the vectors returned by vectorise.
+        """
+        starts = self.postings_start[ngrams]
+        lengths = self.postings_start[ngrams + 1] - starts
+        # Expand each n-gram of the trait names into the postings of the term names containing it
+        entry_ids = np.repeat(np.arange(len(ngrams)), lengths)
+        offsets = np.arange(len(entry_ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        postings = starts[entry_ids] + offsets
+        name_scores = np.bincount(
+            query_ids[entry_ids] * self.n_names + self.postings_names[postings],
+            weights=weights[entry_ids] * self.postings_weights[postings],
+            minlength=n_queries * self.n_names).reshape(n_queries, self.n_names)
+        # The score of a term is the best score of its names
+        return np.maximum.reduceat(name_scores, self.term_starts, axis=1)
+
+    def get_chunks(self, query_ids, ngrams, n_queries: int):
+        """
+        Split the trait names into chunks of consecutive names, each with at most MAX_CHUNK_SCORES
+        scores and MAX_CHUNK_POSTINGS expanded postings unless it is a single trait name, given the
+        vectors returned by vectorise.
+
+        :return: Yields the index of the first trait name of each chunk and of the one after it.
+        """
+        max_chunk_size = max(1, MAX_CHUNK_SCORES // self.n_names)
+        n_postings = self.postings_start[ngrams + 1] - self.postings_start[ngrams]
+        query_postings = np.bincount(query_ids, weights=n_postings, minlength=n_queries).tolist()
+        chunk_start = 0
+        chunk_postings = 0
+        for query_id, postings in enumerate(query_postings):
+            if query_id > chunk_start and (query_id - chunk_start >= max_chunk_size or
+                                           chunk_postings + postings > MAX_CHUNK_POSTINGS):
+                yield chunk_start, query_id
+                chunk_start = query_id
+                chunk_postings = 0
+            chunk_postings += postings
+        if n_queries > chunk_start:
+            yield chunk_start, n_queries
+
+    def match(self, trait_names: list, top_k: int = TOP_K, min_score: float = MIN_SCORE) -> list:
+        """
+        Find the closest terms to each of the trait names.
+
+        :param trait_names: List of trait names.
+        :param top_k: Maximum number of terms to return for each trait name.
+        :param min_score: Minimum score of the terms returned.
+        :return: List with the list of FuzzyMatch of each trait name, from the best one.
+        """
+        results = []
+        if not len(self) or top_k <= 0:
+            return [[] for _ in trait_names]
+        top_k = min(top_k, len(self))
+        query_ids, ngrams, weights = self.vectorise(trait_names)
+        for chunk_start, chunk_end in self.get_chunks(query_ids, ngrams, len(trait_names)):
+            # The entries of the vectors are ordered by trait name
+            entry_start, entry_end = np.searchsorted(query_ids, [chunk_start, chunk_end])
+            term_scores = self.score_terms(query_ids[entry_start:entry_end] - chunk_start,
+                                           ngrams[entry_start:entry_end],
+                                           weights[entry_start:entry_end],
+                                           n_queries=chunk_end - chunk_start)
+            top_terms = np.argpartition(-term_scores, top_k - 1, axis=1)[:, :top_k]
+            top_scores = np.take_along_axis(term_scores, top_terms, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top_terms = np.take_along_axis(top_terms, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for terms, scores in zip(top_terms.tolist(), top_scores.tolist()):
+                results.append([FuzzyMatch(self.uris[term], self.labels[term], score,
+                                           self.in_efo[term])
+                                for term, score in zip(terms, scores) if score >= min_score])
+        return results
+
+
+def load(filepaths: list) -> FuzzyMatcher:
+    """
+    Build the matcher from the terms which are not obsolete in ontology files, in OWL or OBO format.
+    Whether the terms are in EFO is taken from the local EFO index, if there is one.
+    """
+    local_efo_index = efo_index.get_index()
+
+    def iter_terms():
+        seen_uris = set()
+        for filepath in filepaths:
+            for uri, label, synonyms, is_obsolete in efo_index.iter_terms(filepath):
+                if is_obsolete or uri in seen_uris:
+                    continue
+                seen_uris.add(uri)
+                in_efo = None
+                if local_efo_index is not None:
+                    status = local_efo_index.get_status(uri)
+                    in_efo = status['in_efo'] and not status['is_obsolete']
+                yield uri, label, synonyms, in_efo
+
+    return FuzzyMatcher(iter_terms())
+
+
+def configure(filepaths: list) -> FuzzyMatcher:
+    """Make main() look up candidate terms for the unmapped traits in the given ontology files"""
+    global _fuzzy_matcher
+    _fuzzy_matcher = load(filepaths)
+    return _fuzzy_matcher
+
+
+def get_matcher() -> FuzzyMatcher:
+    """Return the matcher set up by configure(), or None if there is none"""
+    return _fuzzy_matcher
+
+
+def close():
+    global _fuzzy_matcher
+    _fuzzy_matcher = None
+
+
+def add_fuzzy_matches(traits, fuzzy_matcher: FuzzyMatcher,
+                      batch_size: int = FUZZY_MATCH_BATCH_SIZE):
+    """
+    Set the fuzzy_match_list of the traits which are not finished and have no Zooma results, by
+    matching them in batches.
+
+    :param traits: Iterable of processed traits.
+    :param fuzzy_matcher: FuzzyMatcher to find candidate terms with.
+    :param batch_size: Number of consecutive traits matched together.
+    :return: Yields each trait, in the same order.
+    """
+    batch = []
+    for trait in traits:
+        batch.append(trait)
+        if len(batch) >= batch_size:
+            yield from _match_batch(batch, fuzzy_matcher)
+            batch = []
+    yield from _match_batch(batch, fuzzy_matcher)
+
+
+def _match_batch(batch: list, fuzzy_matcher: FuzzyMatcher) -> list:
+    unmapped_traits = [trait for trait in batch
+                       if not trait.is_finished and not trait.zooma_result_list]
+    for trait, fuzzy_match_list in zip(unmapped_traits, fuzzy_matcher.match(
+            [trait.name for trait in unmapped_traits])):
+        trait.fuzzy_match_list = fuzzy_match_list
+    return batch
@@ -0,0 +1,177 @@
+"""
+HTTP client shared by all the queries to Zooma, OLS and OxO.
+
+All requests go through a single requests.Session, which keeps a pool of open connections to each
+host, so that successive queries to the same service reuse the same TCP and TLS connection instead
+of opening a new one each time. The session is safe to share between the threads processing traits
+concurrently, as long as the pool has room for one connection per thread.
+
+Every request has a timeout and goes through a rate_limiter.RateLimiter, which spaces out the
+requests to each service and reduces their concurrency when the service is overloaded. Failed connections
+and responses with a transient error status are retried after an exponential backoff with jitter,
+or after the delay given by the Retry-After header of the response. The final response is returned
+even when its status is still an error, so the callers keep handling it as before, and is passed
+to the functions registered with add_response_hook(), such as a replay.Recorder. The latency,
+retries and outcome of every request are recorded in the metrics module. Both the rate limits and
+the metrics are kept under the name of the service given by the caller, or by default the host of
+the URL.
+"""
+
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from eva_cttv_pipeline.trait_mapping import metrics, rate_limiter
+
+logger = logging.getLogger(__package__)
+
+# Seconds to wait to establish a connection and to receive a response
+DEFAULT_TIMEOUT = (10, 60)
+DEFAULT_RETRIES = 3
+DEFAULT_POOL_SIZE = 10
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_timeout = DEFAULT_TIMEOUT
+_retries = DEFAULT_RETRIES
+_pool_size = DEFAULT_POOL_SIZE
+_rate_limiter = rate_limiter.RateLimiter()
+_session = None
+_session_lock = threading.Lock()
+_response_hooks = []
+
+
+def build_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Build a session keeping up to pool_size open connections to each host"""
+    # Retries are made by request(), so that each attempt goes through the rate limiter
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def configure(timeout=None, retries: int = None, pool_size: int = None, rate: float = None,
+              burst: float = None, max_concurrency: int = None, backoff_base: float = None,
+              backoff_max: float = None):
+    """
+    Change the settings of the shared session and rate limiter. Settings left to None keep their
+    current value. The session is rebuilt with the new settings on the next request, and the rate
+    limits of all the services start afresh.
+
+    :param timeout: Seconds to wait for the server, either a single number or a tuple with the
+                    connection and the read timeouts.
+    :param retries: Number of times to retry a failed request.
+    :param pool_size: Maximum number of open connections to each host. Should be at least the
+                      number of threads making requests.
+    :param rate: Average number of requests per second to each service, or 0 for no limit.
+    :param burst: Maximum number of requests sent at once to a service after a quiet period.
+    :param max_concurrency: Maximum number of requests in flight to each service.
+    :param backoff_base: Delay before the first retry, in seconds, doubled at each retry.
+    :param backoff_max: Maximum delay before a retry, in seconds.
+    """
+    global _timeout, _retries, _pool_size, _rate_limiter, _session
+    with _session_lock:
+        if timeout is not None:
+            _timeout = timeout
+        if retries is not None:
+            _retries = retries
+        if pool_size is not None:
+            _pool_size = max(pool_size, 1)
+        _rate_limiter = rate_limiter.RateLimiter(
+            rate=_rate_limiter.rate if rate is None else rate,
+            burst=_rate_limiter.burst if burst is None else burst,
+            max_concurrency=_rate_limiter.max_concurrency if max_concurrency is None
+            else max_concurrency,
+            backoff_base=_rate_limiter.backoff_base if backoff_base is None else backoff_base,
+            backoff_max=_rate_limiter.backoff_max if backoff_max is None else backoff_max)
+        if _session is not None:
+            _session.close()
+            _session = None
+    logger.debug('HTTP client: timeout {}, {} retries, pool size {}, {} requests per second and '
+                 'at most {} concurrent requests per service'.format(
+                     _timeout, _retries, _pool_size, _rate_limiter.rate,
+                     _rate_limiter.max_concurrency))
+
+
+def get_session() -> requests.Session:
+    """Return the shared session, building it on first use"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = build_session(_pool_size)
+        return _session
+
+
+def get_rate_limiter() -> rate_limiter.RateLimiter:
+    return _rate_limiter
+
+
+def add_response_hook(hook):
+    """Call hook with the final response of every request"""
+    _response_hooks.append(hook)
+
+
+def remove_response_hook(hook):
+    _response_hooks.remove(hook)
+
+
+def request(method: str, url: str, service: str = None, **kwargs) -> requests.Response:
+    """
+    Make a request with the shared session, within the rate limits of the service, retrying it
+    when the connection fails or the service answers with a transient error status.
+
+    :param service: Name of the service whose rate limits apply to the request, and under which it
+                    is recorded in the metrics, by default the host of the URL.
+    """
+    kwargs.setdefault('timeout', _timeout)
+    session = get_session()
+    limiter = _rate_limiter
+    service = service or urlsplit(url).netloc
+    service_limiter = limiter.get_service_limiter(service)
+    service_metrics = metrics.get_service(service)
+    for attempt in range(_retries + 1):
+        wait_start_time = time.perf_counter()
+        service_limiter.acquire()
+        start_time = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            service_metrics.record_attempt(time.perf_counter() - start_time,
+                                           start_time - wait_start_time)
+            service_limiter.release(throttled=True)
+            if attempt == _retries:
+                service_metrics.record_request(attempt, failed=True)
+                raise
+            logger.debug('Attempt {} of {} {} failed: {}'.format(attempt, method, url, e))
+        else:
+            service_metrics.record_attempt(time.perf_counter() - start_time,
+                                           start_time - wait_start_time, response.status_code)
+            throttled = response.status_code in RETRY_STATUSES
+            retry_after = None
+            if throttled:
+                retry_after = rate_limiter.parse_retry_after(response.headers.get('Retry-After'))
+            service_limiter.release(throttled, retry_after)
+            if not throttled or attempt == _retries:
+                service_metrics.record_request(attempt, response.status_code,
+                                               failed=response.status_code >= 500 or throttled)
+                for hook in _response_hooks:
+                    hook(response)
+                return response
+            logger.debug('Attempt {} of {} {} failed with status {}'.format(
+                attempt, method, url, response.status_code))
+            # The service limiter waits until the end of the Retry-After delay before the next attempt
+            if retry_after is not None:
+                continue
+        time.sleep(limiter.get_backoff_delay(attempt))
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
@@ -0,0 +1,136 @@
+"""
+Journal of the traits processed by a run of the trait mapping pipeline, so that a run which was
+interrupted can be resumed without processing these traits again.
+
+The journal is a file with one JSON per line. The first line identifies the input file of the run,
+and each of the next lines holds the name of a processed trait and the rows written for it to the
+mappings and curation files, which contain all of its Zooma and OxO results. A trait is recorded
+as soon as it is processed, so that at most the trait being written when the run was interrupted
+is lost, in which case the last line of the journal is incomplete and ignored on resume.
+
+On resume, the output files are written again from the journal before processing the remaining
+traits, so that they hold every processed trait exactly once, whatever was written to them before
+the interruption. The journal is removed once the run completes.
+"""
+
+from collections import OrderedDict
+import json
+import logging
+import os
+
+logger = logging.getLogger(__package__)
+
+JOURNAL_SUFFIX = '.journal'
+JOURNAL_VERSION = 1
+# Number of traits recorded between two synchronisations of the journal to disk
+FSYNC_INTERVAL = 100
+
+
+class RowCollector:
+
+    """Stand-in for a csv.writer, keeping the rows written to it"""
+
+    def __init__(self):
+        self.rows = []
+
+    def writerow(self, row):
+        self.rows.append(row)
+
+
+def get_input_key(input_filepath: str) -> dict:
+    return {'journal_version': JOURNAL_VERSION,
+            'input_file_name': os.path.basename(input_filepath),
+            'input_file_size': os.path.getsize(input_filepath)}
+
+
+def read_journal(journal_filepath: str):
+    """
+    Read a journal, ignoring an incomplete last line.
+
+    :return: Tuple of the first line of the journal, the list of trait entries, and the position of
+             the end of the last complete line.
+    """
+    header = None
+    entries = []
+    end_offset = 0
+    with open(journal_filepath, 'rb') as journal_file:
+        for line in journal_file:
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('Incomplete line')
+                value = json.loads(line.decode('utf-8'))
+            except ValueError:
+                logger.warning('Ignoring incomplete last line of {}'.format(journal_filepath))
+                break
+            if header is None:
+                header = value
+            else:
+                entries.append(value)
+            end_offset += len(line)
+    return header, entries, end_offset
+
+
+class TraitJournal:
+
+    """Journal of the processed traits, opened for appending"""
+
+    def __init__(self, journal_filepath: str, input_filepath: str, resume: bool = False):
+        """
+        :param journal_filepath: Path to the journal file.
+        :param input_filepath: Path to the input file of the run.
+        :param resume: Whether to keep the traits already in the journal, instead of starting a new
+                       journal.
+        """
+        self.journal_filepath = journal_filepath
+        # Entries of the traits processed by previous runs, keyed by trait name
+        self.completed = OrderedDict()
+        self._n_recorded = 0
+        input_key = get_input_key(input_filepath)
+
+        if resume and os.path.exists(journal_filepath):
+            header, entries, end_offset = read_journal(journal_filepath)
+            if header is not None and header != input_key:
+                raise ValueError('Cannot resume from {}, which was written for {} rather than {}'
+                                 .format(journal_filepath, header, input_key))
+            for entry in entries:
+                self.completed[entry['name']] = entry
+            self.journal_file = open(journal_filepath, 'r+b')
+            self.journal_file.truncate(end_offset)
+            self.journal_file.seek(end_offset)
+            if header is None:
+                self._write_line(input_key)
+            logger.info('Resuming from {} with {} traits already processed'.format(
+                journal_filepath, len(self.completed)))
+        else:
+            if resume:
+                logger.warning('No journal at {}, starting from the first trait'.format(
+                    journal_filepath))
+            self.journal_file = open(journal_filepath, 'wb')
+            self._write_line(input_key)
+
+    def _write_line(self, value):
+        self.journal_file.write(json.dumps(value).encode('utf-8') + b'\n')
+        self.journal_file.flush()
+
+    def record(self, trait_name: str, mapping_rows: list, curation_rows: list):
+        """Record a processed trait, with the rows written for it to the output files"""
+        self._write_line({'name': trait_name, 'mapping_rows': mapping_rows,
+                          'curation_rows': curation_rows})
+        self._n_recorded += 1
+        if self._n_recorded % FSYNC_INTERVAL == 0:
+            os.fsync(self.journal_file.fileno())
+
+    def close(self):
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+        self.journal_file.close()
+
+    def remove(self):
+        """Remove the journal of a run which completed, once the output files have been closed"""
+        os.remove(self.journal_filepath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
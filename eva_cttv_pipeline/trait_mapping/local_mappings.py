@@ -0,0 +1,117 @@
+"""
+Index of curated trait mappings, such as feb16_jul16_combined_trait_to_url.tsv or the mappings file
+given to the evidence string generation, consulted before querying Zooma for a trait.
+
+Trait names are matched after normalisation, ignoring case, punctuation and repeated whitespace. A
+trait matching the index is finished with the mapped terms, without querying Zooma or OxO, as long
+as all of these terms are current terms in EFO; otherwise the trait is processed as usual. Trait
+names which normalise to the same name but are mapped to different terms are left out of the index.
+"""
+
+import logging
+import re
+import threading
+
+from eva_cttv_pipeline.evidence_string_generation.clinvar_to_evidence_strings import \
+    load_efo_mapping
+from eva_cttv_pipeline.trait_mapping.ols import get_term_info
+from eva_cttv_pipeline.trait_mapping.trait import OntologyEntry
+
+logger = logging.getLogger(__package__)
+
+NON_WORD_CHARACTERS = re.compile(r'[\W_]+')
+
+_local_mapping_index = None
+
+
+def normalise_trait_name(trait_name: str) -> str:
+    """Normalise a trait name, ignoring case, punctuation and repeated whitespace"""
+    return NON_WORD_CHARACTERS.sub(' ', trait_name.lower()).strip()
+
+
+class LocalMappingIndex:
+
+    """Mapped terms of each normalised trait name, with the number of traits found in the index"""
+
+    def __init__(self, mappings: dict = None):
+        """:param mappings: dict of lists of tuples of the URI and the label, keyed by trait name"""
+        self.mappings = {}
+        self.n_lookups = 0
+        self.n_matches = 0
+        self.n_invalid = 0
+        self.lock = threading.Lock()
+        ambiguous_names = set()
+        for trait_name, term_list in (mappings or {}).items():
+            name = normalise_trait_name(trait_name)
+            previous_term_list = self.mappings.get(name)
+            if previous_term_list is not None and \
+                    {uri for uri, _ in previous_term_list} != {uri for uri, _ in term_list}:
+                ambiguous_names.add(name)
+            self.mappings[name] = list(term_list)
+        for name in ambiguous_names:
+            del self.mappings[name]
+        if ambiguous_names:
+            logger.info('Left out {} ambiguous trait names from the local mappings'.format(
+                len(ambiguous_names)))
+
+    def __len__(self):
+        return len(self.mappings)
+
+    def get_mappings(self, trait_name: str) -> set:
+        """
+        Return the mappings of a trait name, if all of their terms are current terms in EFO.
+
+        :param trait_name: Name of the trait to look up.
+        :return: Set of OntologyEntry, with up-to-date labels, or None if the trait name is not in
+                 the index or is mapped to terms which are not current terms in EFO.
+        """
+        term_list = self.mappings.get(normalise_trait_name(trait_name))
+        ontology_entries = None
+        if term_list is not None:
+            ontology_entries = set()
+            for uri, label in term_list:
+                term_info = get_term_info(uri)
+                if not term_info.is_current_and_in_efo:
+                    ontology_entries = None
+                    break
+                ontology_entries.add(OntologyEntry(uri, term_info.label or label))
+        with self.lock:
+            self.n_lookups += 1
+            if ontology_entries is not None:
+                self.n_matches += 1
+            elif term_list is not None:
+                self.n_invalid += 1
+        return ontology_entries
+
+    def log_summary(self):
+        logger.info('Found local mappings for {} of {} traits, avoiding {} Zooma queries; ignored '
+                    'the local mappings of {} traits to obsolete or non-EFO terms'.format(
+                        self.n_matches, self.n_lookups, self.n_matches, self.n_invalid))
+
+
+def load(filepaths: list) -> LocalMappingIndex:
+    """Build the index from files of mappings in the format read by load_efo_mapping"""
+    mappings = {}
+    for filepath in filepaths:
+        mappings.update(load_efo_mapping(filepath))
+    local_mapping_index = LocalMappingIndex(mappings)
+    logger.info('Loaded local mappings of {} trait names from {}'.format(
+        len(local_mapping_index), ', '.join(filepaths)))
+    return local_mapping_index
+
+
+def configure(filepaths: list) -> LocalMappingIndex:
+    """Make main.process_trait look up traits in the index loaded from filepaths before Zooma"""
+    global _local_mapping_index
+    _local_mapping_index = load(filepaths)
+    return _local_mapping_index
+
+
+def get_index() -> LocalMappingIndex:
+    """Return the index set up by configure(), or None if there are no local mappings"""
+    return _local_mapping_index
+
+
+def close():
+    global _local_mapping_index
+    _local_mapping_index = None
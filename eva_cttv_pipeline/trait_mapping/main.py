@@ -1,18 +1,28 @@
-from collections import Counter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import csv
+import json
 import logging
 import progressbar
+import time
 
+from eva_cttv_pipeline.trait_mapping import fuzzy_matcher, local_mappings, metrics
+from eva_cttv_pipeline.trait_mapping.journal import JOURNAL_SUFFIX, RowCollector, TraitJournal
 from eva_cttv_pipeline.trait_mapping.output import output_trait
-from eva_cttv_pipeline.trait_mapping.oxo import get_oxo_results
-from eva_cttv_pipeline.trait_mapping.oxo import uris_to_oxo_format
+from eva_cttv_pipeline.trait_mapping.oxo import get_oxo_results, get_oxo_results_by_id
+from eva_cttv_pipeline.trait_mapping.oxo import uris_to_oxo_format, OXO_BATCH_SIZE
+from eva_cttv_pipeline.trait_mapping.previous_mappings import load_previous_mappings, \
+    validate_previous_mappings
 from eva_cttv_pipeline.trait_mapping.trait import Trait
-from eva_cttv_pipeline.trait_mapping.trait_names_parsing import parse_trait_names
+from eva_cttv_pipeline.trait_mapping.trait_names_parsing import count_trait_names
 from eva_cttv_pipeline.trait_mapping.zooma import get_zooma_results
 
 
 logger = logging.getLogger(__package__)
 
+# Maximum number of traits held back while waiting for enough IDs to fill a batch of OxO queries
+MAX_PENDING_TRAITS = 1000
+
 
 def get_uris_for_oxo(zooma_result_list: list) -> set:
     """
@@ -30,22 +40,27 @@ def get_uris_for_oxo(zooma_result_list: list) -> set:
     return uri_set
 
 
-def process_trait(trait: Trait, filters: dict, zooma_host: str, oxo_target_list: list,
-                  oxo_distance: int) -> Trait:
+def query_zooma(trait: Trait, filters: dict, zooma_host: str) -> list:
     """
-    Process a single trait. Find any mappings in Zooma. If there are no high confidence Zooma
-    mappings that are in EFO then query OxO with any high confidence mappings not in EFO.
+    Find any mappings of a trait in Zooma, and return the IDs with which to query OxO if there are
+    no high confidence Zooma mappings that are in EFO. Traits which are already finished, such as
+    those with mappings carried forward from a previous release, are left as they are, and traits
+    found in the local mappings, if any, are finished with them without querying Zooma.
 
     :param trait: The trait to be processed.
     :param filters: A dictionary of filters to use for querying Zooma.
     :param zooma_host: A string with the hostname to use for querying Zooma
-    :param oxo_target_list: A list of strings, each being an OxO ID for an ontology. Used to specify
-                            which ontologies should be queried using OxO.
-    :param oxo_distance: int specifying the maximum number of steps to use to query OxO. i.e. OxO's
-                         "distance" parameter.
-    :return: The original trait after querying Zooma and possibly OxO, with any results found.
+    :return: List of IDs of high confidence Zooma mappings not in EFO, in the format used by OxO, or
+             None if OxO does not need to be queried for this trait.
     """
-
+    if trait.is_finished:
+        return None
+    local_mapping_index = local_mappings.get_index()
+    if local_mapping_index is not None:
+        local_mapping_set = local_mapping_index.get_mappings(trait.name)
+        if local_mapping_set is not None:
+            trait.finished_mapping_set = local_mapping_set
+            return None
     logger.debug('Processing trait {}'.format(trait.name))
     trait.zooma_result_list = get_zooma_results(trait.name, filters, zooma_host)
     trait.process_zooma_results()
@@ -54,44 +69,205 @@ def process_trait(trait: Trait, filters: dict, zooma_host: str, oxo_target_list:
             or any([entry.is_current
                     for mapping in trait.zooma_result_list
                     for entry in mapping.mapping_list])):
-        return trait
+        return None
     uris_for_oxo_set = get_uris_for_oxo(trait.zooma_result_list)
     if len(uris_for_oxo_set) == 0:
-        return trait
-    oxo_input_id_list = uris_to_oxo_format(uris_for_oxo_set)
-    trait.oxo_result_list = get_oxo_results(oxo_input_id_list, oxo_target_list, oxo_distance)
+        return None
+    return uris_to_oxo_format(uris_for_oxo_set)
+
+
+def set_oxo_results(trait: Trait, oxo_result_list: list):
+    """Add the OxO results of a trait, and check whether any can be output as finished mappings"""
+    trait.oxo_result_list = oxo_result_list
 
     if not trait.oxo_result_list:
         logger.warning('No OxO mapping for trait {}'.format(trait.name))
 
     trait.process_oxo_mappings()
 
+
+def process_trait(trait: Trait, filters: dict, zooma_host: str, oxo_target_list: list,
+                  oxo_distance: int) -> Trait:
+    """
+    Process a single trait. Find any mappings in Zooma. If there are no high confidence Zooma
+    mappings that are in EFO then query OxO with any high confidence mappings not in EFO.
+
+    :param trait: The trait to be processed.
+    :param filters: A dictionary of filters to use for querying Zooma.
+    :param zooma_host: A string with the hostname to use for querying Zooma
+    :param oxo_target_list: A list of strings, each being an OxO ID for an ontology. Used to specify
+                            which ontologies should be queried using OxO.
+    :param oxo_distance: int specifying the maximum number of steps to use to query OxO. i.e. OxO's
+                         "distance" parameter.
+    :return: The original trait after querying Zooma and possibly OxO, with any results found.
+    """
+    oxo_input_id_list = query_zooma(trait, filters, zooma_host)
+    if oxo_input_id_list is None:
+        return trait
+    set_oxo_results(trait, get_oxo_results(oxo_input_id_list, oxo_target_list, oxo_distance))
     return trait
 
 
+def process_oxo_batch(pending_traits: list, oxo_target_list: list, oxo_distance: int,
+                      oxo_batch_size: int) -> list:
+    """
+    Query OxO at once for the IDs of several traits already processed with query_zooma, and add
+    the results to the traits they belong to. The traits with IDs in a failed request are queried
+    again separately, as process_trait does, so that a single failure does not leave out the
+    results of the other traits of the request.
+
+    :param pending_traits: List of tuples of a trait and its list of IDs returned by query_zooma.
+    :param oxo_target_list: A list of strings, each being an OxO ID for an ontology.
+    :param oxo_distance: int specifying the maximum number of steps to use to query OxO.
+    :param oxo_batch_size: Maximum number of IDs in a single OxO request.
+    :return: List of the traits, in the same order.
+    """
+    oxo_input_id_list = [oxo_id for _, oxo_id_list in pending_traits if oxo_id_list is not None
+                         for oxo_id in oxo_id_list]
+    oxo_results = get_oxo_results_by_id(oxo_input_id_list, oxo_target_list, oxo_distance,
+                                        oxo_batch_size) if oxo_input_id_list else {}
+    for trait, oxo_id_list in pending_traits:
+        if oxo_id_list is None:
+            continue
+        if any(oxo_id in oxo_results and oxo_results[oxo_id] is None for oxo_id in oxo_id_list):
+            set_oxo_results(trait, get_oxo_results(oxo_id_list, oxo_target_list, oxo_distance))
+        else:
+            set_oxo_results(trait, [oxo_results[oxo_id] for oxo_id in oxo_id_list
+                                    if oxo_id in oxo_results])
+    return [trait for trait, _ in pending_traits]
+
+
+def map_in_order(function, items, workers: int):
+    """
+    Yield the result of function for each of items, in the same order as items. With more than one
+    worker, items are processed concurrently by a pool of threads, at most twice as many as workers
+    ahead of the item whose result is being yielded.
+    """
+    if workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending_results = deque()
+        for item in items:
+            pending_results.append(executor.submit(function, item))
+            if len(pending_results) >= 2 * workers:
+                yield pending_results.popleft().result()
+        while pending_results:
+            yield pending_results.popleft().result()
+
+
+def process_traits(traits, filters: dict, zooma_host: str, oxo_target_list: list,
+                   oxo_distance: int, workers: int = 1, oxo_batch_size: int = OXO_BATCH_SIZE):
+    """
+    Process traits, yielding them in the same order as they are in the traits iterable. With more
+    than one worker, traits are queried in Zooma concurrently by a pool of threads, since most of
+    the time is spent waiting for responses from Zooma, OLS and OxO.
+
+    Instead of querying OxO separately for each trait, the IDs of consecutive traits are gathered
+    until there are at least oxo_batch_size of them, and OxO is queried for all of them at once.
+
+    :param traits: Iterable of Trait objects to process.
+    :param filters: A dictionary of filters to use for querying Zooma.
+    :param zooma_host: A string with the hostname to use for querying Zooma
+    :param oxo_target_list: A list of strings, each being an OxO ID for an ontology.
+    :param oxo_distance: int specifying the maximum number of steps to use to query OxO.
+    :param workers: Number of traits to process concurrently.
+    :param oxo_batch_size: Number of IDs to query OxO with in a single request, or 0 to query OxO
+                           separately for each trait.
+    :return: Yields each processed trait.
+    """
+    if oxo_batch_size <= 0:
+        yield from map_in_order(
+            lambda trait: process_trait(trait, filters, zooma_host, oxo_target_list, oxo_distance),
+            traits, workers)
+        return
+
+    pending_traits = []
+    n_pending_ids = 0
+    for trait, oxo_id_list in map_in_order(
+            lambda trait: (trait, query_zooma(trait, filters, zooma_host)), traits, workers):
+        pending_traits.append((trait, oxo_id_list))
+        n_pending_ids += len(oxo_id_list) if oxo_id_list is not None else 0
+        # Traits which do not need OxO are held back as well, to keep the output in order
+        if n_pending_ids >= oxo_batch_size or len(pending_traits) >= MAX_PENDING_TRAITS:
+            yield from process_oxo_batch(pending_traits, oxo_target_list, oxo_distance,
+                                         oxo_batch_size)
+            pending_traits = []
+            n_pending_ids = 0
+    yield from process_oxo_batch(pending_traits, oxo_target_list, oxo_distance, oxo_batch_size)
+
+
 def main(input_filepath, output_mappings_filepath, output_curation_filepath, filters, zooma_host,
-         oxo_target_list, oxo_distance, unattended):
-    trait_names_list = parse_trait_names(input_filepath)
-    trait_names_counter = Counter(trait_names_list)
+         oxo_target_list, oxo_distance, unattended, *, workers=1, oxo_batch_size=OXO_BATCH_SIZE,
+         resume=False, journal_filepath=None, previous_mappings_filepaths=None, parse_workers=1,
+         metrics_filepath=None, progress_interval=None):
+    trait_names_counter = count_trait_names(input_filepath, parse_workers)
 
-    with open(output_mappings_filepath, "w", newline='') as mapping_file, \
+    if journal_filepath is None:
+        journal_filepath = output_mappings_filepath + JOURNAL_SUFFIX
+
+    # The journal is opened first, so that the output files are not overwritten if it can't be
+    # resumed
+    with TraitJournal(journal_filepath, input_filepath, resume) as journal, \
+            open(output_mappings_filepath, "w", newline='') as mapping_file, \
             open(output_curation_filepath, "wt") as curation_file:
         mapping_writer = csv.writer(mapping_file, delimiter="\t")
         mapping_writer.writerow(["#clinvar_trait_name", "uri", "label"])
         curation_writer = csv.writer(curation_file, delimiter="\t")
 
-        trait_names_iterator = trait_names_counter.items()
+        # Write again the output of the traits processed before the run was interrupted
+        for entry in journal.completed.values():
+            mapping_writer.writerows(entry['mapping_rows'])
+            curation_writer.writerows(entry['curation_rows'])
+
+        trait_names_iterator = [(trait_name, freq)
+                                for trait_name, freq in trait_names_counter.items()
+                                if trait_name not in journal.completed]
+
+        valid_previous_mappings = {}
+        if previous_mappings_filepaths:
+            valid_previous_mappings = validate_previous_mappings(
+                load_previous_mappings(previous_mappings_filepaths),
+                [trait_name for trait_name, _ in trait_names_iterator], workers)
+            logger.info('Carrying forward the previous mappings of {} traits, processing the other '
+                        '{} traits'.format(len(valid_previous_mappings),
+                                           len(trait_names_iterator) - len(valid_previous_mappings)))
+
         if not unattended:
             trait_names_iterator = progressbar.ProgressBar(
-                trait_names_iterator, max_value=len(trait_names_counter),
+                trait_names_iterator, max_value=len(trait_names_iterator),
                 widgets=[progressbar.AdaptiveETA(samples=1000)]
             )
 
         logger.info("Loaded {} trait names".format(len(trait_names_counter)))
-        for i, (trait_name, freq) in enumerate(trait_names_iterator):
-            trait = Trait(trait_name, freq)
-            trait = process_trait(trait, filters, zooma_host, oxo_target_list,
-                                  oxo_distance)
-            output_trait(trait, mapping_writer, curation_writer)
+        traits = (Trait(trait_name, freq, valid_previous_mappings.get(trait_name))
+                  for trait_name, freq in trait_names_iterator)
+        processed_traits = process_traits(traits, filters, zooma_host, oxo_target_list,
+                                          oxo_distance, workers, oxo_batch_size)
+        if fuzzy_matcher.get_matcher() is not None:
+            processed_traits = fuzzy_matcher.add_fuzzy_matches(processed_traits,
+                                                               fuzzy_matcher.get_matcher())
+        last_progress_time = time.perf_counter()
+        for i, trait in enumerate(processed_traits):
+            mapping_rows, curation_rows = RowCollector(), RowCollector()
+            output_trait(trait, mapping_rows, curation_rows)
+            journal.record(trait.name, mapping_rows.rows, curation_rows.rows)
+            mapping_writer.writerows(mapping_rows.rows)
+            curation_writer.writerows(curation_rows.rows)
             if unattended and i % 100 == 0:
                 logger.info("Processed {} records".format(i))
+            if unattended and progress_interval and \
+                    time.perf_counter() - last_progress_time >= progress_interval:
+                logger.info(metrics.get_metrics().progress_line(i + 1))
+                last_progress_time = time.perf_counter()
+    journal.remove()
+
+    if local_mappings.get_index() is not None:
+        local_mappings.get_index().log_summary()
+    metrics_summary = json.dumps(metrics.get_metrics().summary(), sort_keys=True)
+    logger.info("Metrics of the queries to Zooma, OLS and OxO: {}".format(metrics_summary))
+    if metrics_filepath is not None:
+        with open(metrics_filepath, "wt") as metrics_file:
+            metrics_file.write(metrics_summary + "\n")
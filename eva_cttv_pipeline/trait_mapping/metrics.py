@@ -0,0 +1,220 @@
+"""
+Metrics of the queries to Zooma, OLS and OxO, telling which service a run spends its time waiting
+for and how many queries the caches save.
+
+For each service, http_client.request() records the number of requests, of attempts and retries,
+of requests which still failed after all the retries, the status of the final responses, a
+histogram of the latency of each attempt and the time spent waiting for the rate limiter. The hits
+and misses of the persistent response cache are recorded by response_cache.cached(), and those of
+the in-memory caches of the functions registered with register_lru_cache() are read from their
+cache_info().
+
+The metrics are collected for the whole process, from the import of the module or the last call to
+reset(), and are always on since recording them is cheap compared to a request.
+"""
+
+from collections import Counter
+import threading
+import time
+
+# Upper bounds, in seconds, of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lru_caches = {}
+
+
+def format_bucket(upper_bound: float) -> str:
+    return '<={}s'.format(upper_bound)
+
+
+def get_hit_ratio(hits: int, misses: int) -> float:
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+
+class ServiceMetrics:
+
+    """Counts and latencies of the requests to a single service"""
+
+    def __init__(self):
+        self.n_requests = 0
+        self.n_attempts = 0
+        self.n_retries = 0
+        self.n_failures = 0
+        self.n_connection_errors = 0
+        self.status_counts = Counter()
+        # Number of attempts in each latency bucket, the last one being above the largest bound
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_wait = 0.0
+        self.lock = threading.Lock()
+
+    def record_attempt(self, latency: float, wait: float = 0.0, status: int = None):
+        """
+        Record an attempt at a request.
+
+        :param latency: Seconds until the response, or until the connection failed.
+        :param wait: Seconds spent waiting for the rate limiter before the attempt.
+        :param status: Status of the response, or None if the connection failed.
+        """
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and latency > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        with self.lock:
+            self.n_attempts += 1
+            self.latency_counts[bucket] += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.total_wait += wait
+            if status is None:
+                self.n_connection_errors += 1
+
+    def record_request(self, n_retries: int, status: int = None, failed: bool = False):
+        """
+        Record the outcome of a request, after all of its attempts.
+
+        :param n_retries: Number of attempts after the first one.
+        :param status: Status of the final response, or None if the connection failed.
+        :param failed: Whether the request failed after all the retries.
+        """
+        with self.lock:
+            self.n_requests += 1
+            self.n_retries += n_retries
+            if failed:
+                self.n_failures += 1
+            if status is not None:
+                self.status_counts[status] += 1
+
+    def get_latency_quantile(self, quantile: float) -> float:
+        """
+        Return the upper bound of the histogram bucket holding the given quantile of the latencies,
+        or the maximum latency if it is above all the buckets.
+        """
+        rank = quantile * self.n_attempts
+        cumulative_count = 0
+        for upper_bound, count in zip(LATENCY_BUCKETS, self.latency_counts):
+            cumulative_count += count
+            if cumulative_count >= rank:
+                return upper_bound
+        return round(self.max_latency, 4)
+
+    def summary(self) -> dict:
+        with self.lock:
+            histogram = {format_bucket(upper_bound): count
+                         for upper_bound, count in zip(LATENCY_BUCKETS, self.latency_counts)}
+            histogram['>{}s'.format(LATENCY_BUCKETS[-1])] = self.latency_counts[-1]
+            return {
+                'requests': self.n_requests,
+                'attempts': self.n_attempts,
+                'retries': self.n_retries,
+                'failures': self.n_failures,
+                'connection_errors': self.n_connection_errors,
+                'statuses': {str(status): count for status, count in self.status_counts.items()},
+                'latency': {
+                    'mean': round(self.total_latency / self.n_attempts, 4)
+                    if self.n_attempts else None,
+                    'p50': self.get_latency_quantile(0.5) if self.n_attempts else None,
+                    'p95': self.get_latency_quantile(0.95) if self.n_attempts else None,
+                    'max': round(self.max_latency, 4),
+                    'histogram': histogram,
+                },
+                'rate_limit_wait': round(self.total_wait, 4),
+            }
+
+
+class Metrics:
+
+    """Metrics of all the services and of the response cache, keyed by service or namespace"""
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.services = {}
+        self.cache_counts = {}
+        self.lock = threading.Lock()
+
+    def get_service(self, service: str) -> ServiceMetrics:
+        with self.lock:
+            service_metrics = self.services.get(service)
+            if service_metrics is None:
+                service_metrics = self.services[service] = ServiceMetrics()
+            return service_metrics
+
+    def record_cache_lookup(self, namespace: str, hit: bool):
+        """Record a lookup in the response cache"""
+        with self.lock:
+            counts = self.cache_counts.setdefault(namespace, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def summary(self) -> dict:
+        with self.lock:
+            services = dict(self.services)
+            cache_counts = {namespace: list(counts)
+                            for namespace, counts in self.cache_counts.items()}
+        lru_caches = {}
+        for name, function in sorted(_lru_caches.items()):
+            cache_info = function.cache_info()
+            lru_caches[name] = {'hits': cache_info.hits, 'misses': cache_info.misses,
+                                'hit_ratio': get_hit_ratio(cache_info.hits, cache_info.misses),
+                                'size': cache_info.currsize}
+        return {
+            'elapsed': round(time.perf_counter() - self.start_time, 4),
+            'services': {service: service_metrics.summary()
+                         for service, service_metrics in sorted(services.items())},
+            'response_cache': {namespace: {'hits': hits, 'misses': misses,
+                                           'hit_ratio': get_hit_ratio(hits, misses)}
+                               for namespace, (hits, misses) in sorted(cache_counts.items())},
+            'lru_caches': lru_caches,
+        }
+
+    def progress_line(self, n_traits: int) -> str:
+        """Return a line with the number of traits processed and the requests to each service"""
+        elapsed = time.perf_counter() - self.start_time
+        with self.lock:
+            services = sorted(self.services.items())
+        service_lines = []
+        for service, service_metrics in services:
+            with service_metrics.lock:
+                service_lines.append('{}: {} requests, {:.0f} ms mean latency, {} retries, '
+                                     '{} failures'.format(
+                                         service, service_metrics.n_requests,
+                                         1000 * service_metrics.total_latency /
+                                         max(service_metrics.n_attempts, 1),
+                                         service_metrics.n_retries, service_metrics.n_failures))
+        return 'Processed {} traits in {:.0f} s ({:.1f} traits/s); {}'.format(
+            n_traits, elapsed, n_traits / elapsed if elapsed else 0.0,
+            '; '.join(service_lines) or 'no requests')
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    return _metrics
+
+
+def get_service(service: str) -> ServiceMetrics:
+    return _metrics.get_service(service)
+
+
+def record_cache_lookup(namespace: str, hit: bool):
+    _metrics.record_cache_lookup(namespace, hit)
+
+
+def register_lru_cache(name: str):
+    """Decorator reporting the hits and misses of a function decorated with functools.lru_cache"""
+    def decorator(function):
+        _lru_caches[name] = function
+        return function
+    return decorator
+
+
+def clear_lru_caches():
+    """Empty the in-memory caches of the functions registered with register_lru_cache"""
+    for function in _lru_caches.values():
+        function.cache_clear()
+
+
+def reset():
+    """Start collecting the metrics afresh, leaving the in-memory caches as they are"""
+    global _metrics
+    _metrics = Metrics()
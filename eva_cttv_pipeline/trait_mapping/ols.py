@@ -1,9 +1,13 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+import itertools
 import logging
 import requests
 import urllib
 
-from eva_cttv_pipeline.trait_mapping.utils import request_retry_helper
+from eva_cttv_pipeline.trait_mapping import efo_index, http_client, metrics, response_cache
+from eva_cttv_pipeline.trait_mapping.utils import query_or_none
 
 
 OLS_EFO_SERVER = 'https://www.ebi.ac.uk/ols'
@@ -12,45 +16,69 @@ OLS_EFO_SERVER = 'https://www.ebi.ac.uk/ols'
 # HTTP instead of HTTPS; (2) it must include the port which you used when deploying the Docker
 # container; (3) it does *not* include /ols in its path.
 # OLS_EFO_SERVER = 'http://127.0.0.1:8080'
+# Number of terms in each page of the listing of the EFO terms, the largest size allowed by OLS
+OLS_PAGE_SIZE = 500
 
 logger = logging.getLogger(__package__)
 
 
+@response_cache.cached('ols_label')
 def get_label_from_ols(url: str) -> str:
     """
     Given a url for OLS, make a get request and return the label for the term, from the response
-    from OLS.
+    from OLS. Failed requests raise an exception rather than returning None, so that they are not
+    cached and are made again the next time.
 
     :param url: OLS url to which to make a get request to query for a term.
-    :return: The ontology label of the term specified in the url.
+    :return: The ontology label of the term specified in the url, or None if OLS doesn't know the
+             term or no ontology defines it.
+    :raises requests.RequestException: If the request failed or OLS answered with an error.
+    :raises ValueError: If the response is not valid json.
     """
+    response = http_client.get(url, service='ols')
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
     try:
-        json_response = requests.get(url).json()
-        for term in json_response["_embedded"]["terms"]:
+        for term in response.json()["_embedded"]["terms"]:
             if term["is_defining_ontology"]:
                 return term["label"]
-    except Exception as e:
-        logger.warning(e)
+    except (KeyError, TypeError) as e:
+        logger.warning("Unexpected response from OLS for {}: {}".format(url, e))
     return None
 
 
-@lru_cache(maxsize=16384)
 def get_ontology_label_from_ols(ontology_uri: str) -> str:
+    """
+    Find the term label for the provided ontology uri, in the local EFO index if there is one and
+    it contains the term, otherwise by querying OLS.
+
+    :param ontology_uri: A uri for a term in an ontology.
+    :return: Term label for the ontology uri provided in the parameters.
+    """
+    local_efo_index = efo_index.get_index()
+    if local_efo_index is not None and ontology_uri in local_efo_index:
+        return local_efo_index.get_label(ontology_uri)
+    return query_or_none(query_ontology_label_from_ols, ontology_uri)
+
+
+@metrics.register_lru_cache('ols_label')
+@lru_cache(maxsize=16384)
+def query_ontology_label_from_ols(ontology_uri: str) -> str:
     """
     Using provided ontology uri, build an OLS url with which to make a request for the uri to find
-    the term label for this uri.
+    the term label for this uri. Failed requests raise an exception, as in get_label_from_ols.
 
     :param ontology_uri: A uri for a term in an ontology.
     :return: Term label for the ontology uri provided in the parameters.
     """
     url = build_ols_query(ontology_uri)
-    label = request_retry_helper(get_label_from_ols, 4, url)
-    return label
+    return get_label_from_ols(url)
 
 
 def build_ols_query(ontology_uri: str) -> str:
     """Build a url to query OLS for a given ontology uri."""
-    return "https://www.ebi.ac.uk/ols/api/terms?iri={}".format(ontology_uri)
+    return "{}/api/terms?iri={}".format(OLS_EFO_SERVER, ontology_uri)
 
 
 def double_encode_uri(uri: str) -> str:
@@ -58,6 +86,11 @@ def double_encode_uri(uri: str) -> str:
     return urllib.parse.quote(urllib.parse.quote(uri, safe=""), safe="")
 
 
+def build_ols_efo_query(uri: str) -> str:
+    """Build a url to query EFO using OLS for a given ontology uri."""
+    return "{}/api/ontologies/efo/terms/{}".format(OLS_EFO_SERVER, double_encode_uri(uri))
+
+
 def ols_efo_query(uri: str) -> requests.Response:
     """
     Query EFO using OLS for a given ontology uri, returning the response from the request.
@@ -65,12 +98,53 @@ def ols_efo_query(uri: str) -> requests.Response:
     :param uri: Ontology uri to use in querying EFO using OLS
     :return: Response from OLS
     """
-    double_encoded_uri = double_encode_uri(uri)
-    return requests.get(
-        "{}/api/ontologies/efo/terms/{}".format(OLS_EFO_SERVER, double_encoded_uri))
+    return http_client.get(build_ols_efo_query(uri), service='ols')
 
 
+def get_efo_term_status(uri: str) -> dict:
+    """
+    Return whether a given ontology uri is a term in EFO and whether this term is obsolete, from
+    the local EFO index if there is one, otherwise by querying OLS.
+
+    :param uri: Ontology uri to look up
+    :return: dict with the boolean values "in_efo" and "is_obsolete", or None if unknown
+    """
+    local_efo_index = efo_index.get_index()
+    if local_efo_index is not None:
+        return local_efo_index.get_status(uri)
+    return query_or_none(query_efo_term_status, uri)
+
+
+@metrics.register_lru_cache('ols_efo_term')
 @lru_cache(maxsize=16384)
+# Cached under the url of the query, like the other responses, so that the responses of different
+# OLS servers are kept apart
+@response_cache.cached('ols_efo_term', build_ols_efo_query)
+def query_efo_term_status(uri: str) -> dict:
+    """
+    Query EFO using OLS for a given ontology uri, returning whether it is a term in EFO and whether
+    this term is obsolete. If the term is defined by EFO, its label is returned as well, being the
+    same as the one given by get_ontology_label_from_ols. When OLS does not give a definite answer,
+    an exception is raised rather than None returned, so that the failure is not cached.
+
+    :param uri: Ontology uri to use in querying EFO using OLS
+    :return: dict with the boolean values "in_efo" and "is_obsolete", and the "label" or None
+    :raises requests.RequestException: If the request failed or OLS answered with an unexpected
+                                       status.
+    :raises ValueError: If the response is not valid json.
+    """
+    response = ols_efo_query(uri)
+    if response.status_code == 200:
+        response_json = response.json()
+        label = response_json["label"] if response_json.get("is_defining_ontology") else None
+        return {"in_efo": True, "is_obsolete": response_json["is_obsolete"], "label": label}
+    if response.status_code == 404:
+        return {"in_efo": False, "is_obsolete": False, "label": None}
+    response.raise_for_status()
+    raise requests.HTTPError("Unexpected status {} from OLS for {}".format(response.status_code,
+                                                                          uri), response=response)
+
+
 def is_current_and_in_efo(uri: str) -> bool:
     """
     Checks whether given ontology uri is a valid and non-obsolete term in EFO.
@@ -78,14 +152,10 @@ def is_current_and_in_efo(uri: str) -> bool:
     :param uri: Ontology uri to use in querying EFO using OLS
     :return: Boolean value, true if ontology uri is valid and non-obsolete term in EFO
     """
-    response = ols_efo_query(uri)
-    if response.status_code != 200:
-        return False
-    response_json = response.json()
-    return not response_json["is_obsolete"]
+    status = get_efo_term_status(uri)
+    return status is not None and status["in_efo"] and not status["is_obsolete"]
 
 
-@lru_cache(maxsize=16384)
 def is_in_efo(uri: str) -> bool:
     """
     Checks whether given ontology uri is a valid term in EFO.
@@ -93,5 +163,79 @@ def is_in_efo(uri: str) -> bool:
     :param uri: Ontology uri to use in querying EFO using OLS
     :return: Boolean value, true if ontology uri is valid and non-obsolete term in EFO
     """
-    response = ols_efo_query(uri)
-    return response.status_code == 200
+    status = get_efo_term_status(uri)
+    return status is not None and status["in_efo"]
+
+
+class TermInfo(namedtuple('TermInfo', ['label', 'in_efo', 'is_obsolete'])):
+
+    """Label of an ontology term, whether it is in EFO and whether it is obsolete in EFO"""
+
+    __slots__ = ()
+
+    @property
+    def is_current_and_in_efo(self):
+        return self.in_efo and not self.is_obsolete
+
+
+def get_term_info(uri: str) -> TermInfo:
+    """
+    Find the label of a given ontology uri, whether it is in EFO and whether it is obsolete in EFO,
+    with as few requests as possible: a single one to OLS for terms defined by EFO, and none at all
+    for EFO terms when there is a local EFO index.
+
+    :param uri: A uri for a term in an ontology.
+    :return: TermInfo of the term. Its label is None if it could not be found, and it is not in EFO
+             if OLS did not give a definite answer.
+    """
+    status = get_efo_term_status(uri)
+    if status is None:
+        status = {"in_efo": False, "is_obsolete": False}
+    label = status.get("label")
+    if label is None:
+        label = get_ontology_label_from_ols(uri)
+    return TermInfo(label, status["in_efo"], status["is_obsolete"])
+
+
+def get_efo_terms_page(page: int, page_size: int = OLS_PAGE_SIZE) -> dict:
+    """
+    Query OLS for a page of the listing of all the terms in EFO, raising requests.HTTPError if OLS
+    answers with an error status after all the retries.
+
+    :param page: Number of the page, starting from 0.
+    :param page_size: Number of terms in each page.
+    :return: Response from OLS, with the terms and the total number of pages and terms.
+    """
+    response = http_client.get("{}/api/ontologies/efo/terms".format(OLS_EFO_SERVER),
+                               params={"page": page, "size": page_size}, service='ols')
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_efo_index(page_size: int = OLS_PAGE_SIZE, workers: int = 1) -> efo_index.EfoIndex:
+    """
+    Build an index of all the terms in EFO, with their labels and obsolete status, by paging
+    through the listing of the EFO terms in OLS, so that the index can be used instead of querying
+    OLS for each term. The first page gives the number of pages, which are then fetched
+    concurrently.
+
+    :param page_size: Number of terms in each page.
+    :param workers: Number of pages to fetch concurrently.
+    :return: EfoIndex of the terms.
+    """
+    first_page = get_efo_terms_page(0, page_size)
+    n_pages = first_page["page"]["totalPages"]
+    n_terms = first_page["page"]["totalElements"]
+    logger.info("Fetching {} EFO terms from OLS in {} pages".format(n_terms, n_pages))
+
+    index = efo_index.EfoIndex()
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        pages = executor.map(lambda page: get_efo_terms_page(page, page_size), range(1, n_pages))
+        for response_json in itertools.chain([first_page], pages):
+            for term in response_json.get("_embedded", {}).get("terms", []):
+                index.add(term["iri"], term["label"], term["is_obsolete"])
+    if len(index) != n_terms:
+        logger.warning("Fetched {} distinct EFO terms from OLS instead of {}, the listing may have "
+                       "changed while paging through it".format(len(index), n_terms))
+    logger.info("Fetched {} EFO terms from OLS".format(len(index)))
+    return index
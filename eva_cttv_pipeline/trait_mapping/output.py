@@ -27,8 +27,8 @@ def get_mappings_for_curation(result_list) -> list:
 
 def output_for_curation(trait: Trait, curation_writer: csv.writer):
     """
-    Write any non-finished Zooma or OxO mappings of a trait to a file for manual curation.
-    Also outputs traits without any ontology mappings.
+    Write any non-finished Zooma or OxO mappings, and any fuzzy matches, of a trait to a file for
+    manual curation. Also outputs traits without any ontology mappings.
 
     :param trait: A Trait with no finished ontology mappings in finished_mapping_set
     :param curation_writer: A csv.writer to write non-finished ontology mappings for manual curation
@@ -49,6 +49,15 @@ def output_for_curation(trait: Trait, curation_writer: csv.writer):
                 oxo_mapping.query_id, 'EFO_CURRENT' if oxo_mapping.in_efo else 'NOT_CONTAINED']
         output_row.append("|".join(cell))
 
+    for fuzzy_match in trait.fuzzy_match_list:
+        if fuzzy_match.in_efo is None:
+            status = 'NOT_SPECIFIED'
+        else:
+            status = 'EFO_CURRENT' if fuzzy_match.in_efo else 'NOT_CONTAINED'
+        cell = [fuzzy_match.uri, fuzzy_match.label, '{:.2f}'.format(fuzzy_match.score),
+                'fuzzy-match', status]
+        output_row.append("|".join(cell))
+
     curation_writer.writerow(output_row)
 
 
@@ -1,15 +1,20 @@
+from collections import OrderedDict
 from functools import total_ordering, lru_cache
 import json
 import logging
 import re
-import requests
 
-from eva_cttv_pipeline.trait_mapping.ols import get_ontology_label_from_ols, is_in_efo
-from eva_cttv_pipeline.trait_mapping.ols import is_current_and_in_efo
+from eva_cttv_pipeline.trait_mapping import http_client, metrics, response_cache
+from eva_cttv_pipeline.trait_mapping.ols import get_term_info
+from eva_cttv_pipeline.trait_mapping.utils import query_or_none
 
 
 logger = logging.getLogger(__package__)
 
+OXO_SERVER = 'https://www.ebi.ac.uk/spot/oxo'
+# Number of IDs sent in a single request by get_oxo_results_by_id
+OXO_BATCH_SIZE = 200
+
 
 class OntologyUri:
     db_to_uri_dict = {
@@ -104,6 +109,7 @@ URI_DB_TO_DB_DICT = {
 NON_NUMERIC_RE = re.compile(r'[^\d]+')
 
 
+@metrics.register_lru_cache('oxo_id')
 @lru_cache(maxsize=16384)
 def uri_to_oxo_format(uri: str) -> str:
     """
@@ -152,44 +158,25 @@ def build_oxo_payload(id_list: list, target_list: list, distance: int) -> dict:
     return payload
 
 
+def build_oxo_cache_key(url: str, payload: dict) -> str:
+    return "{}\t{}".format(url, json.dumps(payload, sort_keys=True))
+
+
+@response_cache.cached('oxo', build_oxo_cache_key)
 def oxo_query_helper(url: str, payload: dict) -> dict:
     """
-    Make post request to OxO url using provided payload, returning json response, or None if there
-    is an error in decoding.
+    Make post request to OxO url using provided payload, returning json response. Failed requests
+    raise an exception rather than returning None, so that they are not cached.
 
     :param url: url to make request
     :param payload: Payload to use to make POST request
     :return: json response from OxO
+    :raises requests.RequestException: If the request failed or OxO answered with an error.
+    :raises ValueError: If the response is not valid json.
     """
-    try:
-        json_response = requests.post(url, data=payload).json()
-        return json_response
-    except json.decoder.JSONDecodeError as e:
-        return None
-
-
-def oxo_request_retry_helper(retry_count: int, url: str, id_list: list, target_list: list,
-                             distance: int) -> dict:
-    """
-    Make a number of attempts to query OxO for it to successfully return a non-None value,
-    subsequently returning this value. Makes the number of tries specified in retry_count parameter.
-
-    :param retry_count: Number of attempts to make
-    :param url: String specifying the url to make a request.
-    :param id_list: List of IDs with which to find xrefs using OxO
-    :param target_list: List of ontology datasources to include
-    :param distance: Number of steps to take through xrefs to find mappings
-    :return: Returned value from OxO request.
-    """
-    payload = build_oxo_payload(id_list, target_list, distance)
-    for retry_num in range(retry_count):
-        return_value = oxo_query_helper(url, payload)
-        if return_value is not None:
-            return return_value
-        logger.warning("attempt {}: failed running function oxo_query_helper with url {}".format(
-            retry_num, url))
-    logger.warning("error on last attempt, skipping")
-    return None
+    response = http_client.post(url, data=payload, service='oxo')
+    response.raise_for_status()
+    return response.json()
 
 
 def get_oxo_results_from_response(oxo_response: dict) -> list:
@@ -216,17 +203,13 @@ def get_oxo_results_from_response(oxo_response: dict) -> list:
 
             uri = str(oxo_mapping.uri)
 
-            ontology_label = get_ontology_label_from_ols(uri)
-            if ontology_label is not None:
-                oxo_mapping.ontology_label = ontology_label
+            term_info = get_term_info(uri)
+            if term_info.label is not None:
+                oxo_mapping.ontology_label = term_info.label
 
-            uri_is_current_and_in_efo = is_current_and_in_efo(uri)
-            if not uri_is_current_and_in_efo:
-                uri_is_in_efo = is_in_efo(uri)
-                oxo_mapping.in_efo = uri_is_in_efo
-            else:
-                oxo_mapping.in_efo = uri_is_current_and_in_efo
-                oxo_mapping.is_current = uri_is_current_and_in_efo
+            oxo_mapping.in_efo = term_info.in_efo
+            if term_info.is_current_and_in_efo:
+                oxo_mapping.is_current = True
 
             oxo_result.mapping_list.append(oxo_mapping)
 
@@ -235,6 +218,26 @@ def get_oxo_results_from_response(oxo_response: dict) -> list:
     return oxo_result_list
 
 
+def get_oxo_results_or_none(id_list: list, target_list: list, distance: int):
+    """
+    Query OxO like get_oxo_results, but return None if the request failed or its response could not
+    be parsed, rather than an empty list.
+    """
+    url = "{}/api/search?size=5000".format(OXO_SERVER)
+    payload = build_oxo_payload(id_list, target_list, distance)
+    oxo_response = query_or_none(oxo_query_helper, url, payload)
+
+    if oxo_response is None:
+        return None
+
+    if "_embedded" not in oxo_response:
+        logger.warning("Cannot parse the response from OxO for the following identifiers:")
+        logger.warning(','.join(id_list))
+        return None
+
+    return get_oxo_results_from_response(oxo_response)
+
+
 def get_oxo_results(id_list: list, target_list: list, distance: int) -> list:
     """
     Use list of ontology IDs, datasource targets and distance call function to query OxO and return
@@ -245,15 +248,32 @@ def get_oxo_results(id_list: list, target_list: list, distance: int) -> list:
     :param distance: Number of steps to take through xrefs to find mappings
     :return: List of OxOResults based upon results from request made to OxO
     """
-    url = "https://www.ebi.ac.uk/spot/oxo/api/search?size=5000"
-    oxo_response = oxo_request_retry_helper(4, url, id_list, target_list, distance)
+    oxo_results = get_oxo_results_or_none(id_list, target_list, distance)
+    return oxo_results if oxo_results is not None else []
 
-    if oxo_response is None:
-        return []
 
-    if "_embedded" not in oxo_response:
-        logger.warning("Cannot parse the response from OxO for the following identifiers:")
-        logger.warning(','.join(id_list))
-        return []
+def get_oxo_results_by_id(id_list: list, target_list: list, distance: int,
+                          batch_size: int = OXO_BATCH_SIZE) -> dict:
+    """
+    Query OxO for the IDs of many traits at once, with one request for each batch_size IDs.
 
-    return get_oxo_results_from_response(oxo_response)
+    :param id_list: List of ontology IDs with which to find xrefs using OxO, possibly repeated
+    :param target_list: List of ontology datasources to include
+    :param distance: Number of steps to take through xrefs to find mappings
+    :param batch_size: Maximum number of IDs in a single request
+    :return: dict with the OxOResult of each ID which has any mappings, keyed by this ID. The IDs of
+             the requests which failed are mapped to None.
+    """
+    unique_id_list = list(OrderedDict.fromkeys(id_list))
+    oxo_results = {}
+    for start in range(0, len(unique_id_list), batch_size):
+        batch_id_list = unique_id_list[start:start + batch_size]
+        batch_oxo_results = get_oxo_results_or_none(batch_id_list, target_list, distance)
+        if batch_oxo_results is None:
+            oxo_results.update((oxo_id, None) for oxo_id in batch_id_list)
+            continue
+        for oxo_result in batch_oxo_results:
+            oxo_results[oxo_result.query_id] = oxo_result
+    logger.debug('Queried OxO for {} IDs in {} requests'.format(
+        len(unique_id_list), (len(unique_id_list) + batch_size - 1) // batch_size))
+    return oxo_results
@@ -0,0 +1,72 @@
+"""
+Mappings of a previous release, carried forward to the traits of the current one which have the
+same names, so that only new traits and traits whose mappings are no longer valid need to be
+processed again.
+
+Previous mappings are read from files in the format of the automated mappings output, or of the
+curated mappings: one line per trait, with the trait name, then one or more ontology URIs separated
+by "|", and optionally their labels; lines starting with "#" are ignored. Before being carried
+forward, the status of all the URIs is checked again, and the mappings of a trait are only carried
+forward if all of its URIs are still current terms in EFO.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import logging
+
+from eva_cttv_pipeline.trait_mapping.ols import get_term_info
+from eva_cttv_pipeline.trait_mapping.trait import OntologyEntry
+
+logger = logging.getLogger(__package__)
+
+
+def load_previous_mappings(filepaths: list) -> dict:
+    """
+    Load the mappings from files of previous mappings. When a trait is in several files, the
+    mappings from the last file are kept, so that curated mappings can override automated ones.
+
+    :param filepaths: List of paths to files of previous mappings.
+    :return: dict of the list of ontology URIs of each trait, keyed by lower case trait name.
+    """
+    previous_mappings = {}
+    for filepath in filepaths:
+        file_mappings = {}
+        with open(filepath, 'rt', newline='') as mappings_file:
+            for row in csv.reader(mappings_file, delimiter='\t'):
+                if not row or row[0].startswith('#') or len(row) < 2 or not row[1]:
+                    continue
+                uris = file_mappings.setdefault(row[0].lower(), [])
+                for uri in row[1].split('|'):
+                    if uri not in uris:
+                        uris.append(uri)
+        logger.info('Loaded previous mappings of {} traits from {}'.format(
+            len(file_mappings), filepath))
+        previous_mappings.update(file_mappings)
+    return previous_mappings
+
+
+def validate_previous_mappings(previous_mappings: dict, trait_names, workers: int = 1) -> dict:
+    """
+    Check the current status in EFO of the previous mappings of the given traits, looking up all of
+    their distinct URIs at once.
+
+    :param previous_mappings: dict of the list of ontology URIs of each trait, keyed by trait name.
+    :param trait_names: Names of the traits of the current release.
+    :param workers: Number of URIs to look up concurrently.
+    :return: dict of the set of OntologyEntry, with up-to-date labels, for each trait whose
+             previous mappings are all current terms in EFO.
+    """
+    trait_uris = {name: previous_mappings[name] for name in trait_names
+                  if name in previous_mappings}
+    uris = sorted({uri for uri_list in trait_uris.values() for uri in uri_list})
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        term_infos = dict(zip(uris, executor.map(get_term_info, uris)))
+
+    valid_mappings = {}
+    for name, uri_list in trait_uris.items():
+        if all(term_infos[uri].is_current_and_in_efo for uri in uri_list):
+            valid_mappings[name] = {OntologyEntry(uri, term_infos[uri].label) for uri in uri_list}
+    logger.info('Previous mappings of {} traits still valid, {} traits mapped to obsolete or '
+                'non-EFO terms ({} distinct terms checked)'.format(
+                    len(valid_mappings), len(trait_uris) - len(valid_mappings), len(uris)))
+    return valid_mappings
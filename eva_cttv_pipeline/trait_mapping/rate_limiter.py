@@ -0,0 +1,156 @@
+"""
+Client-side rate limiting of the requests to Zooma, OLS and OxO, shared by all the threads of a run.
+
+Each service gets its own limiter, even when several services are on the same host, combining:
+ * a token bucket, allowing on average `rate` requests per second, with bursts of up to `burst`;
+ * a limit on the number of requests in flight, which is halved every time the service answers
+   that it is overloaded (429 or 5xx status, or a failed connection), and grows back by one after
+   as many successful requests as the current limit (additive increase, multiplicative decrease);
+ * a pause of all requests to the service when it sends a Retry-After header.
+
+Retries are delayed by an exponential backoff with full jitter, so that threads which failed
+together do not retry together.
+"""
+
+from email.utils import parsedate_to_datetime
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__package__)
+
+DEFAULT_RATE = 20.0
+DEFAULT_MAX_CONCURRENCY = 10
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 60.0
+# Longest pause accepted from a Retry-After header, in seconds
+MAX_RETRY_AFTER = 300.0
+
+
+def parse_retry_after(value: str) -> float:
+    """Return the number of seconds to wait from a Retry-After header, or None if it is invalid"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class TokenBucket:
+
+    """Allow on average rate calls per second to acquire(), and bursts of up to burst calls"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ServiceLimiter:
+
+    """Rate and concurrency limits of the requests to a single service"""
+
+    def __init__(self, service: str, rate: float, burst: float, max_concurrency: int):
+        self.service = service
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max(max_concurrency, 1)
+        self.concurrency_limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.n_throttled = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """Wait until a request can be sent to the service"""
+        with self.condition:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self.condition.wait(pause)
+                elif self.in_flight >= int(self.concurrency_limit):
+                    self.condition.wait()
+                else:
+                    break
+            self.in_flight += 1
+        self.bucket.acquire()
+
+    def release(self, throttled: bool = False, retry_after: float = None):
+        """
+        Record the end of a request, adjusting the concurrency limit.
+
+        :param throttled: Whether the service was overloaded or unreachable.
+        :param retry_after: Number of seconds during which the service asked not to be queried.
+        """
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.n_throttled += 1
+                new_limit = max(1.0, self.concurrency_limit / 2)
+                if int(new_limit) < int(self.concurrency_limit):
+                    logger.warning('{} is overloaded, reducing concurrent requests to {}'.format(
+                        self.service, int(new_limit)))
+                self.concurrency_limit = new_limit
+            else:
+                self.concurrency_limit = min(float(self.max_concurrency),
+                                             self.concurrency_limit + 1 / self.concurrency_limit)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.condition.notify_all()
+
+
+class RateLimiter:
+
+    """Limiters of all the services queried, created on first use with the same settings"""
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX):
+        """
+        :param rate: Average number of requests per second to each service, or 0 for no limit.
+        :param burst: Maximum number of requests sent at once to a service after a quiet period. By
+                      default the same as rate.
+        :param max_concurrency: Maximum number of requests in flight to each service.
+        :param backoff_base: Delay before the first retry, in seconds, doubled at each retry.
+        :param backoff_max: Maximum delay before a retry, in seconds.
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.max_concurrency = max_concurrency
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.service_limiters = {}
+        self.lock = threading.Lock()
+
+    def get_service_limiter(self, service: str) -> ServiceLimiter:
+        with self.lock:
+            if service not in self.service_limiters:
+                self.service_limiters[service] = ServiceLimiter(service, self.rate, self.burst,
+                                                                self.max_concurrency)
+            return self.service_limiters[service]
+
+    def get_backoff_delay(self, attempt: int) -> float:
+        """Return a random delay before retrying for the attempt-th time, starting from 0"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
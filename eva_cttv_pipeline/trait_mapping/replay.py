@@ -0,0 +1,301 @@
+"""
+Recording of the responses of Zooma, OLS and OxO, and a local HTTP server replaying them, so that
+the trait mapping pipeline can be benchmarked and load tested offline and deterministically.
+
+The responses are kept in a FixtureStore, saved to a file with one JSON per line holding the method,
+the path and query string, and the body of a request, along with the status, content type and
+content of its response. The ReplayServer stands in for all three services at once:
+
+ * Zooma at the server URL, e.g. http://127.0.0.1:8000;
+ * OLS at the server URL followed by /ols;
+ * OxO at the server URL followed by /spot/oxo.
+
+so requests are recorded under the path of their service on the ReplayServer followed by the rest of
+their URL after the base URL of the service, wherever the service was when they were recorded.
+
+Files ending with .gz are compressed.
+"""
+
+import gzip
+import json
+import logging
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+from eva_cttv_pipeline.trait_mapping import http_client, metrics, ols, oxo, response_cache
+
+logger = logging.getLogger(__package__)
+
+DEFAULT_ZOOMA_HOST = 'https://www.ebi.ac.uk'
+OLS_PATH = '/ols'
+OXO_PATH = '/spot/oxo'
+ERROR_STATUS = 503
+# Status of the responses to requests which were not recorded, chosen not to be retried and not to
+# be mistaken for an answer from OLS, for which 404 means that a term is not in EFO
+MISSING_STATUS = 501
+
+
+def _open(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def get_request_target(url: str) -> str:
+    """Return the path and query string of a URL, as sent in the request line"""
+    split_url = urlsplit(url)
+    return split_url.path + ('?' + split_url.query if split_url.query else '')
+
+
+def get_replay_target(url: str, servers: dict) -> str:
+    """
+    Return the path and query string under which the ReplayServer serves the response to a URL.
+
+    :param url: URL of the request.
+    :param servers: dict with the base URL of each service, keyed by the path of the service on the
+                    ReplayServer, '' for Zooma.
+    :return: The path of the service whose base URL is the longest prefix of the URL, followed by
+             the rest of the URL, or the path and query string of the URL if it is under none of
+             them.
+    """
+    replay_path, base_url = None, None
+    for path, server in servers.items():
+        server = server.rstrip('/')
+        if (url == server or url.startswith(server + '/') or url.startswith(server + '?')) \
+                and (base_url is None or len(server) > len(base_url)):
+            replay_path, base_url = path, server
+    if base_url is None:
+        return get_request_target(url)
+    target = replay_path + url[len(base_url):]
+    return target if target.startswith('/') else '/' + target
+
+
+class RecordedResponse:
+
+    def __init__(self, status: int, content_type: str, content: str):
+        self.status = status
+        self.content_type = content_type
+        self.content = content
+
+
+class FixtureStore:
+
+    """Recorded responses, keyed by the method, path and query string, and body of the request"""
+
+    def __init__(self):
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.responses)
+
+    def add(self, method: str, target: str, body: str, response: RecordedResponse):
+        with self.lock:
+            self.responses[(method, target, body or '')] = response
+
+    def get(self, method: str, target: str, body: str) -> RecordedResponse:
+        """Return the response recorded for a request, or None if it was not recorded"""
+        return self.responses.get((method, target, body or ''))
+
+    @classmethod
+    def load(cls, path: str):
+        store = cls()
+        with _open(path, 'rt') as fixtures_file:
+            for line in fixtures_file:
+                fixture = json.loads(line)
+                store.add(fixture['method'], fixture['target'], fixture['body'],
+                          RecordedResponse(fixture['status'], fixture['content_type'],
+                                           fixture['content']))
+        logger.info('Loaded {} recorded responses from {}'.format(len(store), path))
+        return store
+
+    def write(self, path: str):
+        with self.lock:
+            responses = sorted(self.responses.items(), key=lambda item: item[0])
+        with _open(path, 'wt') as fixtures_file:
+            for (method, target, body), response in responses:
+                fixtures_file.write(json.dumps({
+                    'method': method, 'target': target, 'body': body, 'status': response.status,
+                    'content_type': response.content_type, 'content': response.content,
+                }, sort_keys=True) + '\n')
+
+
+class Recorder:
+
+    """
+    Response hook of the http_client module, adding every final response which is not a server
+    error to a FixtureStore.
+
+    Only the responses of the requests actually sent are seen, so the responses must not be served
+    from the response_cache instead, and the in-memory caches of the queries are emptied when the
+    recording starts.
+    """
+
+    def __init__(self, store: FixtureStore, servers: dict = None):
+        """
+        :param store: FixtureStore to which to add the responses.
+        :param servers: Base URL of each service, as taken by get_replay_target. By default Zooma at
+                        DEFAULT_ZOOMA_HOST, and OLS and OxO at the servers set in the ols and oxo
+                        modules.
+        """
+        self.store = store
+        if servers is None:
+            servers = {'': DEFAULT_ZOOMA_HOST, OLS_PATH: ols.OLS_EFO_SERVER,
+                       OXO_PATH: oxo.OXO_SERVER}
+        self.servers = servers
+
+    def __call__(self, response: requests.Response):
+        if response.status_code >= 500:
+            return
+        body = response.request.body
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        self.store.add(response.request.method,
+                       get_replay_target(response.request.url, self.servers), body,
+                       RecordedResponse(response.status_code, response.headers.get('Content-Type'),
+                                        response.content.decode('utf-8')))
+
+    def start(self):
+        """
+        Record the responses from now on.
+
+        :raises ValueError: If the response_cache is configured.
+        """
+        if response_cache.get_cache() is not None:
+            raise ValueError('Responses served from the response cache cannot be recorded')
+        metrics.clear_lru_caches()
+        http_client.add_response_hook(self)
+        return self
+
+    def stop(self):
+        http_client.remove_response_hook(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ReplayRequestHandler(BaseHTTPRequestHandler):
+
+    # Keep connections open, so that the pooled connections of http_client are reused, and do not
+    # delay sending the content after the headers
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.replay()
+
+    def do_POST(self):
+        self.replay()
+
+    def replay(self):
+        content_length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(content_length).decode('utf-8') if content_length else None
+        status, content_type, content = self.server.replay_server.get_response(
+            self.command, self.path, body)
+        content = content.encode('utf-8')
+        self.send_response(status)
+        if content_type is not None:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        logger.debug('Replay server: ' + format % args)
+
+
+class ReplayServer:
+
+    """
+    Local HTTP server replaying the responses of a FixtureStore, after a random latency, and
+    answering a given proportion of the requests with an error status instead.
+    """
+
+    def __init__(self, store: FixtureStore, host: str = '127.0.0.1', port: int = 0,
+                 latency: float = 0.0, latency_jitter: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = ERROR_STATUS, seed: int = None):
+        """
+        :param store: Responses to replay.
+        :param host: Address to listen on.
+        :param port: Port to listen on, or 0 for any free port.
+        :param latency: Minimum number of seconds before responding.
+        :param latency_jitter: Maximum number of seconds added at random to the latency.
+        :param error_rate: Proportion of the requests answered with error_status.
+        :param error_status: Status of the error responses.
+        :param seed: Seed of the random latencies and errors.
+        """
+        self.store = store
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.n_requests = 0
+        self.n_errors = 0
+        self.n_missing = 0
+        self.http_server = ThreadingHTTPServer((host, port), ReplayRequestHandler)
+        self.http_server.replay_server = self
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.http_server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def get_response(self, method: str, target: str, body: str) -> tuple:
+        """Return the status, content type and content of the response to a request"""
+        with self.random_lock:
+            self.n_requests += 1
+            delay = self.latency + self.random.uniform(0, self.latency_jitter)
+            is_error = self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if is_error:
+            with self.random_lock:
+                self.n_errors += 1
+            return self.error_status, 'text/plain', 'Injected error'
+        response = self.store.get(method, target, body)
+        if response is None:
+            with self.random_lock:
+                self.n_missing += 1
+            logger.warning('No recorded response for {} {}'.format(method, target))
+            return MISSING_STATUS, 'text/plain', 'Not recorded'
+        return response.status, response.content_type, response.content
+
+    def start(self):
+        """Serve requests in a background thread"""
+        self.thread = threading.Thread(target=self.http_server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info('Replaying {} responses at {}'.format(len(self.store), self.url))
+        return self
+
+    def serve_forever(self):
+        logger.info('Replaying {} responses at {}'.format(len(self.store), self.url))
+        self.http_server.serve_forever()
+
+    def stop(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,178 @@
+"""
+Persistent cache of the responses from Zooma, OLS and OxO, kept between runs in an SQLite database.
+
+Responses are stored as JSON in a separate namespace for each type of query, keyed by the URL (and
+the payload, for POST requests). Entries older than the time to live are ignored and then deleted,
+and once the cache holds more than its maximum number of entries, the oldest ones are deleted.
+Failed queries, for which the cached functions return None, are never stored.
+
+The cache is disabled until configure() is called, and the functions decorated with cached() then
+query the services directly, as if they were not decorated.
+"""
+
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from eva_cttv_pipeline.trait_mapping import metrics
+
+logger = logging.getLogger(__package__)
+
+DEFAULT_TTL_DAYS = 45
+DEFAULT_MAX_ENTRIES = 1000000
+# Number of new entries after which the size of the cache is checked
+EVICTION_INTERVAL = 1000
+
+_cache = None
+
+
+class ResponseCache:
+
+    """SQLite database of responses, which can be shared by several threads"""
+
+    def __init__(self, path: str, ttl_days: float = DEFAULT_TTL_DAYS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        :param path: Path to the database file, created if needed.
+        :param ttl_days: Number of days after which an entry expires, or None to never expire.
+        :param max_entries: Maximum number of entries kept in the cache.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl = ttl_days * 24 * 3600 if ttl_days else None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._n_new_entries = 0
+        self._lock = threading.Lock()
+        # Statements run in autocommit mode, and the lock serialises the access of the threads
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None,
+                                           check_same_thread=False)
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS responses (namespace TEXT NOT NULL, key TEXT NOT NULL, '
+                'value TEXT NOT NULL, created REAL NOT NULL, PRIMARY KEY (namespace, key))')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS responses_created ON responses (created)')
+        self.evict()
+
+    def _expiry_time(self):
+        return time.time() - self.ttl if self.ttl else None
+
+    def get(self, namespace: str, key: str):
+        """Return the cached value for key in namespace, or None if it is missing or expired"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT value, created FROM responses WHERE namespace = ? AND key = ?',
+                (namespace, key)).fetchone()
+            expiry_time = self._expiry_time()
+            if row is None or (expiry_time is not None and row[1] < expiry_time):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value):
+        """Store value, which must be serialisable to JSON, for key in namespace"""
+        encoded_value = json.dumps(value)
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses (namespace, key, value, created) '
+                'VALUES (?, ?, ?, ?)', (namespace, key, encoded_value, time.time()))
+            self._n_new_entries += 1
+            check_size = self._n_new_entries % EVICTION_INTERVAL == 0
+        if check_size:
+            self.evict()
+
+    def evict(self):
+        """Delete the expired entries, then the oldest entries above the maximum size"""
+        with self._lock:
+            expiry_time = self._expiry_time()
+            n_expired = 0
+            if expiry_time is not None:
+                n_expired = self._connection.execute(
+                    'DELETE FROM responses WHERE created < ?', (expiry_time,)).rowcount
+            n_entries = self._connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            n_evicted = 0
+            if n_entries > self.max_entries:
+                n_evicted = self._connection.execute(
+                    'DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses '
+                    'ORDER BY created LIMIT ?)', (n_entries - self.max_entries,)).rowcount
+        if n_expired or n_evicted:
+            logger.info('Deleted {} expired and {} evicted entries from the response cache {}'.format(
+                n_expired, n_evicted, self.path))
+
+    def clear(self, namespace: str = None):
+        with self._lock:
+            if namespace is None:
+                self._connection.execute('DELETE FROM responses')
+            else:
+                self._connection.execute('DELETE FROM responses WHERE namespace = ?', (namespace,))
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def configure(path: str, ttl_days: float = DEFAULT_TTL_DAYS,
+              max_entries: int = DEFAULT_MAX_ENTRIES) -> ResponseCache:
+    """Enable the cache of the functions decorated with cached(), stored in the file at path"""
+    global _cache
+    close()
+    _cache = ResponseCache(path, ttl_days, max_entries)
+    logger.info('Using response cache {} with {} entries'.format(path, len(_cache)))
+    return _cache
+
+
+def get_cache() -> ResponseCache:
+    """Return the cache set up by configure(), or None if the cache is disabled"""
+    return _cache
+
+
+def close():
+    """Disable the cache, logging how many queries it answered"""
+    global _cache
+    if _cache is None:
+        return
+    logger.info('Response cache {}: {} hits, {} misses'.format(_cache.path, _cache.hits,
+                                                              _cache.misses))
+    _cache.close()
+    _cache = None
+
+
+def cached(namespace: str, key_function=None):
+    """
+    Decorator storing the non-None values returned by a function in the response cache, when it is
+    enabled.
+
+    :param namespace: Namespace of the values returned by the function in the cache.
+    :param key_function: Function taking the same arguments as the decorated function and returning
+                         the key of the value in the cache. By default the single argument of the
+                         decorated function.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _cache is None:
+                return function(*args, **kwargs)
+            key = key_function(*args, **kwargs) if key_function is not None else args[0]
+            value = _cache.get(namespace, key)
+            metrics.record_cache_lookup(namespace, value is not None)
+            if value is None:
+                value = function(*args, **kwargs)
+                if value is not None:
+                    _cache.set(namespace, key, value)
+            return value
+        return wrapper
+    return decorator
@@ -29,12 +29,14 @@ class Trait:
     Object to hold data for one trait name. Including the number of ClinVar record's traits it
     appears in, any Zooma and OxO mappings, and any mappings which are ready to be output.
     """
-    def __init__(self, name, frequency):
+    def __init__(self, name, frequency, finished_mapping_set=None):
         self.name = name
         self.frequency = frequency
         self.zooma_result_list = []
         self.oxo_result_list = []
-        self.finished_mapping_set = set()
+        # Candidate terms found by fuzzy_matcher, for traits without any Zooma results
+        self.fuzzy_match_list = []
+        self.finished_mapping_set = set(finished_mapping_set or ())
 
     @property
     def is_finished(self):
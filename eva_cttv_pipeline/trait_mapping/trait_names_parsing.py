@@ -1,19 +1,30 @@
-import gzip
-import json
+from collections import Counter, deque
+import itertools
+import multiprocessing
 
+from eva_cttv_pipeline import clinvar_json_index
+from eva_cttv_pipeline import json_backend
 
-def clinvar_jsons(filepath: str) -> dict:
+# Number of consecutive records decoded together by a worker process in count_trait_names
+RECORDS_PER_SHARD = 1000
+
+
+def clinvar_jsons(filepath: str, start: int = 0, stop: int = None) -> dict:
     """
     Yields a dict object, parsed from a file with one json per line of ClinVar records
 
     :param filepath: String giving the path to a gzipped file containing jsons of ClinVar records,
                      one per line.
+    :param start: Number of the first record to yield, starting from 0. If the file has an index
+                  written by clinvar_json_index, reading starts directly at this record.
+    :param stop: Number of the record after the last one to yield, or None for all the records
+                 until the end of the file.
     :return: Yields a dictionary for each json.
     """
-    with gzip.open(filepath, "rt") as f:
-        for line in f:
-            line = line.rstrip()
-            yield json.loads(line)
+    index = clinvar_json_index.RecordIndex.for_file(filepath) if start > 0 else None
+    for line in clinvar_json_index.iter_lines(filepath, start, stop, index):
+        line = line.rstrip()
+        yield json_backend.loads(line)
 
 
 def get_trait_names(clinvar_json: dict) -> list:
@@ -66,3 +77,68 @@ def parse_trait_names(filepath: str) -> list:
         new_trait_names = get_trait_names(clinvar_json)
         trait_name_list.extend(new_trait_names)
     return trait_name_list
+
+
+def count_trait_names_in_lines(json_lines) -> Counter:
+    """Count the trait names of the records in an iterable of ClinVar jsons, one per string"""
+    trait_names_counter = Counter()
+    for json_line in json_lines:
+        trait_names_counter.update(get_trait_names(json_backend.loads(json_line)))
+    return trait_names_counter
+
+
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _count_trait_names_in_range(filepath: str, start: int, stop: int) -> Counter:
+    """Count the trait names of the records from start to stop, read using the index of the file"""
+    return count_trait_names_in_lines(
+        clinvar_json_index.iter_lines(filepath, start, stop, _worker_index))
+
+
+def count_trait_names(filepath: str, workers: int = 1) -> Counter:
+    """
+    For a file containing ClinVar records in the format of one json per line, count the number of
+    occurrences of each trait name, without holding all the records or trait names in memory. The
+    trait names are in the order of their first occurrence in the file, as in the Counter of the
+    list returned by parse_trait_names.
+
+    With several workers, shards of consecutive records are decoded in a pool of worker processes.
+    If the file has an index written by clinvar_json_index, each worker reads its shards from the
+    file itself; otherwise the records are read by the main process and sent to the workers.
+
+    :param filepath: String giving the path to a gzipped file containing jsons of ClinVar records,
+                     one per line.
+    :param workers: Number of worker processes decoding the records.
+    :return: Counter of the trait names of the records in the file.
+    """
+    if workers <= 1:
+        return count_trait_names_in_lines(clinvar_json_index.iter_lines(filepath))
+
+    index = clinvar_json_index.RecordIndex.for_file(filepath)
+    if index is not None:
+        shard_tasks = ((_count_trait_names_in_range, (filepath, start, start + RECORDS_PER_SHARD))
+                       for start in range(0, len(index), RECORDS_PER_SHARD))
+    else:
+        lines = clinvar_json_index.iter_lines(filepath)
+        shards = iter(lambda: list(itertools.islice(lines, RECORDS_PER_SHARD)), [])
+        shard_tasks = ((count_trait_names_in_lines, (json_lines,)) for json_lines in shards)
+
+    trait_names_counter = Counter()
+    # Shards are merged in order, so that the trait names are in the order of the file
+    max_pending_shards = 2 * workers
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(index,)) as pool:
+        pending_shards = deque()
+        for shard_function, shard_args in shard_tasks:
+            pending_shards.append(pool.apply_async(shard_function, shard_args))
+            # Don't read further ahead in the input file than the workers can keep up with
+            if len(pending_shards) >= max_pending_shards:
+                trait_names_counter.update(pending_shards.popleft().get())
+        while pending_shards:
+            trait_names_counter.update(pending_shards.popleft().get())
+    return trait_names_counter
@@ -1,23 +1,24 @@
 import logging
+import requests
+
 logger = logging.getLogger(__package__)
 
 
-def request_retry_helper(function, retry_count: int, url: str):
+def query_or_none(function, *args):
     """
-    Given a function make a number of attempts to call function for it to successfully return a
-    non-None value, subsequently returning this value. Makes the number of tries specified in
-    retry_count parameter.
+    Call a function which queries a service, returning None if the query fails. The requests are
+    already retried by http_client, so the query is only made once here. The function raises the
+    errors rather than returning None, and they are caught here, above any cache of the function,
+    so that a failed query is not cached and is made again the next time.
 
-    :param function: Function that could need multiple attempts to return a non-None value
-    :param retry_count: Number of attempts to make
-    :param url: String specifying the url to make a request.
-    :return: Returned value of the function.
+    :param function: Function making the query, raising requests.RequestException if a request
+                     fails or ValueError if a response can't be decoded
+    :param args: Arguments of the function
+    :return: Returned value of the function, or None if the query failed.
     """
-    for retry_num in range(retry_count):
-        return_value = function(url)
-        if return_value is not None:
-            return return_value
-        logger.warning("attempt {}: failed running function {} with url {}".format(
-            retry_num, function, url))
-    logger.warning("error on last attempt, skipping")
-    return None
+    try:
+        return function(*args)
+    except (requests.RequestException, ValueError) as e:
+        logger.warning("Query with {} for {} failed: {}".format(
+            function.__name__, ', '.join(str(arg) for arg in args), e))
+        return None
@@ -1,12 +1,10 @@
 from enum import Enum
 from functools import total_ordering, lru_cache
-import json
 import logging
-import requests
 
-from eva_cttv_pipeline.trait_mapping.ols import get_ontology_label_from_ols, \
-    is_current_and_in_efo, is_in_efo
-from eva_cttv_pipeline.trait_mapping.utils import request_retry_helper
+from eva_cttv_pipeline.trait_mapping import http_client, metrics, response_cache
+from eva_cttv_pipeline.trait_mapping.ols import get_term_info
+from eva_cttv_pipeline.trait_mapping.utils import query_or_none
 
 
 logger = logging.getLogger(__package__)
@@ -84,20 +82,23 @@ class ZoomaResult:
                 self.mapping_list == other.mapping_list)
 
 
+@metrics.register_lru_cache('zooma')
 @lru_cache(maxsize=16384)
+@response_cache.cached('zooma')
 def zooma_query_helper(url: str) -> dict:
     """
     Make a get request to provided url and return the response, assumed to be a json response, in
-    a dict.
+    a dict. Failed requests raise an exception rather than returning None, so that they are not
+    cached and are made again the next time.
 
     :param url: String of Zooma url used to make a request
     :return: Zooma response in a dict
+    :raises requests.RequestException: If the request failed or Zooma answered with an error.
+    :raises ValueError: If the response is not valid json.
     """
-    try:
-        json_response_1 = requests.get(url).json()
-        return json_response_1
-    except json.decoder.JSONDecodeError as e:
-        return None
+    response = http_client.get(url, service='zooma')
+    response.raise_for_status()
+    return response.json()
 
 
 def get_zooma_results(trait_name: str, filters: dict, zooma_host: str) -> list:
@@ -116,7 +117,7 @@ def get_zooma_results(trait_name: str, filters: dict, zooma_host: str) -> list:
     :return: List of ZoomaResults
     """
     url = build_zooma_query(trait_name, filters, zooma_host)
-    zooma_response_list = request_retry_helper(zooma_query_helper, 4, url)
+    zooma_response_list = query_or_none(zooma_query_helper, url)
 
     if zooma_response_list is None:
         return []
@@ -125,20 +126,16 @@ def get_zooma_results(trait_name: str, filters: dict, zooma_host: str) -> list:
 
     for zooma_result in zooma_result_list:
         for zooma_mapping in zooma_result.mapping_list:
-            label = get_ontology_label_from_ols(zooma_mapping.uri)
+            term_info = get_term_info(zooma_mapping.uri)
             # If no label is returned (shouldn't really happen) keep the existing one
-            if label is not None:
-                zooma_mapping.ontology_label = label
+            if term_info.label is not None:
+                zooma_mapping.ontology_label = term_info.label
             else:
                 logger.warning("Couldn't retrieve ontology label from OLS for trait '{}'".format(trait_name))
 
-            uri_is_current_and_in_efo = is_current_and_in_efo(zooma_mapping.uri)
-            if not uri_is_current_and_in_efo:
-                uri_is_in_efo = is_in_efo(zooma_mapping.uri)
-                zooma_mapping.in_efo = uri_is_in_efo
-            else:
-                zooma_mapping.in_efo = uri_is_current_and_in_efo
-                zooma_mapping.is_current = uri_is_current_and_in_efo
+            zooma_mapping.in_efo = term_info.in_efo
+            if term_info.is_current_and_in_efo:
+                zooma_mapping.is_current = True
 
     return zooma_result_list
 
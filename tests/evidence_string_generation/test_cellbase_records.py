@@ -0,0 +1,93 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from eva_cttv_pipeline.evidence_string_generation import cellbase_records
+
+
+TRAIT_2_EFO = {'leigh syndrome': [('http://www.orpha.net/ORDO/Orphanet_506', 'Leigh syndrome')]}
+
+
+def get_line(reference_description, submitted_description, trait_names=('Leigh syndrome',),
+             origins=('germline',), xref_id='rs121918384'):
+    reference_assertion = {
+        'clinicalSignificance': {'reviewStatus': 'CLASSIFIED_BY_SINGLE_SUBMITTER',
+                                 'description': reference_description},
+        'measureSet': {'measure': [{'xref': [{'db': 'dbVar', 'id': xref_id}]}]},
+        'traitSet': {'trait': [{'name': [{'elementValue': {'type': 'Preferred', 'value': name}}]}
+                               for name in trait_names]}}
+    return json.dumps({'clinvarSet': {
+        'referenceClinVarAssertion': reference_assertion,
+        'clinVarAssertion': [{'clinicalSignificance': {
+            'reviewStatus': 'NO_ASSERTION_CRITERIA_PROVIDED',
+            'description': submitted_description},
+            'observedIn': [{'sample': {'origin': origin}} for origin in origins]}]}})
+
+
+class ClinicalSignificancePrefilterTest(unittest.TestCase):
+    def setUp(self):
+        self.prefilter = cellbase_records.ClinicalSignificancePrefilter(
+            ['pathogenic', 'likely pathogenic'], TRAIT_2_EFO)
+
+    def test_allowed(self):
+        self.assertTrue(self.prefilter(get_line('Pathogenic', ['Pathogenic'])))
+        self.assertTrue(self.prefilter(get_line('Likely pathogenic', 'Likely pathogenic')))
+
+    def test_not_allowed(self):
+        self.assertFalse(self.prefilter(get_line('Benign', ['Benign', 'Likely benign'])))
+
+    def test_allowed_by_submitter(self):
+        # Records are only dropped when none of the clinical significances could be allowed
+        self.assertTrue(self.prefilter(get_line('Benign', ['Pathogenic'])))
+
+    def test_unreadable_description_kept(self):
+        self.assertTrue(self.prefilter(get_line({'value': 'Benign'}, ['Benign'])))
+        self.assertTrue(self.prefilter(get_line('Benign', None)))
+
+    def test_reported_records_kept(self):
+        # Records whose nsvs, allele origins or unmapped traits are reported even when they are
+        # skipped are not dropped
+        self.assertTrue(self.prefilter(get_line('Benign', 'Benign', xref_id='nsv1067916')))
+        self.assertTrue(self.prefilter(get_line('Benign', 'Benign', origins=('germline',
+                                                                             'somatic'))))
+        self.assertTrue(self.prefilter(get_line('Benign', 'Benign',
+                                                trait_names=('Leigh syndrome', 'Unmapped'))))
+        self.assertFalse(self.prefilter(get_line('Benign', 'Benign', origins=('germline',
+                                                                              'Germline'))))
+
+    def test_ambiguous_trait_set_kept(self):
+        line = json.loads(get_line('Benign', 'Benign'))
+        line['clinvarSet']['referenceClinVarAssertion']['traitSet'] = {'trait': 'Leigh syndrome'}
+        self.assertTrue(self.prefilter(json.dumps(line)))
+        del line['clinvarSet']['referenceClinVarAssertion']['traitSet']
+        self.assertTrue(self.prefilter(json.dumps(line)))
+
+
+class CellbaseRecordsPrefilterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.json_file = os.path.join(self.tmp_dir, 'records.json.gz')
+        with gzip.open(self.json_file, 'wt') as f:
+            for description in ('Pathogenic', 'Benign', 'Likely pathogenic', 'Benign'):
+                f.write(get_line(description, [description]) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_iter(self):
+        cell_recs = cellbase_records.CellbaseRecords(
+            self.json_file, prefilter=cellbase_records.ClinicalSignificancePrefilter(['pathogenic'],
+                                                                     TRAIT_2_EFO))
+        self.assertEqual(len(list(cell_recs)), 1)
+        self.assertEqual(cell_recs.n_prefiltered, 3)
+
+    def test_iter_shards(self):
+        cell_recs = cellbase_records.CellbaseRecords(
+            self.json_file,
+            prefilter=cellbase_records.ClinicalSignificancePrefilter(['likely pathogenic'],
+                                                                     TRAIT_2_EFO))
+        self.assertEqual([len(shard) for shard in cell_recs.iter_shards(1)], [1])
+        self.assertEqual(cell_recs.n_prefiltered, 3)
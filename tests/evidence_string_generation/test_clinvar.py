@@ -43,6 +43,13 @@ class TestClinvarRecord(unittest.TestCase):
     def test_allele_origins(self):
         self.assertEqual(self.test_clinvar_record.allele_origins, ['germline'])
 
+    def test_fields_parsed_once(self):
+        self.assertIs(self.test_clinvar_record.traits, self.test_clinvar_record.traits)
+        self.assertIs(self.test_clinvar_record.trait_refs_list,
+                      self.test_clinvar_record.trait_refs_list)
+        self.assertIs(self.test_clinvar_record.observed_refs_list,
+                      self.test_clinvar_record.observed_refs_list)
+
 
 class TestClinvarRecordMeasure(unittest.TestCase):
     @classmethod
@@ -78,6 +85,14 @@ class TestClinvarRecordMeasure(unittest.TestCase):
     def test_measure_set_pubmed_refs(self):
         self.assertEqual(self.test_crm.pubmed_refs, [])
 
+    def test_sequence_location(self):
+        # Taken from the GRCh38 sequence location, not the GRCh37 one
+        self.assertEqual(self.test_crm.chr, '3')
+        self.assertEqual(self.test_crm.start, 150928107)
+        self.assertEqual(self.test_crm.stop, 150928107)
+        self.assertEqual(self.test_crm.ref, 'A')
+        self.assertEqual(self.test_crm.alt, 'C')
+
 
 def get_test_record():
     test_clinvar_record_filepath = os.path.join(os.path.dirname(__file__), 'resources',
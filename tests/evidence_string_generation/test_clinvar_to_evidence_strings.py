@@ -1,8 +1,16 @@
+import copy
+import gzip
+import json
+import shutil
 import unittest
+from unittest import mock
 
 import os
+import tempfile
 
+from eva_cttv_pipeline import clinvar_json_index
 from eva_cttv_pipeline.evidence_string_generation import clinvar_to_evidence_strings
+from eva_cttv_pipeline.evidence_string_generation import config as pipeline_config
 from eva_cttv_pipeline.evidence_string_generation import consequence_type as CT
 from eva_cttv_pipeline.evidence_string_generation import trait
 from tests.evidence_string_generation import test_clinvar
@@ -24,6 +32,49 @@ def _get_mappings():
 MAPPINGS = _get_mappings()
 
 
+def write_test_records(json_file, n_records):
+    """
+    Write variations of the test ClinVar record to json_file, with various clinical significances,
+    variant ids, traits and allele origins, so that the records go through all the branches of the
+    pipeline.
+    """
+    clinical_significances = ['Pathogenic', 'Benign', 'Likely pathogenic', 'risk factor',
+                              'Uncertain significance']
+    rs_ids = sorted(MAPPINGS.consequence_type_dict)[:5] + ['rs1']
+    trait_names = ['coronary artery disease/myocardial infarction', 'frontotemporal dementia',
+                   'Unmapped trait', '3 beta-hydroxysteroid dehydrogenase deficiency']
+    allele_origins = [['germline'], ['somatic'], ['germline', 'somatic'], ['unknown'],
+                      ['germline', 'germline']]
+    test_record = test_clinvar.get_test_record().data
+    with gzip.open(json_file, 'wt') as f:
+        for i in range(n_records):
+            record = copy.deepcopy(test_record)
+            reference_assertion = record['referenceClinVarAssertion']
+            reference_assertion['clinVarAccession']['acc'] = 'RCV{:09d}'.format(i)
+            clinical_significance = clinical_significances[i % len(clinical_significances)]
+            reference_assertion['clinicalSignificance']['description'] = clinical_significance
+            measure = reference_assertion['measureSet']['measure'][0]
+            measure['xref'] = [{'db': 'dbSNP', 'id': rs_ids[i % len(rs_ids)][2:], 'type': 'rs',
+                                'status': 'CURRENT'}]
+            if i % 7 == 0:
+                measure['xref'].append({'db': 'dbVar', 'id': 'nsv{}'.format(i),
+                                        'status': 'CURRENT'})
+            trait = reference_assertion['traitSet']['trait'][0]
+            trait['name'][0]['elementValue']['value'] = trait_names[i % len(trait_names)]
+            if i % 3 == 0:
+                other_trait = copy.deepcopy(trait)
+                other_trait['name'] = other_trait['name'][:1]
+                other_trait['name'][0]['elementValue']['value'] = \
+                    trait_names[(i // 3) % len(trait_names)]
+                reference_assertion['traitSet']['trait'].append(other_trait)
+            record_allele_origins = allele_origins[i % len(allele_origins)]
+            for j, clinvar_assertion in enumerate(record['clinVarAssertion']):
+                clinvar_assertion['clinicalSignificance']['description'] = [clinical_significance]
+                clinvar_assertion['observedIn'][0]['sample']['origin'] = \
+                    record_allele_origins[j % len(record_allele_origins)]
+            f.write(json.dumps({'clinvarSet': record}) + '\n')
+
+
 class GetMappingsTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -116,6 +167,174 @@ class SkipRecordTest(unittest.TestCase):
         self.assertTrue(clinvar_to_evidence_strings.skip_record(*self.args))
 
 
+class StreamingOutputTest(unittest.TestCase):
+    def setUp(self):
+        self.dir_out = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir_out.cleanup()
+
+    def read_output_file(self, file_name):
+        with open(os.path.join(self.dir_out.name, file_name)) as f:
+            return f.read()
+
+    def test_nsvs_written_as_generated(self):
+        report = clinvar_to_evidence_strings.Report(
+            output_writer=clinvar_to_evidence_strings.OutputWriter(self.dir_out.name))
+        report.add_nsv('nsv1')
+        report.add_nsv('nsv2')
+        report.write_output(self.dir_out.name)
+
+        self.assertEqual(report.nsv_list, [])
+        self.assertEqual(self.read_output_file(pipeline_config.NSV_LIST_FILE), 'nsv1\nnsv2')
+
+    def test_same_zooma_records_as_buffered(self):
+        evidence_record = ['RCV000002127', 'rs121908140', 'usher syndrome, type 3',
+                           'http://www.ebi.ac.uk/efo/EFO_0009553']
+        buffered_report = clinvar_to_evidence_strings.Report()
+        buffered_report.add_evidence_record(evidence_record)
+        buffered_report.write_output(self.dir_out.name)
+        buffered_zooma = self.read_output_file(pipeline_config.ZOOMA_FILE_NAME)
+
+        streaming_report = clinvar_to_evidence_strings.Report(
+            output_writer=clinvar_to_evidence_strings.OutputWriter(self.dir_out.name))
+        streaming_report.add_evidence_record(evidence_record)
+        streaming_report.write_output(self.dir_out.name)
+
+        self.assertEqual(streaming_report.evidence_list, [])
+        self.assertEqual(self.read_output_file(pipeline_config.ZOOMA_FILE_NAME), buffered_zooma)
+
+
+class ReportMergeTest(unittest.TestCase):
+    def test_merge(self):
+        report = clinvar_to_evidence_strings.Report(
+            trait_mappings={'trait a': [('http://www.ebi.ac.uk/efo/EFO_0000001', None)],
+                            'trait b': [('http://www.ebi.ac.uk/efo/EFO_0000002', None)]})
+        report.counters["record_counter"] = 3
+        report.unmapped_traits['unmapped trait'] = 1
+
+        shard_report = clinvar_to_evidence_strings.Report()
+        shard_report.counters["record_counter"] = 2
+        shard_report.unmapped_traits['unmapped trait'] = 2
+        shard_report.traits.add('http://www.ebi.ac.uk/efo/EFO_0000001')
+        shard_report.remove_trait_mapping('trait a')
+        shard_report.add_nsv('nsv1')
+
+        report.merge(shard_report)
+
+        self.assertEqual(report.counters["record_counter"], 5)
+        self.assertEqual(report.unmapped_traits['unmapped trait'], 3)
+        self.assertEqual(report.traits, {'http://www.ebi.ac.uk/efo/EFO_0000001'})
+        self.assertEqual(list(report.trait_mappings), ['trait b'])
+        self.assertEqual(report.nsv_list, ['nsv1'])
+
+
+class ClinvarToEvidenceStringsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.json_file = os.path.join(cls.tmp_dir, 'clinvar.json.gz')
+        write_test_records(cls.json_file, 70)
+        cls.indexed_json_file = os.path.join(cls.tmp_dir, 'clinvar.indexed.json.gz')
+        clinvar_json_index.write_block_gzip(cls.json_file, cls.indexed_json_file,
+                                            records_per_block=8)
+        cls.ot_schema = os.path.join(cls.tmp_dir, 'opentargets.json')
+        with gzip.open(os.path.join(os.path.dirname(__file__), 'resources',
+                                    'opentargets.1.6.0.json.gz'), 'rb') as input_file, \
+                open(cls.ot_schema, 'wb') as output_file:
+            shutil.copyfileobj(input_file, output_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def run_pipeline(self, json_file=None, **kwargs):
+        return clinvar_to_evidence_strings.clinvar_to_evidence_strings(
+            ['pathogenic', 'likely pathogenic'], MAPPINGS, json_file or self.json_file,
+            self.ot_schema, **kwargs)
+
+    def write_pipeline_output(self, dir_name, json_file, workers):
+        """Run the pipeline as launch_pipeline does, returning the report and the output files"""
+        dir_out = os.path.join(self.tmp_dir, dir_name)
+        os.mkdir(dir_out)
+        output_writer = (clinvar_to_evidence_strings.OutputWriter(dir_out) if workers > 1
+                         else None)
+        report = self.run_pipeline(json_file, output_writer=output_writer, workers=workers)
+        report.write_output(dir_out)
+        output_files = {}
+        for file_name in os.listdir(dir_out):
+            with open(os.path.join(dir_out, file_name)) as f:
+                output_files[file_name] = f.read()
+        return report, output_files
+
+    @staticmethod
+    def get_counters(report):
+        return {counter_name: value for counter_name, value in report.counters.items()
+                if counter_name not in ('n_prefiltered', 'validation_seconds')}
+
+    def test_same_report_with_prefilter(self):
+        report = self.run_pipeline()
+        prefiltered_report = self.run_pipeline(prefilter=True)
+
+        self.assertGreater(prefiltered_report.counters['n_prefiltered'], 0)
+        self.assertGreater(report.counters['n_nsv_skipped_clin_sig'], 0)
+        self.assertEqual(self.get_counters(prefiltered_report), self.get_counters(report))
+        self.assertEqual(prefiltered_report.nsv_list, report.nsv_list)
+        self.assertEqual(prefiltered_report.unmapped_traits, report.unmapped_traits)
+        self.assertEqual(prefiltered_report.n_unrecognised_allele_origin,
+                         report.n_unrecognised_allele_origin)
+        self.assertEqual(prefiltered_report.evidence_string_list, report.evidence_string_list)
+        self.assertEqual(prefiltered_report.evidence_list, report.evidence_list)
+
+    @mock.patch.object(clinvar_to_evidence_strings, 'strftime', return_value='01/01/20 00:00')
+    @mock.patch.object(pipeline_config, 'RECORDS_PER_SHARD', 9)
+    def test_same_output_with_workers(self, strftime):
+        report, output_files = self.write_pipeline_output('serial', self.json_file, 1)
+        self.assertGreater(len(output_files[pipeline_config.EVIDENCE_STRINGS_FILE_NAME]), 0)
+        self.assertGreater(len(output_files[pipeline_config.NSV_LIST_FILE]), 0)
+        # Shards are sent to the workers by the main process, or read by the workers themselves
+        # from an indexed file
+        for json_file in (self.json_file, self.indexed_json_file):
+            with self.subTest(json_file=json_file):
+                parallel_report, parallel_output_files = self.write_pipeline_output(
+                    'parallel_' + os.path.basename(json_file), json_file, 2)
+                self.assertEqual(self.get_counters(parallel_report), self.get_counters(report))
+                self.assertEqual(parallel_report.unmapped_traits, report.unmapped_traits)
+                self.assertEqual(parallel_report.traits, report.traits)
+                self.assertEqual(parallel_output_files, output_files)
+
+
+class ValidationPolicyTest(unittest.TestCase):
+    @staticmethod
+    def get_evidence_string(variant_id):
+        return {'unique_association_fields': {'variant_id': variant_id}}
+
+    def test_all(self):
+        policy = clinvar_to_evidence_strings.ValidationPolicy('all')
+        self.assertTrue(all(policy.should_validate(self.get_evidence_string('rs{}'.format(i)))
+                            for i in range(100)))
+
+    def test_sample(self):
+        policy = clinvar_to_evidence_strings.ValidationPolicy('sample', sample_rate=0.5)
+        evidence_strings = [self.get_evidence_string('rs{}'.format(i)) for i in range(1000)]
+        validated = [policy.should_validate(evidence_string)
+                     for evidence_string in evidence_strings]
+        self.assertTrue(400 < sum(validated) < 600)
+        # The sample only depends on the evidence strings themselves
+        self.assertEqual(validated, [policy.should_validate(evidence_string)
+                                     for evidence_string in evidence_strings])
+
+    def test_first(self):
+        policy = clinvar_to_evidence_strings.ValidationPolicy('first', first_n=2)
+        validated = [policy.should_validate(self.get_evidence_string('rs{}'.format(i)))
+                     for i in range(4)]
+        self.assertEqual(validated, [True, True, False, False])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            clinvar_to_evidence_strings.ValidationPolicy('none')
+
+
 class LoadEfoMappingTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
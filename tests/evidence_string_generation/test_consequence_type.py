@@ -1,8 +1,10 @@
 import unittest
 
 import os
+import sys
 from collections import defaultdict
 
+from bin.benchmarks import consequence_type_index
 from eva_cttv_pipeline.evidence_string_generation import consequence_type as CT
 from tests.evidence_string_generation import config
 
@@ -16,7 +18,8 @@ class ProcessGeneTest(unittest.TestCase):
 
         test_consequence_type = CT.ConsequenceType(test_ensembl_gene_id, CT.SoTerm(test_so_name))
 
-        CT.process_gene(test_consequence_type_dict, test_rs_id, test_ensembl_gene_id, test_so_name)
+        consequence_type_index.process_gene(test_consequence_type_dict, test_rs_id,
+                                            test_ensembl_gene_id, test_so_name)
 
         self.assertEqual(test_consequence_type_dict["rs121912888"][0], test_consequence_type)
 
@@ -31,6 +34,50 @@ class ProcessConsequenceTypeFileTsvTest(unittest.TestCase):
         self.assertEqual(consequence_type_dict["rs121908485"][0], test_consequence_type)
 
 
+class ConsequenceTypeIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = CT.ConsequenceTypeIndex()
+        self.index.add("rs1", "ENSG00000000001", "missense_variant")
+        self.index.add("rs2", "ENSG00000000002", "stop_gained")
+        self.index.add("rs1", "ENSG00000000002", "missense_variant")
+
+    def test_lookup(self):
+        self.assertEqual(len(self.index), 2)
+        self.assertIn("rs1", self.index)
+        self.assertNotIn("rs3", self.index)
+        self.assertEqual(self.index["rs1"],
+                         [CT.ConsequenceType("ENSG00000000001", CT.SoTerm("missense_variant")),
+                          CT.ConsequenceType("ENSG00000000002", CT.SoTerm("missense_variant"))])
+        self.assertIsNone(self.index.get("rs3"))
+        with self.assertRaises(KeyError):
+            self.index["rs3"]
+
+    def test_interned_so_terms(self):
+        self.assertIs(self.index["rs1"][0].so_term, self.index["rs1"][1].so_term)
+
+    def test_add_after_finish_loading(self):
+        self.index.finish_loading()
+        self.index.add("rs2", "ENSG00000000003", "intron_variant")
+        self.assertEqual([ct.ensembl_gene_id for ct in self.index["rs2"]],
+                         ["ENSG00000000002", "ENSG00000000003"])
+        self.assertEqual(self.index.n_rows, 4)
+
+    def test_finish_loading(self):
+        consequence_types = {variant_id: self.index[variant_id] for variant_id in self.index}
+        self.index.finish_loading()
+        self.index.finish_loading()
+        self.assertEqual({variant_id: self.index[variant_id] for variant_id in self.index},
+                         consequence_types)
+
+    def test_approximate_size(self):
+        # The SO terms are counted along with the arrays and dicts
+        size = self.index.approximate_size()
+        self.index.add("rs1", "ENSG00000000001", "intron_variant")
+        so_term = self.index["rs1"][-1].so_term
+        self.assertGreaterEqual(self.index.approximate_size() - size,
+                                sys.getsizeof(so_term) + sys.getsizeof(so_term.__dict__))
+
+
 class SoTermTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -4,6 +4,8 @@ import json
 import unittest
 from datetime import datetime
 
+import jsonschema
+
 from types import SimpleNamespace
 
 from eva_cttv_pipeline.evidence_string_generation import clinvar
@@ -51,6 +53,12 @@ class CTTVGeneticsEvidenceStringInitTest(unittest.TestCase):
         self.test_args = get_args_CTTVGeneticsEvidenceString_init()
         self.evidence_string = evidence_strings.CTTVGeneticsEvidenceString(*self.test_args)
 
+    def test_template_unchanged(self):
+        self.assertEqual(evidence_strings.CTTVGeneticsEvidenceString.new_base_json(),
+                         evidence_strings.CTTVGeneticsEvidenceString.base_json)
+        self.assertNotEqual(self.evidence_string,
+                            evidence_strings.CTTVGeneticsEvidenceString.base_json)
+
     def test_evidence_string(self):
         test_dict = {
     "literature": {
@@ -173,6 +181,12 @@ class CTTVSomaticEvidenceStringInitTest(unittest.TestCase):
         self.test_args = get_args_CTTVSomaticEvidenceString_init()
         self.evidence_string = evidence_strings.CTTVSomaticEvidenceString(*self.test_args)
 
+    def test_template_unchanged(self):
+        self.assertEqual(evidence_strings.CTTVSomaticEvidenceString.new_base_json(),
+                         evidence_strings.CTTVSomaticEvidenceString.base_json)
+        self.assertNotEqual(self.evidence_string,
+                            evidence_strings.CTTVSomaticEvidenceString.base_json)
+
     def test_evidence_string(self):
         test_dict = {
     "literature": {"references": [{"lit_id": "http://europepmc.org/abstract/MED/8281160"}]},
@@ -237,6 +251,16 @@ class CTTVSomaticEvidenceStringInitTest(unittest.TestCase):
         self.assertEqual(self.evidence_string, test_ev_string)
 
 
+class CompileTemplateTest(unittest.TestCase):
+    def test_independent_copies(self):
+        template = {'evidence': {'urls': [{'nice_name': None}], 'is_associated': True}, 'score': 1}
+        new_template = evidence_strings.compile_template(template)
+        copy_1 = new_template()
+        copy_1['evidence']['urls'][0]['nice_name'] = 'Further details in ClinVar database'
+        self.assertEqual(new_template(), template)
+        self.assertIsNot(new_template()['evidence'], template['evidence'])
+
+
 class GetCTTVVariantTypeTest(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -442,6 +466,16 @@ class CTTVGeneticsEvidenceStringTest(unittest.TestCase):
         test_evidence_string = evidence_strings.CTTVGeneticsEvidenceString(*test_args)
         self.assertTrue(test_evidence_string.validate(self.ot_schema_contents))
 
+    def test_validate_with_validator(self):
+        ot_schema_validator = evidence_strings.get_ot_schema_validator(self.ot_schema_contents)
+        self.assertTrue(self.test_ges.validate(ot_schema_validator))
+
+    def test_validate_invalid(self):
+        del self.test_ges['unique_association_fields']
+        ot_schema_validator = evidence_strings.get_ot_schema_validator(self.ot_schema_contents)
+        with self.assertRaises(jsonschema.exceptions.ValidationError):
+            self.test_ges.validate(ot_schema_validator)
+
 
 class CTTVSomaticEvidenceStringTest(unittest.TestCase):
     @classmethod
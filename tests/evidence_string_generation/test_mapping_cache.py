@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from eva_cttv_pipeline.evidence_string_generation import clinvar_to_evidence_strings
+from eva_cttv_pipeline.evidence_string_generation import mapping_cache
+from tests.evidence_string_generation import config
+
+
+class MappingCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        self.source_path = os.path.join(self.tmp_dir, 'mapping.tsv')
+        with open(self.source_path, 'wt') as f:
+            f.write('a\t1\n')
+        self.n_parsed = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def parse(self, path):
+        self.n_parsed += 1
+        with open(path) as f:
+            return dict(line.rstrip().split('\t') for line in f)
+
+    def test_cache_reused(self):
+        first = mapping_cache.load(self.cache_dir, 'test', self.source_path, self.parse)
+        second = mapping_cache.load(self.cache_dir, 'test', self.source_path, self.parse)
+        self.assertEqual(first, {'a': '1'})
+        self.assertEqual(second, first)
+        self.assertEqual(self.n_parsed, 1)
+
+    def test_cache_invalidated_when_file_changes(self):
+        mapping_cache.load(self.cache_dir, 'test', self.source_path, self.parse)
+        with open(self.source_path, 'at') as f:
+            f.write('b\t2\n')
+        structure = mapping_cache.load(self.cache_dir, 'test', self.source_path, self.parse)
+        self.assertEqual(structure, {'a': '1', 'b': '2'})
+        self.assertEqual(self.n_parsed, 2)
+
+    def test_unreadable_cache_file(self):
+        os.makedirs(self.cache_dir)
+        with open(mapping_cache.get_cache_path(self.cache_dir, 'test', self.source_path), 'wb') as f:
+            f.write(b'not a pickle')
+        structure = mapping_cache.load(self.cache_dir, 'test', self.source_path, self.parse)
+        self.assertEqual(structure, {'a': '1'})
+
+    def test_get_mappings(self):
+        efo_mapping_file = os.path.join(config.test_dir, 'resources',
+                                        'feb16_jul16_combined_trait_to_url.tsv')
+        mappings = clinvar_to_evidence_strings.get_mappings(efo_mapping_file,
+                                                            config.snp_2_gene_file)
+        for _ in range(2):
+            cached_mappings = clinvar_to_evidence_strings.get_mappings(
+                efo_mapping_file, config.snp_2_gene_file, self.cache_dir)
+            self.assertEqual(cached_mappings.trait_2_efo, mappings.trait_2_efo)
+            self.assertEqual(list(cached_mappings.consequence_type_dict),
+                             list(mappings.consequence_type_dict))
+            for variant_id in mappings.consequence_type_dict:
+                self.assertEqual(cached_mappings.consequence_type_dict[variant_id],
+                                 mappings.consequence_type_dict[variant_id])
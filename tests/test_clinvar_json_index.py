@@ -0,0 +1,135 @@
+import copy
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from eva_cttv_pipeline import clinvar_json_index
+from eva_cttv_pipeline.evidence_string_generation import cellbase_records
+from eva_cttv_pipeline.trait_mapping import trait_names_parsing
+
+
+def get_test_records(n_records):
+    test_record_path = os.path.join(os.path.dirname(__file__), 'evidence_string_generation',
+                                    'resources', 'test_clinvar_record.json')
+    with open(test_record_path, 'rt') as f:
+        test_record = json.load(f)
+    records = []
+    for i in range(n_records):
+        record = copy.deepcopy(test_record)
+        record['referenceClinVarAssertion']['clinVarAccession']['acc'] = 'RCV{:09d}'.format(i)
+        # Trait names in no particular order, so that the order of the records can be told
+        record['referenceClinVarAssertion']['traitSet']['trait'][0]['name'] = [
+            {'elementValue': {'type': 'Preferred', 'value': 'Trait {}'.format(i * 5 % 11)}}]
+        records.append({'clinvarSet': record})
+    return records
+
+
+class ClinvarJsonIndexTest(unittest.TestCase):
+    n_records = 25
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.records = get_test_records(self.n_records)
+        self.input_path = os.path.join(self.tmp_dir, 'input.json.gz')
+        with gzip.open(self.input_path, 'wt') as f:
+            for record in self.records:
+                f.write(json.dumps(record) + '\n')
+        self.indexed_path = os.path.join(self.tmp_dir, 'indexed.json.gz')
+        clinvar_json_index.write_block_gzip(self.input_path, self.indexed_path, records_per_block=4)
+        self.index = clinvar_json_index.RecordIndex.for_file(self.indexed_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def get_accessions(self, lines):
+        return [clinvar_json_index.get_accession(json.loads(line)) for line in lines]
+
+    def test_block_gzip_content(self):
+        with gzip.open(self.input_path, 'rt') as input_file, \
+                gzip.open(self.indexed_path, 'rt') as indexed_file:
+            self.assertEqual(input_file.read(), indexed_file.read())
+        self.assertEqual(len(self.index), self.n_records)
+
+    def test_index_validation(self):
+        # Copying the files, even in the wrong order, keeps the index valid
+        copy_path = os.path.join(self.tmp_dir, 'copy.json.gz')
+        shutil.copyfile(clinvar_json_index.get_index_path(self.indexed_path),
+                        clinvar_json_index.get_index_path(copy_path))
+        shutil.copyfile(self.indexed_path, copy_path)
+        os.utime(clinvar_json_index.get_index_path(copy_path), (0, 0))
+        self.assertEqual(len(clinvar_json_index.RecordIndex.for_file(copy_path)), self.n_records)
+
+        # Files rewritten with other records are detected, whether or not they have the same size
+        with open(copy_path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            last_byte = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([last_byte[0] ^ 1]))
+        self.assertIsNone(clinvar_json_index.RecordIndex.for_file(copy_path))
+        with open(copy_path, 'ab') as f:
+            f.write(gzip.compress(b'{}\n'))
+        self.assertIsNone(clinvar_json_index.RecordIndex.for_file(copy_path))
+
+    def test_index_without_file_size(self):
+        index_path = clinvar_json_index.get_index_path(self.indexed_path)
+        with open(index_path, 'rt') as f:
+            lines = f.readlines()
+        with open(index_path, 'wt') as f:
+            f.writelines(lines[:-1])
+        self.assertIsNone(clinvar_json_index.RecordIndex.for_file(self.indexed_path))
+
+    def test_iter_lines_range(self):
+        expected = ['RCV{:09d}'.format(i) for i in range(6, 13)]
+        for path, index in ((self.indexed_path, self.index), (self.input_path, None)):
+            self.assertEqual(
+                self.get_accessions(clinvar_json_index.iter_lines(path, 6, 13, index)), expected)
+        self.assertEqual(len(list(clinvar_json_index.iter_lines(self.indexed_path, 22, None,
+                                                                self.index))), 3)
+        self.assertEqual(list(clinvar_json_index.iter_lines(self.indexed_path, 30, 40, self.index)),
+                         [])
+
+    def test_find_line(self):
+        for path, index in ((self.indexed_path, self.index), (self.input_path, None)):
+            line = clinvar_json_index.find_line(path, 'RCV000000017', index)
+            self.assertEqual(self.get_accessions([line]), ['RCV000000017'])
+            self.assertIsNone(clinvar_json_index.find_line(path, 'RCV999999999', index))
+
+    def test_cellbase_records(self):
+        cell_recs = cellbase_records.CellbaseRecords(self.indexed_path, start=9, stop=11)
+        self.assertEqual([clinvar_json_index.get_accession(record) for record in cell_recs],
+                         ['RCV000000009', 'RCV000000010'])
+        self.assertEqual(list(cell_recs.iter_shard_ranges(1)), [(9, 10), (10, 11)])
+        self.assertEqual(cell_recs.get_record('RCV000000003'), self.records[3])
+
+    def test_trait_names_parsing_clinvar_jsons(self):
+        self.assertEqual(list(trait_names_parsing.clinvar_jsons(self.indexed_path, 23)),
+                         self.records[23:])
+
+    def test_cellbase_records_shard_ranges(self):
+        with gzip.open(self.input_path, 'rt') as f:
+            sequential_lines = [line.rstrip() for line in f]
+        # Shards of 3, 5 and 7 records cross the boundaries of the blocks of 4 records
+        for start, stop, shard_size in ((0, None, 3), (2, 23, 5), (5, 19, 7), (4, 12, 4),
+                                        (0, None, 25)):
+            with self.subTest(start=start, stop=stop, shard_size=shard_size):
+                cell_recs = cellbase_records.CellbaseRecords(self.indexed_path, start=start,
+                                                             stop=stop)
+                shard_lines = []
+                for shard_start, shard_stop in cell_recs.iter_shard_ranges(shard_size):
+                    shard_lines.extend(cell_recs.lines(shard_start, shard_stop))
+                self.assertEqual(shard_lines, sequential_lines[start:stop])
+
+    @mock.patch.object(trait_names_parsing, 'RECORDS_PER_SHARD', 3)
+    def test_count_trait_names_in_parallel(self):
+        sequential_counter = trait_names_parsing.count_trait_names(self.input_path)
+        self.assertEqual(len(sequential_counter), 11)
+        # Shards are read by the workers through the index, or sent to them by the main process
+        for path in (self.indexed_path, self.input_path):
+            with self.subTest(path=path):
+                counter = trait_names_parsing.count_trait_names(path, workers=2)
+                self.assertEqual(counter, sequential_counter)
+                self.assertEqual(list(counter), list(sequential_counter))
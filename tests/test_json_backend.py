@@ -0,0 +1,44 @@
+import json
+import unittest
+
+from eva_cttv_pipeline import json_backend
+
+
+class JsonBackendTest(unittest.TestCase):
+    record = '{"b": 1, "a": [1.5, null, true, "\\u00e9t\\u00e9"], "c": {"z": "x/y", "y": -2}}'
+
+    def tearDown(self):
+        json_backend.set_backend()
+
+    def test_default_encoder_is_stdlib(self):
+        self.assertEqual(json_backend.encoder_name, 'json')
+        obj = json.loads(self.record)
+        self.assertEqual(json_backend.dumps(obj), json.dumps(obj))
+
+    def test_decoders_preserve_order(self):
+        for name in json_backend.BACKENDS:
+            json_backend.set_backend(decoder=name)
+            obj = json_backend.loads(self.record)
+            self.assertEqual(obj, json.loads(self.record))
+            self.assertEqual(json.dumps(obj), json.dumps(json.loads(self.record)))
+
+    def test_decoders_numbers(self):
+        records = ['{"a": 123456789012345678901234567890}', '{"a": -9223372036854775809}',
+                   '{"a": 1e400}', '{"a": 0.1000000000000000055511151231257827}',
+                   '{"a": 9223372036854775807, "b": 1.7976931348623157e308}']
+        for name in json_backend.BACKENDS:
+            json_backend.set_backend(decoder=name)
+            for record in records:
+                obj = json_backend.loads(record)
+                self.assertEqual(obj, json.loads(record))
+                self.assertEqual(json.dumps(obj), json.dumps(json.loads(record)))
+            with self.assertRaises(ValueError):
+                json_backend.loads('{"a": ')
+
+    def test_default_decoder(self):
+        self.assertIn(json_backend.decoder_name, json_backend.DECODER_PREFERENCE)
+        self.assertNotEqual(json_backend.decoder_name, 'ujson')
+
+    def test_unavailable_backend(self):
+        with self.assertRaises(ValueError):
+            json_backend.set_backend(decoder='not_a_json_library')
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+
+import requests_mock
+
+from eva_cttv_pipeline.trait_mapping import efo_index
+import eva_cttv_pipeline.trait_mapping.ols as ols
+
+
+OWL = """<?xml version="1.0"?>
+<rdf:RDF xmlns="http://www.ebi.ac.uk/efo/efo.owl#"
+     xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"
+     xmlns:efo="http://www.ebi.ac.uk/efo/"
+     xmlns:oboInOwl="http://www.geneontology.org/formats/oboInOwl#">
+    <owl:Ontology rdf:about="http://www.ebi.ac.uk/efo/efo.owl"/>
+    <owl:Class rdf:about="http://www.ebi.ac.uk/efo/EFO_0000400">
+        <rdfs:subClassOf rdf:resource="http://www.ebi.ac.uk/efo/EFO_0000408"/>
+        <rdfs:subClassOf>
+            <owl:Restriction>
+                <owl:onProperty rdf:resource="http://purl.obolibrary.org/obo/RO_0002200"/>
+                <owl:someValuesFrom>
+                    <owl:Class rdf:about="http://www.ebi.ac.uk/efo/EFO_9999999"/>
+                </owl:someValuesFrom>
+            </owl:Restriction>
+        </rdfs:subClassOf>
+        <rdfs:label xml:lang="en">diabetes mellitus</rdfs:label>
+        <efo:alternative_term>diabetes</efo:alternative_term>
+        <oboInOwl:hasExactSynonym>DM</oboInOwl:hasExactSynonym>
+        <oboInOwl:hasBroadSynonym>metabolic disease</oboInOwl:hasBroadSynonym>
+    </owl:Class>
+    <owl:Class rdf:about="http://www.orpha.net/ORDO/Orphanet_976">
+        <rdfs:label>Adenine phosphoribosyltransferase deficiency</rdfs:label>
+    </owl:Class>
+    <owl:Class rdf:about="http://www.ebi.ac.uk/efo/EFO_0000001">
+        <rdfs:subClassOf rdf:resource="http://www.geneontology.org/formats/oboInOwl#ObsoleteClass"/>
+        <rdfs:label>obsolete_experimental factor</rdfs:label>
+    </owl:Class>
+    <owl:Class rdf:about="http://purl.obolibrary.org/obo/HP_0001892">
+        <rdfs:label>Abnormal bleeding</rdfs:label>
+        <owl:deprecated rdf:datatype="http://www.w3.org/2001/XMLSchema#boolean">true</owl:deprecated>
+    </owl:Class>
+</rdf:RDF>
+"""
+
+OBO = """format-version: 1.2
+ontology: efo
+
+[Term]
+id: EFO:0000400
+name: diabetes mellitus
+synonym: "diabetes" EXACT []
+synonym: "DM" RELATED [MeSH:D003920]
+synonym: "metabolic disease" BROAD []
+is_a: EFO:0000408 ! endocrine system disease
+
+[Term]
+id: Orphanet:976
+name: Adenine phosphoribosyltransferase deficiency
+
+[Term]
+id: EFO:0000001
+name: obsolete_experimental factor
+is_obsolete: true
+
+[Term]
+id: HP:0001892
+name: Abnormal bleeding
+is_obsolete: true
+
+[Typedef]
+id: part_of
+name: part of
+"""
+
+
+class TestEfoIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        efo_index.close()
+        self.tmp_dir.cleanup()
+
+    def write_file(self, file_name, contents):
+        path = os.path.join(self.tmp_dir.name, file_name)
+        with open(path, 'wt') as f:
+            f.write(contents)
+        return path
+
+    def check_index(self, index):
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.get_label('http://www.ebi.ac.uk/efo/EFO_0000400'),
+                         'diabetes mellitus')
+        self.assertEqual(index.get_status('http://www.ebi.ac.uk/efo/EFO_0000400'),
+                         {'in_efo': True, 'is_obsolete': False})
+        self.assertEqual(index.get_label('http://www.orpha.net/ORDO/Orphanet_976'),
+                         'Adenine phosphoribosyltransferase deficiency')
+        self.assertEqual(index.get_status('http://www.ebi.ac.uk/efo/EFO_0000001'),
+                         {'in_efo': True, 'is_obsolete': True})
+        self.assertEqual(index.get_status('http://purl.obolibrary.org/obo/HP_0001892'),
+                         {'in_efo': True, 'is_obsolete': True})
+        self.assertEqual(index.get_status('http://www.orpha.net/ORDO/Orphanet_0'),
+                         {'in_efo': False, 'is_obsolete': False})
+        self.assertIsNone(index.get_label('http://www.orpha.net/ORDO/Orphanet_0'))
+
+    def test_owl(self):
+        self.check_index(efo_index.load(self.write_file('efo.owl', OWL)))
+
+    def test_obo(self):
+        self.check_index(efo_index.load(self.write_file('efo.obo', OBO)))
+
+    def test_iter_terms(self):
+        for file_name, contents in (('efo.owl', OWL), ('efo.obo', OBO)):
+            terms = {uri: (label, synonyms, is_obsolete) for uri, label, synonyms, is_obsolete
+                     in efo_index.iter_terms(self.write_file(file_name, contents))}
+            self.assertEqual(sorted(terms['http://www.ebi.ac.uk/efo/EFO_0000400'][1]),
+                             ['DM', 'diabetes'])
+            self.assertEqual(terms['http://www.ebi.ac.uk/efo/EFO_0000001'],
+                             ('obsolete_experimental factor', [], True))
+
+    def test_tsv(self):
+        tsv_path = os.path.join(self.tmp_dir.name, 'efo_index.tsv.gz')
+        efo_index.load(self.write_file('efo.owl', OWL)).write_tsv(tsv_path)
+        self.check_index(efo_index.load(tsv_path))
+
+    def test_ols_uses_index(self):
+        efo_index.configure(self.write_file('efo.owl', OWL))
+        # Any request to OLS would fail, as requests_mock has no registered URL
+        with requests_mock.mock():
+            self.assertTrue(ols.is_current_and_in_efo('http://www.ebi.ac.uk/efo/EFO_0000400'))
+            self.assertFalse(ols.is_current_and_in_efo('http://www.ebi.ac.uk/efo/EFO_0000001'))
+            self.assertTrue(ols.is_in_efo('http://www.ebi.ac.uk/efo/EFO_0000001'))
+            self.assertFalse(ols.is_in_efo('http://www.orpha.net/ORDO/Orphanet_0'))
+            label = ols.get_ontology_label_from_ols('http://www.ebi.ac.uk/efo/EFO_0000400')
+            self.assertEqual(label, 'diabetes mellitus')
@@ -0,0 +1,164 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from eva_cttv_pipeline.trait_mapping import efo_index, fuzzy_matcher, output
+from eva_cttv_pipeline.trait_mapping.trait import OntologyEntry, Trait
+
+
+OBO = """format-version: 1.2
+
+[Term]
+id: EFO:0000400
+name: diabetes mellitus
+synonym: "diabetes" EXACT []
+
+[Term]
+id: EFO:0001360
+name: type II diabetes mellitus
+synonym: "type 2 diabetes" EXACT []
+synonym: "adult onset diabetes" RELATED []
+
+[Term]
+id: EFO:0000001
+name: type 2 diabetes mellitus
+is_obsolete: true
+
+[Term]
+id: MONDO:0005148
+name: type 2 diabetes mellitus
+
+[Term]
+id: HP:0001250
+name: Seizure
+synonym: "Seizures" EXACT []
+synonym: "Epileptic seizure" EXACT []
+
+[Term]
+id: HP:0002664
+name: Neoplasm
+synonym: "Tumour" EXACT []
+"""
+
+TERMS = [
+    ('http://www.ebi.ac.uk/efo/EFO_0000400', 'diabetes mellitus', ['diabetes'], True),
+    ('http://www.ebi.ac.uk/efo/EFO_0001360', 'type II diabetes mellitus',
+     ['type 2 diabetes', 'adult onset diabetes'], True),
+    ('http://purl.obolibrary.org/obo/HP_0001250', 'Seizure', ['Seizures', 'Epileptic seizure'],
+     False),
+    ('http://purl.obolibrary.org/obo/HP_0002664', 'Neoplasm', ['Tumour'], None),
+]
+
+
+class TestFuzzyMatcher(unittest.TestCase):
+    def setUp(self):
+        self.matcher = fuzzy_matcher.FuzzyMatcher(TERMS)
+
+    def test_match(self):
+        matches = self.matcher.match(['Type 2 Diabetes', 'epileptic seizures', 'tumours',
+                                      'xyz'], top_k=2)
+        self.assertEqual([match.uri for match in matches[0]],
+                         ['http://www.ebi.ac.uk/efo/EFO_0001360',
+                          'http://www.ebi.ac.uk/efo/EFO_0000400'])
+        # The score is the one of the closest name of the term, here a synonym
+        self.assertAlmostEqual(matches[0][0].score, 1.0)
+        self.assertEqual(matches[0][0].label, 'type II diabetes mellitus')
+        self.assertGreater(matches[0][0].score, matches[0][1].score)
+        self.assertEqual([match.uri for match in matches[1]],
+                         ['http://purl.obolibrary.org/obo/HP_0001250'])
+        self.assertEqual([match.uri for match in matches[2]],
+                         ['http://purl.obolibrary.org/obo/HP_0002664'])
+        self.assertEqual(matches[3], [])
+
+    def test_min_score(self):
+        matches = self.matcher.match(['diabetes'], top_k=4, min_score=0.0)
+        self.assertEqual(len(matches[0]), 4)
+        self.assertEqual(matches[0][-1].score, 0.0)
+        self.assertEqual(len(self.matcher.match(['diabetes'], top_k=4)[0]), 2)
+
+    def test_chunks(self):
+        trait_names = ['diabetes', 'type 2 diabetes mellitus', 'seizures', 'neoplasm', 'tumours']
+        expected_matches = [self.matcher.match([trait_name])[0] for trait_name in trait_names]
+        # Score a single trait name at a time
+        with mock.patch.object(fuzzy_matcher, 'MAX_CHUNK_SCORES', 1):
+            self.assertEqual(self.matcher.match(trait_names), expected_matches)
+        self.assertEqual(self.matcher.match(trait_names), expected_matches)
+
+    def test_chunks_by_postings(self):
+        trait_names = ['diabetes', 'type 2 diabetes mellitus', 'seizures', 'neoplasm', 'tumours']
+        query_ids, ngrams, _ = self.matcher.vectorise(trait_names)
+        self.assertEqual(list(self.matcher.get_chunks(query_ids, ngrams, len(trait_names))),
+                         [(0, 5)])
+        expected_matches = self.matcher.match(trait_names)
+        with mock.patch.object(fuzzy_matcher, 'MAX_CHUNK_POSTINGS', 20):
+            chunks = list(self.matcher.get_chunks(query_ids, ngrams, len(trait_names)))
+            self.assertGreater(len(chunks), 1)
+            self.assertEqual(chunks[0][0], 0)
+            self.assertEqual(chunks[-1][1], len(trait_names))
+            for (_, chunk_end), (chunk_start, _) in zip(chunks, chunks[1:]):
+                self.assertEqual(chunk_end, chunk_start)
+            self.assertEqual(self.matcher.match(trait_names), expected_matches)
+
+    def test_empty_matcher(self):
+        self.assertEqual(fuzzy_matcher.FuzzyMatcher([]).match(['diabetes']), [[]])
+
+
+class TestLoad(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.obo_path = os.path.join(self.tmp_dir.name, 'ontology.obo')
+        with open(self.obo_path, 'wt') as obo_file:
+            obo_file.write(OBO)
+
+    def tearDown(self):
+        efo_index.close()
+        fuzzy_matcher.close()
+        self.tmp_dir.cleanup()
+
+    def test_load(self):
+        efo_index._efo_index = efo_index.EfoIndex({
+            'http://www.ebi.ac.uk/efo/EFO_0000400': ('diabetes mellitus', False),
+            'http://www.ebi.ac.uk/efo/EFO_0001360': ('type II diabetes mellitus', False),
+        })
+        matcher = fuzzy_matcher.configure([self.obo_path])
+        self.assertIs(fuzzy_matcher.get_matcher(), matcher)
+        # Obsolete terms are left out
+        self.assertEqual(len(matcher), 5)
+        matches = matcher.match(['type 2 diabetes mellitus', 'diabetes'])
+        self.assertEqual([(match.uri, match.in_efo) for match in matches[0][:1]],
+                         [('http://purl.obolibrary.org/obo/MONDO_0005148', False)])
+        self.assertEqual([(match.uri, match.in_efo) for match in matches[1][:1]],
+                         [('http://www.ebi.ac.uk/efo/EFO_0000400', True)])
+
+    def test_load_without_efo_index(self):
+        matches = fuzzy_matcher.load([self.obo_path]).match(['seizure'])[0]
+        self.assertEqual(matches[0].in_efo, None)
+
+
+class TestAddFuzzyMatches(unittest.TestCase):
+    def test_add_fuzzy_matches(self):
+        matcher = fuzzy_matcher.FuzzyMatcher(TERMS)
+        finished_trait = Trait('diabetes', 1, {OntologyEntry('http://www.ebi.ac.uk/efo/EFO_0000400',
+                                                             'diabetes mellitus')})
+        zooma_trait = Trait('seizure', 2)
+        zooma_trait.zooma_result_list = [mock.Mock()]
+        unmapped_traits = [Trait('epileptic seizures', 3), Trait('tumour', 4)]
+        traits = [finished_trait, unmapped_traits[0], zooma_trait, unmapped_traits[1]]
+
+        with mock.patch.object(matcher, 'match', wraps=matcher.match) as match:
+            processed_traits = list(fuzzy_matcher.add_fuzzy_matches(iter(traits), matcher,
+                                                                    batch_size=3))
+        self.assertEqual(processed_traits, traits)
+        self.assertEqual([call[0][0] for call in match.call_args_list],
+                         [['epileptic seizures'], ['tumour']])
+        self.assertEqual([trait.fuzzy_match_list for trait in (finished_trait, zooma_trait)],
+                         [[], []])
+
+        curation_file = io.StringIO()
+        output.output_for_curation(unmapped_traits[1], csv.writer(curation_file, delimiter='\t'))
+        self.assertEqual(curation_file.getvalue().rstrip('\r\n').split('\t'), [
+            'tumour', '4', 'http://purl.obolibrary.org/obo/HP_0002664|Neoplasm|1.00|fuzzy-match|'
+                           'NOT_SPECIFIED'])
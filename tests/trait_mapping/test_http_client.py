@@ -0,0 +1,111 @@
+import time
+import unittest
+
+import requests
+import requests_mock
+
+from eva_cttv_pipeline.trait_mapping import http_client, rate_limiter
+import eva_cttv_pipeline.trait_mapping.zooma as zooma
+
+
+class TestHttpClient(unittest.TestCase):
+    url = 'https://www.ebi.ac.uk/ols/api/terms?iri=http://www.ebi.ac.uk/efo/EFO_0000001'
+
+    def setUp(self):
+        http_client.configure(backoff_base=0.001)
+
+    def tearDown(self):
+        http_client.configure(timeout=http_client.DEFAULT_TIMEOUT,
+                              retries=http_client.DEFAULT_RETRIES,
+                              pool_size=http_client.DEFAULT_POOL_SIZE,
+                              max_concurrency=rate_limiter.DEFAULT_MAX_CONCURRENCY,
+                              backoff_base=rate_limiter.DEFAULT_BACKOFF_BASE)
+
+    def test_session_is_shared(self):
+        self.assertIs(http_client.get_session(), http_client.get_session())
+
+    def test_configure_rebuilds_session(self):
+        session = http_client.get_session()
+        http_client.configure(pool_size=20)
+        new_session = http_client.get_session()
+        self.assertIsNot(session, new_session)
+        adapter = new_session.get_adapter('https://www.ebi.ac.uk')
+        self.assertEqual(adapter._pool_maxsize, 20)
+
+    def test_retry_transient_errors(self):
+        with requests_mock.mock() as m:
+            m.get(self.url, [{'status_code': 503}, {'exc': requests.exceptions.ConnectTimeout},
+                             {'json': {'label': 'experimental factor'}}])
+            response = http_client.get(self.url)
+            self.assertEqual(response.json(), {'label': 'experimental factor'})
+            self.assertEqual(m.call_count, 3)
+
+    def test_last_response_returned(self):
+        http_client.configure(retries=2)
+        with requests_mock.mock() as m:
+            m.get(self.url, status_code=500)
+            self.assertEqual(http_client.get(self.url).status_code, 500)
+            self.assertEqual(m.call_count, 3)
+
+    def test_no_retry_on_client_error(self):
+        with requests_mock.mock() as m:
+            m.get(self.url, status_code=404)
+            self.assertEqual(http_client.get(self.url).status_code, 404)
+            self.assertEqual(m.call_count, 1)
+
+    def test_retry_after(self):
+        with requests_mock.mock() as m:
+            m.get(self.url, [{'status_code': 429, 'headers': {'Retry-After': '0.2'}},
+                             {'json': {}}])
+            start_time = time.monotonic()
+            http_client.get(self.url)
+            self.assertGreaterEqual(time.monotonic() - start_time, 0.2)
+
+    def test_services_on_same_host_throttled_independently(self):
+        http_client.configure(retries=1, max_concurrency=8)
+        oxo_url = 'https://www.ebi.ac.uk/spot/oxo/api/search?size=5000'
+        with requests_mock.mock() as m:
+            m.get(self.url, [{'status_code': 429}, {'json': {}}])
+            m.post(oxo_url, json={})
+            http_client.get(self.url, service='ols')
+            http_client.post(oxo_url, service='oxo')
+        limiter = http_client.get_rate_limiter()
+        self.assertEqual(limiter.get_service_limiter('ols').n_throttled, 1)
+        self.assertLess(limiter.get_service_limiter('ols').concurrency_limit, 8)
+        self.assertEqual(limiter.get_service_limiter('oxo').n_throttled, 0)
+        self.assertEqual(limiter.get_service_limiter('oxo').concurrency_limit, 8)
+
+    def test_default_timeout(self):
+        http_client.configure(timeout=7)
+        with requests_mock.mock() as m:
+            m.get(self.url, json={})
+            http_client.get(self.url)
+            http_client.get(self.url, timeout=3)
+            self.assertEqual([request.timeout for request in m.request_history], [7, 3])
+
+
+class TestZoomaQueryHelperErrors(unittest.TestCase):
+    url = 'https://www.ebi.ac.uk/spot/zooma/v2/api/services/annotate?propertyValue=timeout'
+
+    def setUp(self):
+        http_client.configure(retries=0)
+        zooma.zooma_query_helper.cache_clear()
+
+    def tearDown(self):
+        http_client.configure(retries=http_client.DEFAULT_RETRIES)
+        zooma.zooma_query_helper.cache_clear()
+
+    def test_connection_error(self):
+        with requests_mock.mock() as m:
+            m.get(self.url, exc=requests.exceptions.ConnectTimeout)
+            with self.assertRaises(requests.exceptions.ConnectTimeout):
+                zooma.zooma_query_helper(self.url)
+
+    def test_error_not_cached(self):
+        with requests_mock.mock() as m:
+            m.get(self.url, [{'status_code': 500}, {'json': []}])
+            with self.assertRaises(requests.HTTPError):
+                zooma.zooma_query_helper(self.url)
+            self.assertEqual(zooma.zooma_query_helper(self.url), [])
+            self.assertEqual(zooma.zooma_query_helper(self.url), [])
+            self.assertEqual(m.call_count, 2)
@@ -0,0 +1,111 @@
+from collections import Counter
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from eva_cttv_pipeline.trait_mapping import journal
+import eva_cttv_pipeline.trait_mapping.main as main
+from eva_cttv_pipeline.trait_mapping.trait import OntologyEntry
+
+
+class Interrupted(Exception):
+    pass
+
+
+class TestTraitJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_filepath = os.path.join(self.tmp_dir.name, 'clinvar.json.gz')
+        with open(self.input_filepath, 'wt') as input_file:
+            input_file.write('ClinVar records\n')
+        self.journal_filepath = os.path.join(self.tmp_dir.name, 'mappings.tsv.journal')
+        self.mappings_filepath = os.path.join(self.tmp_dir.name, 'mappings.tsv')
+        self.curation_filepath = os.path.join(self.tmp_dir.name, 'curation.tsv')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_resume(self):
+        with journal.TraitJournal(self.journal_filepath, self.input_filepath) as trait_journal:
+            trait_journal.record('trait 1', [['trait 1', 'uri', 'label']], [])
+            trait_journal.record('trait 2', [], [['trait 2', 3]])
+        with journal.TraitJournal(self.journal_filepath, self.input_filepath,
+                                  resume=True) as trait_journal:
+            self.assertEqual(list(trait_journal.completed), ['trait 1', 'trait 2'])
+            self.assertEqual(trait_journal.completed['trait 2']['curation_rows'], [['trait 2', 3]])
+            trait_journal.record('trait 3', [], [])
+        with journal.TraitJournal(self.journal_filepath, self.input_filepath,
+                                  resume=True) as trait_journal:
+            self.assertEqual(list(trait_journal.completed), ['trait 1', 'trait 2', 'trait 3'])
+
+    def test_incomplete_last_line(self):
+        with journal.TraitJournal(self.journal_filepath, self.input_filepath) as trait_journal:
+            trait_journal.record('trait 1', [], [])
+        with open(self.journal_filepath, 'ab') as journal_file:
+            journal_file.write(b'{"name": "trait 2", "mapp')
+        with journal.TraitJournal(self.journal_filepath, self.input_filepath,
+                                  resume=True) as trait_journal:
+            self.assertEqual(list(trait_journal.completed), ['trait 1'])
+            trait_journal.record('trait 2', [], [])
+        header, entries, _ = journal.read_journal(self.journal_filepath)
+        self.assertEqual([entry['name'] for entry in entries], ['trait 1', 'trait 2'])
+
+    def test_different_input(self):
+        journal.TraitJournal(self.journal_filepath, self.input_filepath).close()
+        with open(self.input_filepath, 'at') as input_file:
+            input_file.write('More ClinVar records\n')
+        with self.assertRaises(ValueError):
+            journal.TraitJournal(self.journal_filepath, self.input_filepath, resume=True)
+
+    def run_main(self, resume=False, fail_on=None):
+        processed = []
+
+        def fake_process_trait(trait, filters, zooma_host, oxo_target_list, oxo_distance):
+            if trait.name == fail_on:
+                raise Interrupted()
+            processed.append(trait.name)
+            if trait.frequency % 2:
+                trait.finished_mapping_set.add(
+                    OntologyEntry('http://www.ebi.ac.uk/efo/EFO_{}'.format(trait.frequency),
+                                  trait.name))
+            return trait
+
+        trait_names = ['trait {}'.format(i) for i in range(20) for _ in range(i)]
+        with mock.patch.object(main, 'count_trait_names', return_value=Counter(trait_names)), \
+                mock.patch.object(main, 'process_trait', side_effect=fake_process_trait):
+            main.main(self.input_filepath, self.mappings_filepath, self.curation_filepath, {},
+                      'https://www.ebi.ac.uk', ['efo'], 1, True, oxo_batch_size=0, resume=resume)
+        return processed
+
+    def read_outputs(self):
+        with open(self.mappings_filepath) as mappings_file, \
+                open(self.curation_filepath) as curation_file:
+            return mappings_file.read(), curation_file.read()
+
+    def test_main_resume(self):
+        self.run_main()
+        expected_outputs = self.read_outputs()
+
+        with self.assertRaises(Interrupted):
+            self.run_main(fail_on='trait 12')
+        self.assertTrue(os.path.exists(self.journal_filepath))
+        processed = self.run_main(resume=True)
+        self.assertEqual(processed, ['trait {}'.format(i) for i in range(12, 20)])
+        self.assertEqual(self.read_outputs(), expected_outputs)
+        self.assertFalse(os.path.exists(self.journal_filepath))
+
+    def test_main_removes_journal(self):
+        self.run_main()
+        self.assertFalse(os.path.exists(self.journal_filepath))
+
+    def test_main_different_input_keeps_outputs(self):
+        with self.assertRaises(Interrupted):
+            self.run_main(fail_on='trait 12')
+        outputs = self.read_outputs()
+        with open(self.input_filepath, 'at') as input_file:
+            input_file.write('More ClinVar records\n')
+        with self.assertRaises(ValueError):
+            self.run_main(resume=True)
+        # The journal is checked before the output files are opened
+        self.assertEqual(self.read_outputs(), outputs)
@@ -0,0 +1,72 @@
+import os
+import unittest
+from unittest import mock
+
+from eva_cttv_pipeline.trait_mapping import efo_index, local_mappings
+import eva_cttv_pipeline.trait_mapping.main as main
+from eva_cttv_pipeline.trait_mapping.trait import OntologyEntry, Trait
+
+
+EFO_TERMS = {
+    'http://www.ebi.ac.uk/efo/EFO_0003862': ('frontotemporal dementia', False),
+    'http://www.orpha.net/ORDO/Orphanet_90354': ('brittle cornea syndrome', False),
+    'http://www.ebi.ac.uk/efo/EFO_0000003': ('obsolete term', True),
+}
+
+
+class TestNormaliseTraitName(unittest.TestCase):
+    def test_normalise_trait_name(self):
+        self.assertEqual(local_mappings.normalise_trait_name(' Frontotemporal  Dementia, Type-3 '),
+                         'frontotemporal dementia type 3')
+        self.assertEqual(local_mappings.normalise_trait_name('Frontotemporal dementia type 3'),
+                         'frontotemporal dementia type 3')
+
+
+class TestLocalMappingIndex(unittest.TestCase):
+    def setUp(self):
+        efo_index._efo_index = efo_index.EfoIndex(dict(EFO_TERMS))
+
+    def tearDown(self):
+        efo_index.close()
+        local_mappings.close()
+
+    def test_load(self):
+        mappings_filepath = os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), 'evidence_string_generation', 'resources',
+            'feb16_jul16_combined_trait_to_url.tsv')
+        local_mapping_index = local_mappings.load([mappings_filepath])
+        self.assertEqual(local_mapping_index.mappings['brittle cornea syndrome 2'],
+                         [('http://www.orpha.net/ORDO/Orphanet_90354', None)])
+        with mock.patch('eva_cttv_pipeline.trait_mapping.ols.query_ontology_label_from_ols',
+                        return_value='not in EFO'):
+            self.assertEqual(local_mapping_index.get_mappings('Brittle cornea syndrome-2'),
+                             {OntologyEntry('http://www.orpha.net/ORDO/Orphanet_90354',
+                                            'brittle cornea syndrome')})
+            # Mapped to two HP terms, which are not in EFO
+            self.assertIsNone(local_mapping_index.get_mappings('frontotemporal dementia'))
+            self.assertIsNone(local_mapping_index.get_mappings('not a trait name'))
+        self.assertEqual((local_mapping_index.n_lookups, local_mapping_index.n_matches,
+                          local_mapping_index.n_invalid), (3, 1, 1))
+
+    def test_ambiguous_names(self):
+        local_mapping_index = local_mappings.LocalMappingIndex({
+            'trait, 1': [('http://www.ebi.ac.uk/efo/EFO_0003862', 'label')],
+            'trait 1': [('http://www.ebi.ac.uk/efo/EFO_0003862', 'other label')],
+            'trait-2': [('http://www.ebi.ac.uk/efo/EFO_0003862', 'label')],
+            'trait 2': [('http://www.orpha.net/ORDO/Orphanet_90354', 'label')],
+        })
+        self.assertEqual(set(local_mapping_index.mappings), {'trait 1'})
+
+    def test_process_trait(self):
+        local_mappings._local_mapping_index = local_mappings.LocalMappingIndex({
+            'trait 1': [('http://www.ebi.ac.uk/efo/EFO_0003862', 'old label')],
+            'trait 2': [('http://www.ebi.ac.uk/efo/EFO_0000003', 'obsolete term')],
+        })
+        with mock.patch.object(main, 'get_zooma_results', return_value=[]) as get_zooma_results:
+            trait_1 = main.process_trait(Trait('trait 1', 1), {}, 'https://www.ebi.ac.uk', [], 3)
+            trait_2 = main.process_trait(Trait('trait 2', 1), {}, 'https://www.ebi.ac.uk', [], 3)
+        self.assertEqual(trait_1.finished_mapping_set,
+                         {OntologyEntry('http://www.ebi.ac.uk/efo/EFO_0003862',
+                                        'frontotemporal dementia')})
+        self.assertFalse(trait_2.is_finished)
+        self.assertEqual([call[0][0] for call in get_zooma_results.call_args_list], ['trait 2'])
@@ -0,0 +1,101 @@
+import random
+import time
+import unittest
+from unittest import mock
+
+import eva_cttv_pipeline.trait_mapping.main as main
+import eva_cttv_pipeline.trait_mapping.oxo as oxo
+from eva_cttv_pipeline.trait_mapping.trait import OntologyEntry, Trait
+
+
+def fake_process_trait(trait, filters, zooma_host, oxo_target_list, oxo_distance):
+    # Finish in a random order, to check that the output order does not depend on it
+    time.sleep(random.random() / 100)
+    trait.finished_mapping_set.add(OntologyEntry('http://www.ebi.ac.uk/efo/EFO_0000001', trait.name))
+    return trait
+
+
+class TestProcessTraits(unittest.TestCase):
+    def setUp(self):
+        self.traits = [Trait('trait {}'.format(i), i) for i in range(50)]
+
+    def get_processed_names(self, workers):
+        with mock.patch.object(main, 'process_trait', side_effect=fake_process_trait):
+            processed = list(main.process_traits(iter(self.traits), {}, 'https://www.ebi.ac.uk',
+                                                 ['Orphanet', 'efo'], 1, workers,
+                                                 oxo_batch_size=0))
+        self.assertTrue(all(trait.is_finished for trait in processed))
+        return [trait.name for trait in processed]
+
+    def test_single_worker(self):
+        self.assertEqual(self.get_processed_names(1), [trait.name for trait in self.traits])
+
+    def test_several_workers_keep_order(self):
+        self.assertEqual(self.get_processed_names(8), [trait.name for trait in self.traits])
+
+    def test_exception_is_raised(self):
+        with mock.patch.object(main, 'process_trait', side_effect=ValueError('Zooma error')):
+            with self.assertRaises(ValueError):
+                list(main.process_traits(iter(self.traits), {}, 'https://www.ebi.ac.uk',
+                                         ['efo'], 1, 4, oxo_batch_size=0))
+
+
+def fake_query_zooma(trait, filters, zooma_host):
+    # Every other trait needs OxO, with one ID of its own and one shared with the other traits
+    if trait.frequency % 2:
+        return None
+    return ['HP:{}'.format(trait.frequency), 'HP:0000001']
+
+
+def fake_get_oxo_results(id_list, target_list, distance):
+    return [oxo.OxOResult(oxo_id, 'label', oxo_id) for oxo_id in id_list]
+
+
+class TestProcessTraitsOxoBatches(unittest.TestCase):
+    def setUp(self):
+        self.traits = [Trait('trait {}'.format(i), i) for i in range(50)]
+
+    def process_traits(self, workers, oxo_batch_size):
+        with mock.patch.object(main, 'query_zooma', side_effect=fake_query_zooma), \
+                mock.patch.object(oxo, 'get_oxo_results_or_none',
+                                  side_effect=fake_get_oxo_results) as get_oxo_results:
+            processed = list(main.process_traits(iter(self.traits), {}, 'https://www.ebi.ac.uk',
+                                                 ['efo'], 1, workers, oxo_batch_size))
+        return processed, get_oxo_results.call_args_list
+
+    def check_oxo_results(self, processed):
+        self.assertEqual([trait.name for trait in processed], [trait.name for trait in self.traits])
+        for trait in processed:
+            expected_ids = [] if trait.frequency % 2 else ['HP:{}'.format(trait.frequency),
+                                                             'HP:0000001']
+            self.assertEqual([result.query_id for result in trait.oxo_result_list], expected_ids)
+
+    def test_single_batch(self):
+        processed, oxo_calls = self.process_traits(1, 1000)
+        self.check_oxo_results(processed)
+        self.assertEqual(len(oxo_calls), 1)
+        # The shared ID is only queried once
+        self.assertEqual(len(oxo_calls[0][0][0]), 26)
+
+    def test_several_batches(self):
+        processed, oxo_calls = self.process_traits(4, 10)
+        self.check_oxo_results(processed)
+        self.assertTrue(all(len(call[0][0]) <= 10 for call in oxo_calls))
+        self.assertLess(len(oxo_calls), 25)
+
+    def test_failed_batch(self):
+        def get_oxo_results(id_list, target_list, distance):
+            # The batches fail, while the requests for a single trait succeed
+            if len(id_list) > 2:
+                return None
+            return fake_get_oxo_results(id_list, target_list, distance)
+
+        with mock.patch.object(main, 'query_zooma', side_effect=fake_query_zooma), \
+                mock.patch.object(oxo, 'get_oxo_results_or_none',
+                                  side_effect=get_oxo_results) as get_oxo_results:
+            processed = list(main.process_traits(iter(self.traits), {}, 'https://www.ebi.ac.uk',
+                                                 ['efo'], 1, 4, 10))
+        self.check_oxo_results(processed)
+        # Each trait needing OxO is queried separately after the failure of its batch
+        self.assertEqual(len([call for call in get_oxo_results.call_args_list
+                              if len(call[0][0]) <= 2]), 25)
@@ -0,0 +1,115 @@
+from functools import lru_cache
+import json
+import os
+import tempfile
+import unittest
+
+import requests
+import requests_mock
+
+from eva_cttv_pipeline.trait_mapping import http_client, metrics, rate_limiter, response_cache, \
+    zooma
+
+
+class TestServiceMetrics(unittest.TestCase):
+    def test_latency_histogram(self):
+        service_metrics = metrics.ServiceMetrics()
+        for latency in (0.01, 0.02, 0.07, 0.3, 45):
+            service_metrics.record_attempt(latency, wait=0.5, status=200)
+        service_metrics.record_attempt(0.04)
+        summary = service_metrics.summary()
+        self.assertEqual(summary['attempts'], 6)
+        self.assertEqual(summary['connection_errors'], 1)
+        self.assertEqual(summary['rate_limit_wait'], 2.5)
+        self.assertEqual(summary['latency']['histogram'], {
+            '<=0.05s': 3, '<=0.1s': 1, '<=0.25s': 0, '<=0.5s': 1, '<=1s': 0, '<=2.5s': 0,
+            '<=5s': 0, '<=10s': 0, '<=30s': 0, '>30s': 1})
+        self.assertEqual(summary['latency']['p50'], 0.05)
+        # Above all the buckets, the maximum latency is the best estimate
+        self.assertEqual(summary['latency']['p95'], 45)
+        self.assertEqual(summary['latency']['max'], 45)
+
+    def test_empty(self):
+        summary = metrics.ServiceMetrics().summary()
+        self.assertEqual(summary['requests'], 0)
+        self.assertIsNone(summary['latency']['mean'])
+        self.assertIsNone(summary['latency']['p50'])
+
+
+class TestHttpClientMetrics(unittest.TestCase):
+    url = 'https://www.ebi.ac.uk/ols/api/terms?iri=http://www.ebi.ac.uk/efo/EFO_0000001'
+
+    def setUp(self):
+        metrics.reset()
+        http_client.configure(retries=2, backoff_base=0.001)
+
+    def tearDown(self):
+        http_client.configure(retries=http_client.DEFAULT_RETRIES,
+                              backoff_base=rate_limiter.DEFAULT_BACKOFF_BASE)
+
+    def test_requests_recorded_by_service(self):
+        with requests_mock.mock() as m:
+            m.get(self.url, [{'status_code': 503}, {'exc': requests.exceptions.ConnectTimeout},
+                             {'json': {}}, {'status_code': 404}])
+            http_client.get(self.url, service='ols')
+            http_client.get(self.url)
+        summary = metrics.get_metrics().summary()['services']
+        self.assertEqual(sorted(summary), ['ols', 'www.ebi.ac.uk'])
+        self.assertEqual([summary['ols'][key] for key in (
+            'requests', 'attempts', 'retries', 'failures', 'connection_errors', 'statuses')],
+            [1, 3, 2, 0, 1, {'200': 1}])
+        # A client error is an answer, not a failure
+        self.assertEqual([summary['www.ebi.ac.uk'][key] for key in (
+            'requests', 'attempts', 'retries', 'failures', 'statuses')],
+            [1, 1, 0, 0, {'404': 1}])
+
+    def test_failures(self):
+        with requests_mock.mock() as m:
+            m.get(self.url, status_code=500)
+            http_client.get(self.url, service='ols')
+            m.get(self.url, exc=requests.exceptions.ConnectionError)
+            with self.assertRaises(requests.ConnectionError):
+                http_client.get(self.url, service='ols')
+        summary = metrics.get_metrics().summary()['services']['ols']
+        self.assertEqual([summary[key] for key in (
+            'requests', 'attempts', 'retries', 'failures', 'connection_errors', 'statuses')],
+            [2, 6, 4, 2, 3, {'500': 1}])
+
+    def test_progress_line(self):
+        with requests_mock.mock() as m:
+            m.get(self.url, json={})
+            http_client.get(self.url, service='ols')
+        progress_line = metrics.get_metrics().progress_line(10)
+        self.assertTrue(progress_line.startswith('Processed 10 traits in '))
+        self.assertIn('ols: 1 requests', progress_line)
+
+
+class TestCacheMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        response_cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_cache_hits(self):
+        @metrics.register_lru_cache('test_label')
+        @lru_cache(maxsize=16)
+        @response_cache.cached('test_label')
+        def get_label(url):
+            return 'label'
+
+        response_cache.configure(os.path.join(self.tmp_dir.name, 'cache.sqlite'))
+        for url in ('url 1', 'url 1', 'url 2'):
+            get_label(url)
+        get_label.cache_clear()
+        get_label('url 1')
+
+        summary = json.loads(json.dumps(metrics.get_metrics().summary()))
+        self.assertEqual(summary['response_cache']['test_label'],
+                         {'hits': 1, 'misses': 2, 'hit_ratio': 0.3333})
+        self.assertEqual(summary['lru_caches']['test_label'],
+                         {'hits': 0, 'misses': 1, 'hit_ratio': 0.0, 'size': 1})
+        self.assertEqual(metrics._lru_caches['zooma'], zooma.zooma_query_helper)
+        del metrics._lru_caches['test_label']
@@ -1,7 +1,11 @@
+import os
+import tempfile
 import unittest
 
+import requests
 import requests_mock
 
+from eva_cttv_pipeline.trait_mapping import http_client, response_cache
 import eva_cttv_pipeline.trait_mapping.ols as ols
 import tests.trait_mapping.resources.test_ols_data as test_ols_data
 
@@ -38,3 +42,156 @@ class TestIsInEfo(unittest.TestCase):
 
             self.assertEqual(ols.is_in_efo("http://www.orpha.net/ORDO/Orphanet_425"),
                              True)
+
+
+class TestGetEfoTermStatus(unittest.TestCase):
+    def setUp(self):
+        http_client.configure(retries=0)
+        ols.query_efo_term_status.cache_clear()
+
+    def tearDown(self):
+        http_client.configure(retries=http_client.DEFAULT_RETRIES)
+        ols.query_efo_term_status.cache_clear()
+
+    def test_not_in_efo(self):
+        with requests_mock.mock() as m:
+            url = "https://www.ebi.ac.uk/ols/api/ontologies/efo/terms/http%253A%252F%252Fwww.orpha.net%252FORDO%252FOrphanet_0"
+            m.get(url, status_code=404)
+            self.assertEqual(ols.get_efo_term_status("http://www.orpha.net/ORDO/Orphanet_0"),
+                             {"in_efo": False, "is_obsolete": False, "label": None})
+
+    def test_server_error(self):
+        with requests_mock.mock() as m:
+            url = "https://www.ebi.ac.uk/ols/api/ontologies/efo/terms/http%253A%252F%252Fwww.orpha.net%252FORDO%252FOrphanet_1"
+            m.get(url, status_code=500)
+            self.assertIsNone(ols.get_efo_term_status("http://www.orpha.net/ORDO/Orphanet_1"))
+            self.assertFalse(ols.is_in_efo("http://www.orpha.net/ORDO/Orphanet_1"))
+
+    def test_error_not_cached(self):
+        with requests_mock.mock() as m:
+            url = "https://www.ebi.ac.uk/ols/api/ontologies/efo/terms/http%253A%252F%252Fwww.orpha.net%252FORDO%252FOrphanet_425"
+            m.get(url, [{"status_code": 503},
+                        {"json": test_ols_data.TestIsInEfoData.orphanet_425_ols_efo_json}])
+            self.assertIsNone(ols.get_efo_term_status("http://www.orpha.net/ORDO/Orphanet_425"))
+            self.assertTrue(ols.is_in_efo("http://www.orpha.net/ORDO/Orphanet_425"))
+            self.assertTrue(ols.is_in_efo("http://www.orpha.net/ORDO/Orphanet_425"))
+            self.assertEqual(m.call_count, 2)
+
+
+    def test_cache_keyed_by_server(self):
+        efo_json = {"label": "diabetes mellitus", "is_defining_ontology": True,
+                    "is_obsolete": False}
+        with tempfile.TemporaryDirectory() as tmp_dir, requests_mock.mock() as m:
+            response_cache.configure(os.path.join(tmp_dir, 'responses.sqlite'))
+            try:
+                m.get(ols.build_ols_efo_query("http://www.ebi.ac.uk/efo/EFO_0000400"),
+                      json=efo_json)
+                ols.get_efo_term_status("http://www.ebi.ac.uk/efo/EFO_0000400")
+                ols.query_efo_term_status.cache_clear()
+                ols.OLS_EFO_SERVER = 'http://127.0.0.1:8080'
+                m.get(ols.build_ols_efo_query("http://www.ebi.ac.uk/efo/EFO_0000400"),
+                      status_code=404)
+                # The response of the other server is not reused
+                self.assertEqual(ols.get_efo_term_status("http://www.ebi.ac.uk/efo/EFO_0000400"),
+                                 {"in_efo": False, "is_obsolete": False, "label": None})
+                self.assertEqual(m.call_count, 2)
+            finally:
+                ols.OLS_EFO_SERVER = 'https://www.ebi.ac.uk/ols'
+                response_cache.close()
+
+
+class TestQueryOntologyLabelFromOls(unittest.TestCase):
+    url = "https://www.ebi.ac.uk/ols/api/terms?iri=http://www.orpha.net/ORDO/Orphanet_199318"
+
+    def setUp(self):
+        http_client.configure(retries=0)
+        ols.query_ontology_label_from_ols.cache_clear()
+
+    def tearDown(self):
+        http_client.configure(retries=http_client.DEFAULT_RETRIES)
+        ols.query_ontology_label_from_ols.cache_clear()
+
+    def test_error_not_cached(self):
+        with requests_mock.mock() as m:
+            terms_json = test_ols_data.TestGetTraitNamesData.orphanet_199318_ols_terms_json
+            m.get(self.url, [{"exc": requests.exceptions.ConnectTimeout}, {"json": terms_json}])
+            with self.assertRaises(requests.exceptions.ConnectTimeout):
+                ols.query_ontology_label_from_ols("http://www.orpha.net/ORDO/Orphanet_199318")
+            for _ in range(2):
+                self.assertEqual(
+                    ols.query_ontology_label_from_ols("http://www.orpha.net/ORDO/Orphanet_199318"),
+                    "15q13.3 microdeletion syndrome")
+            self.assertEqual(m.call_count, 2)
+
+    def test_unknown_term_cached(self):
+        with requests_mock.mock() as m:
+            m.get(self.url, status_code=404)
+            for _ in range(2):
+                self.assertIsNone(
+                    ols.query_ontology_label_from_ols("http://www.orpha.net/ORDO/Orphanet_199318"))
+            self.assertEqual(m.call_count, 1)
+
+
+class TestGetTermInfo(unittest.TestCase):
+    def test_term_defined_by_efo(self):
+        efo_json = {"iri": "http://www.ebi.ac.uk/efo/EFO_0000400", "label": "diabetes mellitus",
+                    "is_defining_ontology": True, "is_obsolete": False}
+        with requests_mock.mock() as m:
+            url = "https://www.ebi.ac.uk/ols/api/ontologies/efo/terms/http%253A%252F%252Fwww.ebi.ac.uk%252Fefo%252FEFO_0000400"
+            m.get(url, json=efo_json)
+            self.assertEqual(ols.get_term_info("http://www.ebi.ac.uk/efo/EFO_0000400"),
+                             ols.TermInfo("diabetes mellitus", True, False))
+            # The label comes from the same response
+            self.assertEqual(m.call_count, 1)
+
+    def test_term_imported_in_efo(self):
+        with requests_mock.mock() as m:
+            m.get("https://www.ebi.ac.uk/ols/api/ontologies/efo/terms/http%253A%252F%252Fwww.orpha.net%252FORDO%252FOrphanet_425",
+                  json=test_ols_data.TestIsCurrentAndInEfoData.orphanet_425_ols_efo_json)
+            m.get("https://www.ebi.ac.uk/ols/api/terms?iri=http://www.orpha.net/ORDO/Orphanet_425",
+                  json={"_embedded": {"terms": [{"label": "Apolipoprotein A-I deficiency",
+                                                 "is_defining_ontology": True}]}})
+            term_info = ols.get_term_info("http://www.orpha.net/ORDO/Orphanet_425")
+            self.assertEqual(term_info,
+                             ols.TermInfo("Apolipoprotein A-I deficiency", True, False))
+            self.assertTrue(term_info.is_current_and_in_efo)
+
+
+class TestFetchEfoIndex(unittest.TestCase):
+    url = "https://www.ebi.ac.uk/ols/api/ontologies/efo/terms"
+
+    @staticmethod
+    def page_json(number, terms):
+        return {"_embedded": {"terms": terms},
+                "page": {"size": 2, "totalElements": 3, "totalPages": 2, "number": number}}
+
+    def setUp(self):
+        http_client.configure(retries=0)
+
+    def tearDown(self):
+        http_client.configure(retries=http_client.DEFAULT_RETRIES)
+
+    def test_fetch_efo_index(self):
+        with requests_mock.mock() as m:
+            m.get(self.url + "?page=0&size=2", complete_qs=True, json=self.page_json(0, [
+                {"iri": "http://www.ebi.ac.uk/efo/EFO_0000400", "label": "diabetes mellitus",
+                 "is_obsolete": False},
+                {"iri": "http://www.ebi.ac.uk/efo/EFO_0000001", "label": "obsolete term",
+                 "is_obsolete": True}]))
+            m.get(self.url + "?page=1&size=2", complete_qs=True, json=self.page_json(1, [
+                {"iri": "http://www.orpha.net/ORDO/Orphanet_425",
+                 "label": "Apolipoprotein A-I deficiency", "is_obsolete": False}]))
+            index = ols.fetch_efo_index(page_size=2, workers=2)
+            self.assertEqual(m.call_count, 2)
+        self.assertEqual(index.terms, {
+            "http://www.ebi.ac.uk/efo/EFO_0000400": ("diabetes mellitus", False),
+            "http://www.ebi.ac.uk/efo/EFO_0000001": ("obsolete term", True),
+            "http://www.orpha.net/ORDO/Orphanet_425": ("Apolipoprotein A-I deficiency", False)})
+
+    def test_page_error(self):
+        # An incomplete index would tell that the missing terms are not in EFO
+        with requests_mock.mock() as m:
+            m.get(self.url + "?page=0&size=2", complete_qs=True, json=self.page_json(0, []))
+            m.get(self.url + "?page=1&size=2", complete_qs=True, status_code=500)
+            with self.assertRaises(requests.HTTPError):
+                ols.fetch_efo_index(page_size=2)
@@ -1,7 +1,9 @@
 import unittest
+from unittest import mock
 
 import requests_mock
 
+from eva_cttv_pipeline.trait_mapping import http_client
 import eva_cttv_pipeline.trait_mapping.oxo as oxo
 import tests.trait_mapping.resources.test_oxo_data as test_oxo_data
 
@@ -76,3 +78,48 @@ class TestGetOxoResultsFromResponse(unittest.TestCase):
 
             self.assertEqual(oxo.get_oxo_results_from_response(oxo_response),
                              expected_oxo_results)
+
+
+class TestGetOxoResultsById(unittest.TestCase):
+    def test_batches(self):
+        id_list = ['HP:{}'.format(i) for i in range(25)] + ['HP:0', 'HP:1']
+        def get_oxo_results(batch_id_list, target_list, distance):
+            return [oxo.OxOResult(oxo_id, 'label', oxo_id) for oxo_id in batch_id_list]
+
+        with mock.patch.object(oxo, 'get_oxo_results_or_none',
+                               side_effect=get_oxo_results) as get_oxo_results:
+            oxo_results = oxo.get_oxo_results_by_id(id_list, ['efo'], 1, 10)
+        self.assertEqual(get_oxo_results.call_count, 3)
+        self.assertEqual(sorted(oxo_results), sorted(set(id_list)))
+        self.assertEqual(oxo_results['HP:3'].query_id, 'HP:3')
+
+    def test_failed_batch(self):
+        id_list = ['HP:{}'.format(i) for i in range(25)]
+        def get_oxo_results(batch_id_list, target_list, distance):
+            if 'HP:12' in batch_id_list:
+                return None
+            return [oxo.OxOResult(oxo_id, 'label', oxo_id) for oxo_id in batch_id_list]
+
+        with mock.patch.object(oxo, 'get_oxo_results_or_none', side_effect=get_oxo_results):
+            oxo_results = oxo.get_oxo_results_by_id(id_list, ['efo'], 1, 10)
+        # The IDs of the failed request are kept, without results
+        self.assertEqual(sorted(oxo_results), sorted(id_list))
+        self.assertEqual([oxo_id for oxo_id in id_list if oxo_results[oxo_id] is None],
+                         ['HP:{}'.format(i) for i in range(10, 20)])
+
+
+class TestGetOxoResults(unittest.TestCase):
+    url = 'https://www.ebi.ac.uk/spot/oxo/api/search?size=5000'
+
+    def setUp(self):
+        http_client.configure(retries=0)
+
+    def tearDown(self):
+        http_client.configure(retries=http_client.DEFAULT_RETRIES)
+
+    def test_failed_query_sent_once(self):
+        # Requests are only retried by http_client
+        with requests_mock.mock() as m:
+            m.post(self.url, status_code=503)
+            self.assertEqual(oxo.get_oxo_results(['HP:0000001'], ['efo'], 3), [])
+            self.assertEqual(m.call_count, 1)
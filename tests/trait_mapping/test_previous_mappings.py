@@ -0,0 +1,97 @@
+from collections import Counter
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from eva_cttv_pipeline.trait_mapping import efo_index
+from eva_cttv_pipeline.trait_mapping import previous_mappings
+import eva_cttv_pipeline.trait_mapping.main as main
+from eva_cttv_pipeline.trait_mapping.trait import OntologyEntry
+
+
+EFO_TERMS = {
+    'http://www.ebi.ac.uk/efo/EFO_0000001': ('current term', False),
+    'http://www.ebi.ac.uk/efo/EFO_0000002': ('other current term', False),
+    'http://www.ebi.ac.uk/efo/EFO_0000003': ('obsolete term', True),
+}
+
+
+class TestPreviousMappings(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        efo_index._efo_index = efo_index.EfoIndex(dict(EFO_TERMS))
+
+    def tearDown(self):
+        efo_index.close()
+        self.tmp_dir.cleanup()
+
+    def write_mappings(self, file_name, lines):
+        filepath = os.path.join(self.tmp_dir.name, file_name)
+        with open(filepath, 'wt') as mappings_file:
+            mappings_file.write(''.join(line + '\n' for line in lines))
+        return filepath
+
+    def test_load_previous_mappings(self):
+        automated_filepath = self.write_mappings('automated.tsv', [
+            '#clinvar_trait_name\turi\tlabel',
+            'Trait 1\thttp://www.ebi.ac.uk/efo/EFO_0000001\tcurrent term',
+            'trait 1\thttp://www.ebi.ac.uk/efo/EFO_0000002\tother current term',
+            'trait 2\thttp://www.ebi.ac.uk/efo/EFO_0000001\tcurrent term',
+            'trait 3\t',
+        ])
+        curated_filepath = self.write_mappings('curated.tsv', [
+            'trait 2\thttp://www.ebi.ac.uk/efo/EFO_0000002|http://www.ebi.ac.uk/efo/EFO_0000003',
+        ])
+        mappings = previous_mappings.load_previous_mappings([automated_filepath, curated_filepath])
+        self.assertEqual(mappings, {
+            'trait 1': ['http://www.ebi.ac.uk/efo/EFO_0000001',
+                        'http://www.ebi.ac.uk/efo/EFO_0000002'],
+            'trait 2': ['http://www.ebi.ac.uk/efo/EFO_0000002',
+                        'http://www.ebi.ac.uk/efo/EFO_0000003'],
+        })
+
+    def test_validate_previous_mappings(self):
+        mappings = {
+            'trait 1': ['http://www.ebi.ac.uk/efo/EFO_0000001',
+                        'http://www.ebi.ac.uk/efo/EFO_0000002'],
+            'trait 2': ['http://www.ebi.ac.uk/efo/EFO_0000002',
+                        'http://www.ebi.ac.uk/efo/EFO_0000003'],
+            'trait 3': ['http://purl.obolibrary.org/obo/HP_0000001'],
+            'trait 4': ['http://www.ebi.ac.uk/efo/EFO_0000001'],
+        }
+        with mock.patch('eva_cttv_pipeline.trait_mapping.ols.query_ontology_label_from_ols',
+                        return_value='not in EFO'):
+            valid_mappings = previous_mappings.validate_previous_mappings(
+                mappings, ['trait 1', 'trait 2', 'trait 3', 'trait 5'], workers=2)
+        self.assertEqual(valid_mappings, {
+            'trait 1': {OntologyEntry('http://www.ebi.ac.uk/efo/EFO_0000001', 'current term'),
+                        OntologyEntry('http://www.ebi.ac.uk/efo/EFO_0000002',
+                                      'other current term')},
+        })
+
+    def test_main_carries_forward_previous_mappings(self):
+        input_filepath = self.write_mappings('clinvar.json.gz', ['ClinVar records'])
+        mappings_filepath = os.path.join(self.tmp_dir.name, 'mappings.tsv')
+        curation_filepath = os.path.join(self.tmp_dir.name, 'curation.tsv')
+        previous_filepath = self.write_mappings('previous.tsv', [
+            'trait 1\thttp://www.ebi.ac.uk/efo/EFO_0000001\told label',
+            'trait 2\thttp://www.ebi.ac.uk/efo/EFO_0000003\tobsolete term',
+        ])
+        processed = []
+
+        def fake_get_zooma_results(trait_name, filters, zooma_host):
+            processed.append(trait_name)
+            return []
+
+        with mock.patch.object(main, 'count_trait_names',
+                               return_value=Counter(['trait 1', 'trait 2', 'trait 3'])), \
+                mock.patch.object(main, 'get_zooma_results', side_effect=fake_get_zooma_results):
+            main.main(input_filepath, mappings_filepath, curation_filepath, {},
+                      'https://www.ebi.ac.uk', ['efo'], 1, True,
+                      previous_mappings_filepaths=[previous_filepath])
+
+        self.assertEqual(processed, ['trait 2', 'trait 3'])
+        with open(mappings_filepath) as mappings_file:
+            self.assertEqual(mappings_file.read().splitlines()[1:],
+                             ['trait 1\thttp://www.ebi.ac.uk/efo/EFO_0000001\tcurrent term'])
@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+from email.utils import formatdate
+
+from eva_cttv_pipeline.trait_mapping import rate_limiter
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    def test_seconds(self):
+        self.assertEqual(rate_limiter.parse_retry_after('120'), 120)
+
+    def test_date(self):
+        seconds = rate_limiter.parse_retry_after(formatdate(time.time() + 30, usegmt=True))
+        self.assertTrue(25 <= seconds <= 30)
+
+    def test_invalid(self):
+        self.assertIsNone(rate_limiter.parse_retry_after(None))
+        self.assertIsNone(rate_limiter.parse_retry_after('soon'))
+
+    def test_capped(self):
+        self.assertEqual(rate_limiter.parse_retry_after('86400'), rate_limiter.MAX_RETRY_AFTER)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate(self):
+        bucket = rate_limiter.TokenBucket(rate=50, burst=5)
+        start_time = time.monotonic()
+        for _ in range(15):
+            bucket.acquire()
+        # The first 5 requests are a burst, the next 10 are spaced by 1/50 s
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.18)
+
+
+class TestServiceLimiter(unittest.TestCase):
+    def test_additive_increase_multiplicative_decrease(self):
+        limiter = rate_limiter.ServiceLimiter('ols', rate=0, burst=0, max_concurrency=8)
+        limiter.acquire()
+        limiter.release(throttled=True)
+        self.assertEqual(limiter.concurrency_limit, 4)
+        limiter.acquire()
+        limiter.release(throttled=True)
+        self.assertEqual(limiter.concurrency_limit, 2)
+        limiter.acquire()
+        limiter.release()
+        self.assertEqual(limiter.concurrency_limit, 2.5)
+        for _ in range(100):
+            limiter.acquire()
+            limiter.release()
+        self.assertEqual(limiter.concurrency_limit, 8)
+
+    def test_concurrency_limit(self):
+        limiter = rate_limiter.ServiceLimiter('ols', rate=0, burst=0, max_concurrency=2)
+        limiter.acquire()
+        limiter.acquire()
+        acquired = threading.Event()
+
+        def acquire():
+            limiter.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release()
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+
+    def test_retry_after_pauses_service(self):
+        limiter = rate_limiter.ServiceLimiter('ols', rate=0, burst=0, max_concurrency=2)
+        limiter.acquire()
+        limiter.release(throttled=True, retry_after=0.2)
+        start_time = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.19)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_service_limiters(self):
+        limiter = rate_limiter.RateLimiter()
+        self.assertIs(limiter.get_service_limiter('ols'), limiter.get_service_limiter('ols'))
+        self.assertIsNot(limiter.get_service_limiter('ols'), limiter.get_service_limiter('oxo'))
+
+    def test_backoff_delay(self):
+        limiter = rate_limiter.RateLimiter(backoff_base=1, backoff_max=10)
+        for attempt in range(10):
+            delay = limiter.get_backoff_delay(attempt)
+            self.assertTrue(0 <= delay <= min(10, 2 ** attempt))
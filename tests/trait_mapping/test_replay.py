@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import unittest
+
+import requests_mock
+
+from eva_cttv_pipeline.trait_mapping import http_client, ols, oxo, rate_limiter, replay, \
+    response_cache
+import eva_cttv_pipeline.trait_mapping.zooma as zooma
+
+
+EFO_URI = 'http://www.ebi.ac.uk/efo/EFO_0000400'
+OLS_EFO_URL = ('https://www.ebi.ac.uk/ols/api/ontologies/efo/terms/'
+               'http%253A%252F%252Fwww.ebi.ac.uk%252Fefo%252FEFO_0000400')
+OXO_URL = 'https://www.ebi.ac.uk/spot/oxo/api/search?size=5000'
+OLS_EFO_RESPONSE = {'label': 'diabetes mellitus', 'is_obsolete': False,
+                    'is_defining_ontology': True}
+OXO_RESPONSE = {'_embedded': {'searchResults': []}}
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        http_client.configure(retries=0, rate=0)
+        ols.query_efo_term_status.cache_clear()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        http_client.configure(retries=http_client.DEFAULT_RETRIES, rate=rate_limiter.DEFAULT_RATE)
+        ols.query_efo_term_status.cache_clear()
+        ols.OLS_EFO_SERVER = 'https://www.ebi.ac.uk/ols'
+        oxo.OXO_SERVER = 'https://www.ebi.ac.uk/spot/oxo'
+        self.tmp_dir.cleanup()
+
+    def record(self):
+        store = replay.FixtureStore()
+        with requests_mock.mock() as m, replay.Recorder(store):
+            m.get(OLS_EFO_URL, json=OLS_EFO_RESPONSE)
+            m.post(OXO_URL, json=OXO_RESPONSE)
+            self.assertEqual(ols.query_efo_term_status(EFO_URI)['label'], 'diabetes mellitus')
+            self.assertEqual(oxo.get_oxo_results(['HP:0000001'], ['efo'], 3), [])
+        return store
+
+    def test_record_write_and_load(self):
+        store = self.record()
+        self.assertEqual(len(store), 2)
+        for file_name in ('fixtures.jsonl', 'fixtures.jsonl.gz'):
+            fixtures_filepath = os.path.join(self.tmp_dir.name, file_name)
+            store.write(fixtures_filepath)
+            loaded_store = replay.FixtureStore.load(fixtures_filepath)
+            self.assertEqual(set(loaded_store.responses), set(store.responses))
+            response = loaded_store.get('POST', '/spot/oxo/api/search?size=5000',
+                                        'ids=HP%3A0000001&mappingTarget=efo&distance=3')
+            self.assertEqual(response.content, json.dumps(OXO_RESPONSE))
+
+    def test_cached_responses_are_recorded(self):
+        self.record()
+        # The response to the OLS query is in the in-memory cache, which is emptied when recording
+        store = self.record()
+        self.assertIsNotNone(store.get('GET', replay.get_request_target(OLS_EFO_URL), None))
+
+    def test_response_cache_not_allowed(self):
+        response_cache.configure(os.path.join(self.tmp_dir.name, 'responses.sqlite'))
+        try:
+            with self.assertRaises(ValueError):
+                replay.Recorder(replay.FixtureStore()).start()
+        finally:
+            response_cache.close()
+
+    def test_record_other_servers(self):
+        ols.OLS_EFO_SERVER = 'http://127.0.0.1:8080'
+        store = replay.FixtureStore()
+        with requests_mock.mock() as m, replay.Recorder(store):
+            m.get(ols.build_ols_efo_query(EFO_URI), json=OLS_EFO_RESPONSE)
+            self.assertEqual(ols.query_efo_term_status(EFO_URI)['label'], 'diabetes mellitus')
+        # Recorded under the path of OLS on the replay server
+        self.assertIsNotNone(store.get('GET', replay.get_request_target(OLS_EFO_URL), None))
+        with replay.ReplayServer(store) as server:
+            ols.OLS_EFO_SERVER = server.url + replay.OLS_PATH
+            ols.query_efo_term_status.cache_clear()
+            self.assertEqual(ols.query_efo_term_status(EFO_URI)['label'], 'diabetes mellitus')
+        self.assertEqual(server.n_missing, 0)
+
+    def test_get_replay_target(self):
+        servers = {'': 'https://www.ebi.ac.uk', replay.OLS_PATH: 'https://ols.example.org/',
+                   replay.OXO_PATH: 'https://www.ebi.ac.uk/spot/oxo'}
+        self.assertEqual(replay.get_replay_target('https://ols.example.org/api/terms?iri=x',
+                                                  servers), '/ols/api/terms?iri=x')
+        self.assertEqual(replay.get_replay_target(OXO_URL, servers),
+                         '/spot/oxo/api/search?size=5000')
+        self.assertEqual(replay.get_replay_target(
+            'https://www.ebi.ac.uk/spot/zooma/v2/api/services/annotate', servers),
+            '/spot/zooma/v2/api/services/annotate')
+        self.assertEqual(replay.get_replay_target('https://www.ebi.ac.uk/olsx/api', servers),
+                         '/olsx/api')
+        self.assertEqual(replay.get_replay_target('http://other.org/api?q=1', servers),
+                         '/api?q=1')
+
+    def test_transient_errors_are_not_recorded(self):
+        store = replay.FixtureStore()
+        with requests_mock.mock() as m, replay.Recorder(store):
+            m.get(OLS_EFO_URL, status_code=503)
+            self.assertIsNone(ols.get_efo_term_status(EFO_URI))
+        self.assertEqual(len(store), 0)
+
+    def test_replay(self):
+        store = self.record()
+        ols.query_efo_term_status.cache_clear()
+        with replay.ReplayServer(store) as server:
+            ols.OLS_EFO_SERVER = server.url + replay.OLS_PATH
+            oxo.OXO_SERVER = server.url + replay.OXO_PATH
+            self.assertEqual(ols.query_efo_term_status(EFO_URI)['label'], 'diabetes mellitus')
+            self.assertEqual(oxo.get_oxo_results(['HP:0000001'], ['efo'], 3), [])
+            # Requests which were not recorded get a distinct error status
+            zooma_url = zooma.build_zooma_query('not recorded', {'required': 'gwas',
+                                                                 'ontologies': 'efo',
+                                                                 'preferred': 'gwas'}, server.url)
+            self.assertEqual(http_client.get(zooma_url).status_code, replay.MISSING_STATUS)
+        self.assertEqual(server.n_requests, 3)
+        self.assertEqual(server.n_missing, 1)
+
+    def test_injected_errors(self):
+        store = self.record()
+        with replay.ReplayServer(store, error_rate=1.0, latency=0.01) as server:
+            url = server.url + replay.OXO_PATH + '/api/search?size=5000'
+            self.assertEqual(http_client.post(url, data={'ids': ['HP:0000001']}).status_code,
+                             replay.ERROR_STATUS)
+        self.assertEqual(server.n_errors, 1)
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from eva_cttv_pipeline.trait_mapping import response_cache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'responses.sqlite')
+
+    def tearDown(self):
+        response_cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_get_set(self):
+        cache = response_cache.ResponseCache(self.path)
+        self.assertIsNone(cache.get('zooma', 'url'))
+        cache.set('zooma', 'url', [{'confidence': 'HIGH'}])
+        self.assertEqual(cache.get('zooma', 'url'), [{'confidence': 'HIGH'}])
+        self.assertIsNone(cache.get('ols_label', 'url'))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        cache.close()
+
+    def test_persistent(self):
+        cache = response_cache.ResponseCache(self.path)
+        cache.set('ols_label', 'url', 'label')
+        cache.close()
+        cache = response_cache.ResponseCache(self.path)
+        self.assertEqual(cache.get('ols_label', 'url'), 'label')
+        cache.close()
+
+    def test_ttl(self):
+        cache = response_cache.ResponseCache(self.path, ttl_days=1)
+        with mock.patch('time.time', return_value=1000000):
+            cache.set('ols_label', 'url', 'label')
+        with mock.patch('time.time', return_value=1000000 + 23 * 3600):
+            self.assertEqual(cache.get('ols_label', 'url'), 'label')
+        with mock.patch('time.time', return_value=1000000 + 25 * 3600):
+            self.assertIsNone(cache.get('ols_label', 'url'))
+            cache.evict()
+        self.assertEqual(len(cache), 0)
+        cache.close()
+
+    def test_evict_oldest(self):
+        cache = response_cache.ResponseCache(self.path, ttl_days=None, max_entries=3)
+        for i in range(5):
+            with mock.patch('time.time', return_value=1000000 + i):
+                cache.set('ols_label', 'url{}'.format(i), 'label{}'.format(i))
+        cache.evict()
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get('ols_label', 'url1'))
+        self.assertEqual(cache.get('ols_label', 'url2'), 'label2')
+        cache.close()
+
+    def test_threads(self):
+        cache = response_cache.ResponseCache(self.path)
+
+        def set_values(thread_number):
+            for i in range(50):
+                key = '{}-{}'.format(thread_number, i)
+                cache.set('zooma', key, [i])
+                self.assertEqual(cache.get('zooma', key), [i])
+
+        threads = [threading.Thread(target=set_values, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(cache), 400)
+        cache.close()
+
+    def test_cached_decorator(self):
+        calls = []
+
+        @response_cache.cached('ols_label')
+        def get_label(url):
+            calls.append(url)
+            return None if url == 'failing_url' else 'label'
+
+        # Disabled until configured
+        get_label('url')
+        get_label('url')
+        self.assertEqual(len(calls), 2)
+
+        response_cache.configure(self.path)
+        self.assertEqual(get_label('url'), 'label')
+        self.assertEqual(get_label('url'), 'label')
+        self.assertEqual(len(calls), 3)
+
+        # Failed queries are not cached
+        self.assertIsNone(get_label('failing_url'))
+        self.assertIsNone(get_label('failing_url'))
+        self.assertEqual(len(calls), 5)
@@ -1,5 +1,12 @@
+from collections import Counter
+import gzip
+import json
+import os
+import tempfile
 import unittest
+from unittest import mock
 
+from eva_cttv_pipeline import clinvar_json_index
 import eva_cttv_pipeline.trait_mapping.trait_names_parsing as trait_names_parsing
 
 
@@ -19,3 +26,43 @@ class TestGetTraitNames(unittest.TestCase):
 
         self.assertEqual(trait_names_parsing.get_trait_names(clinvar_json),
                          expected_trait_names_list)
+
+
+class TestCountTraitNames(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.clinvar_filepath = os.path.join(self.tmp_dir.name, 'clinvar.json.gz')
+        with gzip.open(self.clinvar_filepath, 'wt') as clinvar_file:
+            for i in range(50):
+                trait_names = ['Trait {}'.format(i % 7), 'Trait {}'.format(i % 3)]
+                clinvar_json = {'referenceClinVarAssertion': {
+                    'clinVarAccession': {'acc': 'RCV{:09}'.format(i)},
+                    'traitSet': {'trait': [
+                        {'name': [{'elementValue': {'value': trait_name, 'type': 'Preferred'}}]}
+                        for trait_name in trait_names]}}}
+                clinvar_file.write(json.dumps(clinvar_json) + '\n')
+        self.expected_counter = Counter(trait_names_parsing.parse_trait_names(self.clinvar_filepath))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_same_counter(self, trait_names_counter):
+        self.assertEqual(trait_names_counter, self.expected_counter)
+        # The trait names are in the same order, which is the order of the output files
+        self.assertEqual(list(trait_names_counter), list(self.expected_counter))
+
+    def test_count_trait_names(self):
+        self.assertEqual(self.expected_counter['trait 0'], 8 + 17)
+        self.assert_same_counter(trait_names_parsing.count_trait_names(self.clinvar_filepath))
+
+    @mock.patch.object(trait_names_parsing, 'RECORDS_PER_SHARD', 4)
+    def test_count_trait_names_in_parallel(self):
+        self.assert_same_counter(
+            trait_names_parsing.count_trait_names(self.clinvar_filepath, workers=3))
+
+    @mock.patch.object(trait_names_parsing, 'RECORDS_PER_SHARD', 4)
+    def test_count_trait_names_in_parallel_with_index(self):
+        indexed_filepath = os.path.join(self.tmp_dir.name, 'indexed.json.gz')
+        clinvar_json_index.write_block_gzip(self.clinvar_filepath, indexed_filepath,
+                                            records_per_block=3)
+        self.assert_same_counter(trait_names_parsing.count_trait_names(indexed_filepath, workers=3))
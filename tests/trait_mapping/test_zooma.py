@@ -1,5 +1,8 @@
 import unittest
 
+import requests_mock
+
+from eva_cttv_pipeline.trait_mapping import http_client
 import eva_cttv_pipeline.trait_mapping.zooma as zooma
 
 
@@ -34,3 +37,31 @@ class TestGetZoomaResultsForTrait(unittest.TestCase):
 
         self.assertEqual(zooma.get_zooma_results_for_trait(zooma_response_list),
                          expected_mappings)
+
+
+class TestGetZoomaResults(unittest.TestCase):
+    filters = {'required': 'cttv,eva-clinvar,gwas',
+               'preferred': 'eva-clinvar,cttv,gwas',
+               'ontologies': 'efo,ordo,hp'}
+
+    def setUp(self):
+        http_client.configure(retries=0)
+        zooma.zooma_query_helper.cache_clear()
+
+    def tearDown(self):
+        http_client.configure(retries=http_client.DEFAULT_RETRIES)
+        zooma.zooma_query_helper.cache_clear()
+
+    def test_failed_query_not_cached(self):
+        with requests_mock.mock() as m:
+            m.get(requests_mock.ANY, [{'status_code': 503}, {'json': []}])
+            # Requests are only retried by http_client, and the failure is not cached
+            self.assertEqual(zooma.get_zooma_results('abnormal bleeding', self.filters,
+                                                     'https://www.ebi.ac.uk'), [])
+            self.assertEqual(m.call_count, 1)
+            self.assertEqual(zooma.get_zooma_results('abnormal bleeding', self.filters,
+                                                     'https://www.ebi.ac.uk'), [])
+            self.assertEqual(m.call_count, 2)
+            # The successful response is cached
+            zooma.get_zooma_results('abnormal bleeding', self.filters, 'https://www.ebi.ac.uk')
+            self.assertEqual(m.call_count, 2)